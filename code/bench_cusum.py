@@ -0,0 +1,80 @@
+"""
+Benchmark the array-based server-side CUSUM against the ImageCollection.iterate chain.
+
+Builds detect_damage(method='cusum') with cusum_mode='array' and
+cusum_mode='iterate' for a range of post_interval values. The iterate version
+evaluates one dependent step per post-war image, so its sequential chain grows
+with the window; the array version is two arrayAccum scans whatever the window
+length. Reports the number of post-war images (= iterate steps) and serialized
+graph sizes and, with --export, runs every variant as an export over the AOI and
+compares task runtime and EECU usage.
+
+Usage:
+    python code/bench_cusum.py
+    python code/bench_cusum.py --post-intervals 1 3 6 12 --export
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import ee
+
+sys.path.insert(0, str(Path(__file__).parent))
+from pwtt import detect_damage  # noqa: E402
+from graph_stats import export_and_time, graph_stats  # noqa: E402
+
+
+def count_post_images(aoi, inference_start, post_interval):
+    """Post-war S1 acquisitions over the AOI, across all orbits (upper bound on iterate steps)."""
+    start = ee.Date(inference_start)
+    return ee.ImageCollection('COPERNICUS/S1_GRD_FLOAT') \
+        .filter(ee.Filter.listContains('transmitterReceiverPolarisation', 'VH')) \
+        .filter(ee.Filter.eq('instrumentMode', 'IW')) \
+        .filterBounds(aoi) \
+        .filterDate(start, start.advance(post_interval, 'month')) \
+        .size().getInfo()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Array vs iterate CUSUM.')
+    parser.add_argument('--aoi', nargs=4, type=float, default=[37.949, 48.556, 38.044, 48.622],
+                        help='Bounding box: xmin ymin xmax ymax (default: Bakhmut)')
+    parser.add_argument('--war-start', default='2022-02-22')
+    parser.add_argument('--inference-start', default='2024-01-01')
+    parser.add_argument('--pre-interval', type=int, default=12)
+    parser.add_argument('--post-intervals', nargs='+', type=int, default=[1, 2, 4, 6, 12])
+    parser.add_argument('--export', action='store_true',
+                        help='Also run each variant as an export task and compare runtimes')
+    parser.add_argument('--project', default='ggmap-325812', help='GEE cloud project ID')
+    args = parser.parse_args()
+
+    ee.Initialize(project=args.project)
+    aoi = ee.Geometry.Rectangle(args.aoi)
+
+    variants = {}
+    print(f"{'variant':<16s} {'images':>7s} {'nodes':>7s} {'invoc':>7s} {'depth':>6s} {'bytes':>8s}")
+    for post_interval in args.post_intervals:
+        n_images = count_post_images(aoi, args.inference_start, post_interval)
+        for mode in ('array', 'iterate'):
+            image = detect_damage(
+                aoi, args.inference_start, args.war_start,
+                pre_interval=args.pre_interval, post_interval=post_interval,
+                method='cusum', cusum_mode=mode, clip=True,
+            ).select('T_statistic')
+            name = f'{mode}_{post_interval}m'
+            variants[name] = image
+            g = graph_stats(image)
+            print(f"{name:<16s} {n_images:>7d} {g['nodes']:>7d} {g['invocations']:>7d} "
+                  f"{g['depth']:>6d} {g['bytes']:>8d}")
+
+    if args.export:
+        print('\nRunning exports...')
+        timings = export_and_time(variants, aoi)
+        print(f"\n{'variant':<16s} {'state':<10s} {'runtime_s':>10s} {'eecu_s':>10s}")
+        for name, t in timings.items():
+            print(f"{name:<16s} {t['state']:<10s} {t['runtime_s']:>10.1f} {str(t['eecu_s']):>10s}")
+
+
+if __name__ == '__main__':
+    main()
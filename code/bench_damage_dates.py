@@ -0,0 +1,132 @@
+"""
+Benchmark the array-based damage-date estimator against the per-building loop.
+
+Generates a synthetic z-score time series (default 1M buildings × 60 post-war
+acquisitions, rows in acquisition-major order as concatenated from the
+per-cell exports), times estimate_damage_date.estimate_damage_dates on all of
+it, times the previous groupby loop (reproduced below) on a random subsample
+of buildings, checks that both give the same output there, and extrapolates
+the loop's runtime to the full set.
+
+Usage:
+    python code/bench_damage_dates.py
+    python code/bench_damage_dates.py --buildings 100000 --dates 30
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent))
+from estimate_damage_date import estimate_damage_dates  # noqa: E402
+
+
+# ---------------------------- previous loop code ----------------------------
+
+
+def estimate_damage_dates_loop(ts_df, z_crit):
+    """Per-building groupby loop from the original Step 5."""
+    ts_df = ts_df.sort_values(["latitude", "longitude", "date"])
+    results = []
+    for (lat, lon), grp in ts_df.groupby(["latitude", "longitude"]):
+        grp = grp.sort_values("date")
+        above = grp["z_max"] > z_crit
+        consecutive = above & above.shift(1, fill_value=False)
+        if consecutive.any():
+            first_idx = consecutive.idxmax()
+            prev_idx = grp.index[grp.index.get_loc(first_idx) - 1]
+            damage_date = grp.loc[prev_idx, "date"]
+            peak_z = grp.loc[first_idx, "z_max"]
+        elif above.any():
+            first_idx = above.idxmax()
+            damage_date = grp.loc[first_idx, "date"]
+            peak_z = grp.loc[first_idx, "z_max"]
+        else:
+            damage_date = pd.NaT
+            peak_z = grp["z_max"].max()
+        results.append(
+            {
+                "latitude": lat,
+                "longitude": lon,
+                "estimated_damage_date": damage_date,
+                "peak_z": peak_z,
+                "n_exceedances": above.sum(),
+                "n_acquisitions": len(grp),
+            }
+        )
+    return pd.DataFrame(results)
+
+
+# ------------------------------ synthetic data ------------------------------
+
+
+def synthetic_timeseries(n_buildings, n_dates, damaged_frac=0.2, missing_frac=0.05, seed=0):
+    """Long (latitude, longitude, date, z_max) table, one block of rows per acquisition."""
+    rng = np.random.default_rng(seed)
+    side = int(np.ceil(np.sqrt(n_buildings)))
+    idx = np.arange(n_buildings)
+    lat = 30.0 + (idx // side) * 1e-4
+    lon = 50.0 + (idx % side) * 1e-4
+    dates = np.datetime64("2026-03-01", "ms") + np.arange(n_dates) * np.timedelta64(6, "D")
+
+    # Damaged buildings get a mean shift from a random acquisition onwards
+    onset = np.where(rng.random(n_buildings) < damaged_frac,
+                     rng.integers(0, n_dates, n_buildings), n_dates)
+    z = np.abs(rng.standard_normal((n_dates, n_buildings), dtype=np.float32))
+    z += np.where(np.arange(n_dates)[:, None] >= onset, np.float32(3.0), np.float32(0.0))
+    keep = rng.random((n_dates, n_buildings)) >= missing_frac
+
+    return pd.DataFrame({
+        "latitude": np.broadcast_to(lat, keep.shape)[keep],
+        "longitude": np.broadcast_to(lon, keep.shape)[keep],
+        "date": np.broadcast_to(dates[:, None], keep.shape)[keep],
+        "z_max": z[keep].astype(np.float64),
+    }, copy=False)
+
+
+# ---------------------------------- main ------------------------------------
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Array vs loop damage-date estimation.")
+    parser.add_argument("--buildings", type=int, default=1_000_000)
+    parser.add_argument("--dates", type=int, default=60)
+    parser.add_argument("--loop-sample", type=int, default=2000,
+                        help="Buildings to run the previous loop on (extrapolated)")
+    parser.add_argument("--z-crit", type=float, default=2.576)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    ts_df = synthetic_timeseries(args.buildings, args.dates, seed=args.seed)
+    print(f"Generated {len(ts_df):,} rows ({args.buildings:,} buildings × {args.dates} dates) "
+          f"in {time.perf_counter() - t0:.1f}s")
+
+    t0 = time.perf_counter()
+    result = estimate_damage_dates(ts_df, args.z_crit)
+    t_array = time.perf_counter() - t0
+    print(f"array:  {t_array:8.2f}s  ({len(result):,} buildings, "
+          f"{result['estimated_damage_date'].notna().sum():,} dated)")
+
+    rng = np.random.default_rng(args.seed + 1)
+    sample = result.iloc[rng.choice(len(result), min(args.loop_sample, len(result)), replace=False)]
+    sub = ts_df.merge(sample[["latitude", "longitude"]], on=["latitude", "longitude"])
+    n_sub = len(sample)
+    t0 = time.perf_counter()
+    expected = estimate_damage_dates_loop(sub, args.z_crit)
+    t_loop = time.perf_counter() - t0
+    t_loop_full = t_loop * len(result) / n_sub
+    print(f"loop:   {t_loop:8.2f}s  on {n_sub:,} buildings -> ~{t_loop_full:,.0f}s extrapolated "
+          f"({t_loop_full / t_array:,.0f}x)")
+
+    got = estimate_damage_dates(sub, args.z_crit)
+    pd.testing.assert_frame_equal(got, expected, check_dtype=False)
+    print("outputs match on the subsample")
+
+
+if __name__ == "__main__":
+    main()
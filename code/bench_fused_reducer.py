@@ -0,0 +1,143 @@
+"""
+Benchmark the fused single-pass window reducer against the multi-pass statistics.
+
+Builds ttest and hotelling_t2 for one orbit both ways: the current pwtt
+functions (one combined mean/stdDev/count reduction per window) and the
+previous multi-pass formulation (separate mean, stdDev, count and
+cross-covariance scans), reproduced below. Reports serialized graph sizes and,
+with --export, runs all four as exports over the AOI and compares task runtime
+and EECU usage.
+
+Usage:
+    python code/bench_fused_reducer.py
+    python code/bench_fused_reducer.py --export --aoi 37.949 48.556 38.044 48.622
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import ee
+
+sys.path.insert(0, str(Path(__file__).parent))
+from pwtt import hotelling_t2, lee_filter, ttest, two_tailed_pvalue  # noqa: E402
+from graph_stats import export_and_time, graph_stats  # noqa: E402
+
+
+# ------------------------- previous multi-pass code -------------------------
+
+
+def _windows(s1, inference_start, war_start, pre_interval, post_interval):
+    inference_start = ee.Date(inference_start)
+    pre = s1.filterDate(war_start.advance(ee.Number(pre_interval).multiply(-1), 'month'), war_start)
+    post = s1.filterDate(inference_start, inference_start.advance(post_interval, 'month'))
+    return pre, post
+
+
+def ttest_multipass(s1, inference_start, war_start, pre_interval, post_interval):
+    """Welch t-test with one collection scan per statistic."""
+    pre, post = _windows(s1, inference_start, war_start, pre_interval, post_interval)
+    pre_mean, post_mean = pre.mean(), post.mean()
+    pre_sd, post_sd = pre.reduce(ee.Reducer.stdDev()), post.reduce(ee.Reducer.stdDev())
+    pre_n, post_n = pre.select('VV').count(), post.select('VV').count()
+
+    var_pre_n = pre_sd.pow(2).divide(pre_n)
+    var_post_n = post_sd.pow(2).divide(post_n)
+    sum_var = var_pre_n.add(var_post_n)
+    df = sum_var.pow(2).divide(
+        var_pre_n.pow(2).divide(pre_n.subtract(1)).add(var_post_n.pow(2).divide(post_n.subtract(1))))
+    change = post_mean.subtract(pre_mean).divide(sum_var.sqrt()).abs()
+    p_values = two_tailed_pvalue(change).rename(['VV_pvalue', 'VH_pvalue'])
+    valid_mask = pre_n.gte(3).And(post_n.gte(2))
+    return change.updateMask(valid_mask).addBands(p_values.updateMask(valid_mask)) \
+        .addBands(pre_n.toFloat().rename('n_pre')).addBands(post_n.toFloat().rename('n_post')) \
+        .addBands(df.rename(['df_VV', 'df_VH']).updateMask(valid_mask).toFloat())
+
+
+def hotelling_multipass(s1, inference_start, war_start, pre_interval, post_interval):
+    """Hotelling T² with separate mean, stdDev, count and cross-covariance scans."""
+    pre, post = _windows(s1, inference_start, war_start, pre_interval, post_interval)
+    pre_mean, post_mean = pre.mean(), post.mean()
+    pre_n, post_n = pre.select('VV').count(), post.select('VV').count()
+    pre_sd, post_sd = pre.reduce(ee.Reducer.stdDev()), post.reduce(ee.Reducer.stdDev())
+
+    def cross_cov(coll, mean, n):
+        return coll.map(lambda img:
+            img.select('VV').subtract(mean.select('VV'))
+            .multiply(img.select('VH').subtract(mean.select('VH'))).rename('cov')
+        ).mean().multiply(n).divide(n.subtract(1))
+
+    pre_cov, post_cov = cross_cov(pre, pre_mean, pre_n), cross_cov(post, post_mean, post_n)
+    denom = pre_n.add(post_n).subtract(2)
+
+    def pool(pre_v, post_v):
+        return pre_v.multiply(pre_n.subtract(1)).add(post_v.multiply(post_n.subtract(1))).divide(denom)
+
+    s11 = pool(pre_sd.select('VV_stdDev').pow(2), post_sd.select('VV_stdDev').pow(2))
+    s22 = pool(pre_sd.select('VH_stdDev').pow(2), post_sd.select('VH_stdDev').pow(2))
+    s12 = pool(pre_cov, post_cov)
+    det = s11.multiply(s22).subtract(s12.pow(2)).max(ee.Image.constant(1e-10))
+    d_vv = post_mean.select('VV').subtract(pre_mean.select('VV'))
+    d_vh = post_mean.select('VH').subtract(pre_mean.select('VH'))
+    quad = d_vv.pow(2).multiply(s22).subtract(d_vv.multiply(d_vh).multiply(s12).multiply(2)) \
+        .add(d_vh.pow(2).multiply(s11)).divide(det)
+    t2 = pre_n.multiply(post_n).divide(pre_n.add(post_n)).multiply(quad)
+    valid_mask = pre_n.gte(3).And(post_n.gte(2))
+    return t2.sqrt().rename('T2').addBands(t2.multiply(-0.5).exp().rename('p_value')) \
+        .updateMask(valid_mask)
+
+
+# ---------------------------------- main ------------------------------------
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fused vs multi-pass window statistics.')
+    parser.add_argument('--aoi', nargs=4, type=float, default=[37.949, 48.556, 38.044, 48.622],
+                        help='Bounding box: xmin ymin xmax ymax (default: Bakhmut)')
+    parser.add_argument('--war-start', default='2022-02-22')
+    parser.add_argument('--inference-start', default='2024-07-01')
+    parser.add_argument('--pre-interval', type=int, default=12)
+    parser.add_argument('--post-interval', type=int, default=1)
+    parser.add_argument('--export', action='store_true',
+                        help='Also run each variant as an export task and compare runtimes')
+    parser.add_argument('--project', default='ggmap-325812', help='GEE cloud project ID')
+    args = parser.parse_args()
+
+    ee.Initialize(project=args.project)
+
+    aoi = ee.Geometry.Rectangle(args.aoi)
+    war_start = ee.Date(args.war_start)
+    inference_start = ee.Date(args.inference_start)
+    s1 = ee.ImageCollection('COPERNICUS/S1_GRD_FLOAT') \
+        .filter(ee.Filter.listContains('transmitterReceiverPolarisation', 'VH')) \
+        .filter(ee.Filter.eq('instrumentMode', 'IW')) \
+        .filterBounds(aoi)
+    orbit = s1.filterDate(inference_start, inference_start.advance(args.post_interval, 'month')) \
+        .aggregate_array('relativeOrbitNumber_start').distinct().get(0).getInfo()
+    s1 = s1.filter(ee.Filter.eq('relativeOrbitNumber_start', orbit)) \
+        .map(lee_filter).select(['VV', 'VH']).map(lambda image: image.log())
+    print(f'Orbit {orbit}')
+
+    window = (inference_start, war_start, args.pre_interval, args.post_interval)
+    variants = {
+        'ttest_fused': ttest(s1, *window, ttest_type='welch'),
+        'ttest_multipass': ttest_multipass(s1, *window),
+        'hotelling_fused': hotelling_t2(s1, *window),
+        'hotelling_multipass': hotelling_multipass(s1, *window),
+    }
+
+    print(f"\n{'variant':<22s} {'nodes':>7s} {'invoc':>7s} {'depth':>6s} {'bytes':>8s}")
+    for name, image in variants.items():
+        g = graph_stats(image)
+        print(f"{name:<22s} {g['nodes']:>7d} {g['invocations']:>7d} {g['depth']:>6d} {g['bytes']:>8d}")
+
+    if args.export:
+        print('\nRunning exports...')
+        timings = export_and_time(variants, aoi)
+        print(f"\n{'variant':<22s} {'state':<10s} {'runtime_s':>10s} {'eecu_s':>10s}")
+        for name, t in timings.items():
+            print(f"{name:<22s} {t['state']:<10s} {t['runtime_s']:>10.1f} {str(t['eecu_s']):>10s}")
+
+
+if __name__ == '__main__':
+    main()
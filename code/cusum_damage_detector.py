@@ -4,7 +4,10 @@ Reads one or more CSVs with columns (system:time_start, VH, VV, ...), fuses VV
 and VH into a Mahalanobis magnitude m_t against a robust (median/MAD) pre-war
 baseline, runs Page's one-sided CUSUM with a persistence guard, reports the
 detection date and Page's change-point estimate, and writes a two-panel figure
-per input.
+per input. `detect_batch` runs the same detector over a padded
+(n_series, T) array, for per-building series in the hundreds of thousands.
+
+Inputs may also be Parquet files (see `load`).
 
 Usage:
     python code/cusum_damage_detector.py data/no_speckle.csv data/speckle.csv
@@ -108,12 +111,165 @@ def detect(times: pd.DatetimeIndex, vv: np.ndarray, vh: np.ndarray,
     return DetectorResult(times, m, s, alarm_idx, tau_hat_idx, cfg)
 
 
+# ------------------------------ batch engine --------------------------------
+
+
+@dataclass
+class BatchResult:
+    lengths: np.ndarray      # (n_series,) valid observations per row
+    m: np.ndarray            # (n_series, T) fused magnitude, NaN past length
+    s: np.ndarray            # (n_series, T) CUSUM statistic, NaN past length
+    crossing_idx: np.ndarray  # first index with S_t > h, -1 if none
+    alarm_idx: np.ndarray    # persistence-guarded alarm, -1 if none
+    tau_hat_idx: np.ndarray  # Page's change-point estimate, -1 if no alarm
+    cfg: DetectorConfig
+
+
+def pad_series(df: pd.DataFrame, key: str, order: str,
+               cols: list[str]) -> tuple[np.ndarray, np.ndarray, list[np.ndarray]]:
+    """Long (key, order, cols...) table → (keys, lengths, [(n_keys, T_max) arrays]).
+
+    Each key's rows are sorted by `order` and left-aligned; positions past the
+    key's length are NaN, the layout `detect_batch` and `cusum_batch` expect.
+    """
+    df = df.sort_values([key, order], kind="stable")
+    keys, codes = np.unique(df[key].to_numpy(), return_inverse=True)
+    lengths = np.bincount(codes, minlength=len(keys))
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    pos = np.arange(len(df)) - starts[codes]
+    t_max = int(lengths.max()) if len(lengths) else 0
+    out = []
+    for c in cols:
+        a = np.full((len(keys), t_max), np.nan)
+        a[codes, pos] = df[c].to_numpy(dtype=float)
+        out.append(a)
+    return keys, lengths, out
+
+
+def cusum_batch(m: np.ndarray, k: float) -> np.ndarray:
+    """Row-wise `cusum` of a (n_series, T) array, one vector step per time index.
+
+    NaN inputs give S_t = 0 at that step, like max(0.0, nan) in `cusum`.
+    """
+    m = np.asarray(m, dtype=float)
+    s = np.zeros_like(m)
+    for t in range(1, m.shape[1]):
+        x = s[:, t - 1] + (m[:, t] - k)
+        s[:, t] = np.where(x > 0, x, 0.0)
+    return s
+
+
+def _robust_z_rows(x: np.ndarray, ref: np.ndarray) -> np.ndarray:
+    """Row-wise `robust_z`: median/MAD of each row of ref, same fallbacks."""
+    med = np.median(ref, axis=1)
+    mad = np.median(np.abs(ref - med[:, None]), axis=1)
+    sd = np.std(ref, axis=1)
+    scale = np.where(mad > 0, 1.4826 * mad, np.where(sd != 0, sd, 1.0))
+    return (x - med[:, None]) / scale[:, None]
+
+
+def _magnitude_rows(vv: np.ndarray, vh: np.ndarray, n_ref: int) -> np.ndarray:
+    """`robust_z` + `mahalanobis_magnitude` for equal-length rows (n_series, n)."""
+    n_ref = min(n_ref, vv.shape[1])   # slice(0, n_ref) clips, as in `detect`
+    if n_ref < 2:
+        # np.cov of a single observation is NaN, so `detect` gives NaN magnitudes
+        return np.full(vv.shape, np.nan)
+    z_vv = _robust_z_rows(vv, vv[:, :n_ref])
+    z_vh = _robust_z_rows(vh, vh[:, :n_ref])
+    Z = np.stack([z_vv, z_vh], axis=2)                      # (g, n, 2)
+    X = Z[:, :n_ref].transpose(0, 2, 1)                     # (g, 2, n_ref), as np.cov
+    X = X - X.mean(axis=2, keepdims=True)
+    cov = np.matmul(X, X.transpose(0, 2, 1)) * (1.0 / (n_ref - 1))
+    cov += 1e-6 * np.eye(2)
+    inv = np.linalg.inv(cov)
+    quad = np.einsum("gij,gjk,gik->gi", Z, inv, Z)
+    quad = np.clip(quad, 0, None)
+    return np.sqrt(quad)
+
+
+def _persistence_ok(m: np.ndarray, k: float, p: int,
+                    lengths: np.ndarray) -> np.ndarray:
+    """(n_series, T) mask: m_t..m_{t+p-1} all > k, window inside the series."""
+    n_series, T = m.shape
+    above = np.zeros((n_series, T + 1), dtype=np.int64)
+    np.cumsum(m > k, axis=1, out=above[:, 1:])
+    ends = np.minimum(np.arange(T) + p, T)
+    return (above[:, ends] - above[:, :T] == p) & (np.arange(T) + p <= lengths[:, None])
+
+
+def detect_batch(vv: np.ndarray, vh: np.ndarray, cfg: DetectorConfig,
+                 lengths: np.ndarray | None = None) -> BatchResult:
+    """`detect` for many series at once.
+
+    vv, vh: (n_series, T) arrays, each row left-aligned and padded past its
+    length (NaN padding, as from `pad_series`). lengths defaults to the count
+    of non-NaN VV values per row. Rows are grouped by length so the reference
+    slice and baseline statistics are computed per group in single array
+    operations; the CUSUM recursion is one vector step per time index over all
+    rows. Indices use -1 for "none" where `detect` returns None.
+    """
+    vv = np.asarray(vv, dtype=float)
+    vh = np.asarray(vh, dtype=float)
+    n_series, T = vv.shape
+    if lengths is None:
+        lengths = (~np.isnan(vv)).sum(axis=1)
+    lengths = np.asarray(lengths, dtype=np.int64)
+
+    # 1-2. Robust z-scores and fused magnitude, per group of equal length
+    m = np.full((n_series, T), np.nan)
+    for n in np.unique(lengths):
+        if n == 0:
+            continue
+        rows = np.flatnonzero(lengths == n)
+        n_ref = max(10, int(cfg.ref_frac * n))
+        m[rows, :n] = _magnitude_rows(vv[rows, :n], vh[rows, :n], n_ref)
+
+    # 3. CUSUM (NaN padding only follows the valid prefix, so it never feeds back)
+    s = cusum_batch(m, cfg.k)
+    valid = np.arange(T) < lengths[:, None]
+    s[~valid] = np.nan
+
+    def first_true(mask):
+        return np.where(mask.any(axis=1), mask.argmax(axis=1), -1)
+
+    # 4. Alarm + persistence guard
+    run_ok = _persistence_ok(m, cfg.k, cfg.persistence, lengths)
+    crossing = valid & (s > cfg.h)
+    crossing_idx = first_true(crossing)
+    alarm_idx = first_true(crossing & run_ok)
+
+    # 5. Page's change-point estimator: last reset to 0 at or before alarm, plus one
+    last_zero = np.maximum.accumulate(np.where(s == 0, np.arange(T), -1), axis=1)
+    has_alarm = alarm_idx >= 0
+    tau_hat_idx = np.full(n_series, -1, dtype=np.int64)
+    rows = np.flatnonzero(has_alarm)
+    tau_hat_idx[rows] = np.minimum(last_zero[rows, alarm_idx[rows]] + 1, lengths[rows] - 1)
+
+    return BatchResult(lengths, m, s, crossing_idx, alarm_idx, tau_hat_idx, cfg)
+
+
 # ----------------------------- io / plotting --------------------------------
 
 
-def load(path: Path) -> tuple[pd.DatetimeIndex, np.ndarray, np.ndarray]:
-    df = pd.read_csv(path)
-    df["time"] = pd.to_datetime(df["system:time_start"], format="%b %d, %Y")
+def load(path: Path, filters=None) -> tuple[pd.DatetimeIndex, np.ndarray, np.ndarray]:
+    """Read one series from a CSV, or from a Parquet file / dataset directory.
+
+    Parquet input (needs pyarrow) is either a chart export with
+    system:time_start or the estimate_damage_date.py time-series dataset with
+    date_millis; `filters` (pyarrow DNF, e.g. [("h3_cell", "==", cell),
+    ("latitude", "==", lat), ("longitude", "==", lon)]) selects one building
+    without reading the rest.
+    """
+    path = Path(path)
+    if path.is_dir() or path.suffix == ".parquet":
+        df = pd.read_parquet(path, filters=filters)
+        if "date_millis" in df:
+            df["time"] = pd.to_datetime(df["date_millis"], unit="ms")
+        else:
+            df["time"] = pd.to_datetime(df["system:time_start"])
+    else:
+        df = pd.read_csv(path)
+        df["time"] = pd.to_datetime(df["system:time_start"], format="%b %d, %Y")
     df = df.sort_values("time").reset_index(drop=True)
     return pd.DatetimeIndex(df["time"]), df["VV"].to_numpy(), df["VH"].to_numpy()
 
@@ -174,40 +330,213 @@ def summarize(label: str, result: DetectorResult) -> dict:
     }
 
 
-# --------------------------------- main -------------------------------------
+# ---------------------------- ARL0 calibration ------------------------------
+
+
+ARL_TABLE = Path("data/arl0_table.csv")
+ARL_KEY = ["k", "h", "persistence", "seed", "n_runs", "run_len", "target_arl0"]
+_CHUNK = 1000       # runs per RNG stream / worker task; fixed so results
+                    # do not depend on the number of workers
+_BLOCK = 32         # steps between dropping runs that have crossed h_max
+_ENVELOPES: dict = {}
+
+
+def _envelope_chunk(k: float, h_max: float, persistence: int, run_len: int,
+                    n: int, seed_seq: np.random.SeedSequence) -> tuple[np.ndarray, np.ndarray]:
+    """Simulate n in-control runs; return the distinct running-max values <= h_max and counts.
+
+    For each run the envelope E_t = max over u <= t of the alarm-eligible S_u
+    (S_u with the persistence guard holding, -inf otherwise) is non-decreasing,
+    so the run length at any h <= h_max is #{t : E_t <= h}. Pooling every
+    run's envelope values therefore gives ARL0(h) for all such h from one
+    simulation. Runs stop once E_t > h_max.
+    """
+    rng = np.random.default_rng(seed_seq)
+    z = rng.standard_normal((n, run_len, 2))
+    m = np.sqrt((z ** 2).sum(axis=2))
+    guard = _persistence_ok(m, k, persistence, np.full(n, run_len))
+
+    env = np.full((n, run_len), np.inf)
+    rows = np.arange(n)
+    s = np.zeros(n)
+    peak = np.where(guard[:, 0], 0.0, -np.inf)
+    env[:, 0] = peak
+    for b0 in range(1, run_len, _BLOCK):
+        for t in range(b0, min(b0 + _BLOCK, run_len)):
+            x = s + (m[rows, t] - k)
+            s = np.where(x > 0, x, 0.0)
+            peak = np.maximum(peak, np.where(guard[rows, t], s, -np.inf))
+            env[rows, t] = peak
+        keep = peak <= h_max
+        rows, s, peak = rows[keep], s[keep], peak[keep]
+        if not len(rows):
+            break
+
+    return np.unique(env[env <= h_max], return_counts=True)
+
+
+def simulate_envelope(k: float, h_max: float, persistence: int = 0, seed: int = 0,
+                      n_runs: int = 10_000, run_len: int = 1000,
+                      workers: int = 1) -> tuple[np.ndarray, np.ndarray]:
+    """Pooled envelope over n_runs simulated runs: (sorted values, cumulative counts).
+
+    Runs are simulated _CHUNK at a time, each chunk with its own stream from
+    SeedSequence(seed).spawn, optionally across `workers` processes. Results
+    are cached in memory, so repeated queries with h <= h_max are free.
+    """
+    key = (k, persistence, seed, n_runs, run_len)
+    cached = _ENVELOPES.get(key)
+    if cached is not None and cached[0] >= h_max:
+        return cached[1], cached[2]
+
+    sizes = [min(_CHUNK, n_runs - i) for i in range(0, n_runs, _CHUNK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(k, h_max, persistence, run_len, n, ss) for n, ss in zip(sizes, seeds)]
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(workers) as pool:
+            parts = list(pool.map(_envelope_chunk, *zip(*jobs)))
+    else:
+        parts = [_envelope_chunk(*j) for j in jobs]
+
+    values = np.concatenate([v for v, _ in parts])
+    counts = np.concatenate([c for _, c in parts])
+    order = np.argsort(values, kind="stable")
+    values, cum = values[order], np.cumsum(counts[order])
+    _ENVELOPES[key] = (h_max, values, cum)
+    return values, cum
+
+
+def arl0_at(values: np.ndarray, cum: np.ndarray, h: float, n_runs: int) -> float:
+    """Mean run length at decision interval h from a pooled envelope."""
+    i = np.searchsorted(values, h, side="right")
+    return float(cum[i - 1]) / n_runs if i else 0.0
+
+
+def _table_lookup(table: Path, row: dict) -> float | None:
+    if not table.exists():
+        return None
+    df = pd.read_csv(table)
+    solved = not np.isnan(row["target_arl0"])
+    hit = np.ones(len(df), dtype=bool)
+    for c in ARL_KEY:
+        if solved and c == "h":
+            continue
+        hit &= np.isclose(df[c], row[c], equal_nan=True, rtol=0, atol=1e-12)
+    if not hit.any():
+        return None
+    # Direct calibrations store ARL0 at h; solver rows store h for a target ARL0
+    return float(df.loc[hit, "h" if solved else "arl0"].iloc[-1])
+
+
+def _table_append(table: Path, row: dict) -> None:
+    table.parent.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame([row]).to_csv(table, mode="a", header=not table.exists(), index=False)
 
 
 def calibrate_arl0(cfg: DetectorConfig, n_runs: int = 10_000,
-                   run_len: int = 1000, seed: int = 0) -> float:
-    """Empirical ARL0 by simulating bivariate N(0, I) → m_t = sqrt(chi^2_2)."""
-    rng = np.random.default_rng(seed)
-    run_lengths = []
-    for _ in range(n_runs):
-        z = rng.standard_normal((run_len, 2))
-        m = np.sqrt((z ** 2).sum(axis=1))
-        s = cusum(m, cfg.k)
-        crossings = np.where(s > cfg.h)[0]
-        run_lengths.append(crossings[0] if len(crossings) else run_len)
-    return float(np.mean(run_lengths))
+                   run_len: int = 1000, seed: int = 0, guarded: bool = False,
+                   workers: int = 1, table: Path | None = None) -> float:
+    """Empirical ARL0 by simulating bivariate N(0, I) → m_t = sqrt(chi^2_2).
+
+    Run length is the index of the first S_t > h (with the persistence guard
+    if `guarded`), run_len if none. With `table` (a CSV path, e.g. ARL_TABLE),
+    answers are read from / appended to it, keyed by (k, h, persistence, seed,
+    n_runs, run_len); persistence is recorded as 0 for unguarded runs.
+    """
+    persistence = cfg.persistence if guarded else 0
+    row = dict(k=cfg.k, h=cfg.h, persistence=persistence, seed=seed,
+               n_runs=n_runs, run_len=run_len, target_arl0=np.nan)
+    if table is not None:
+        hit = _table_lookup(table, row)
+        if hit is not None:
+            return hit
+
+    values, cum = simulate_envelope(cfg.k, cfg.h, persistence, seed, n_runs, run_len, workers)
+    arl0 = arl0_at(values, cum, cfg.h, n_runs)
+    if table is not None:
+        _table_append(table, dict(row, arl0=arl0))
+    return arl0
+
+
+def solve_h(k: float, target_arl0: float, persistence: int = 0, seed: int = 0,
+            n_runs: int = 10_000, run_len: int = 1000, workers: int = 1,
+            h_max: float = 10.0, tol: float = 1e-4,
+            table: Path | None = None) -> float:
+    """Decision interval h giving ARL0 >= target_arl0 for reference value k.
+
+    Bisection on h over one cached simulation (see `simulate_envelope`);
+    h_max is doubled and the simulation extended until it brackets the target.
+    `table` caches solutions as in `calibrate_arl0`.
+    """
+    if target_arl0 >= run_len:
+        raise ValueError(f"target_arl0 ({target_arl0}) must be below run_len ({run_len}); "
+                         "runs are censored at run_len")
+    row = dict(k=k, h=np.nan, persistence=persistence, seed=seed,
+               n_runs=n_runs, run_len=run_len, target_arl0=target_arl0)
+    if table is not None:
+        hit = _table_lookup(table, row)
+        if hit is not None:
+            return hit
+
+    def arl(h):
+        return arl0_at(*simulate_envelope(k, h_max, persistence, seed, n_runs, run_len, workers),
+                       h, n_runs)
+
+    while arl(h_max) < target_arl0:
+        h_max *= 2
+    lo, hi = 0.0, h_max
+    while hi - lo > tol:
+        mid = 0.5 * (lo + hi)
+        if arl(mid) >= target_arl0:
+            hi = mid
+        else:
+            lo = mid
+
+    if table is not None:
+        _table_append(table, dict(row, h=hi, arl0=arl(hi)))
+    return hi
+
+
+# --------------------------------- main -------------------------------------
 
 
 def main() -> None:
     p = argparse.ArgumentParser()
-    p.add_argument("csvs", nargs="+", type=Path)
+    p.add_argument("csvs", nargs="*", type=Path)
     p.add_argument("--k", type=float, default=2.0)
     p.add_argument("--h", type=float, default=5.0)
     p.add_argument("--persistence", type=int, default=3)
     p.add_argument("--out-dir", type=Path, default=Path("data"))
     p.add_argument("--calibrate", action="store_true",
                    help="run Monte-Carlo ARL0 estimate and exit")
+    p.add_argument("--target-arl0", type=float, default=None,
+                   help="with --calibrate: solve for h giving this ARL0 at --k")
+    p.add_argument("--guarded", action="store_true",
+                   help="with --calibrate: count alarms only when the persistence guard holds")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--n-runs", type=int, default=10_000)
+    p.add_argument("--run-len", type=int, default=1000)
+    p.add_argument("--workers", type=int, default=1)
+    p.add_argument("--arl-table", type=Path, default=ARL_TABLE,
+                   help=f"with --calibrate: CSV of earlier answers to reuse and extend (default: {ARL_TABLE})")
     args = p.parse_args()
 
     cfg = DetectorConfig(k=args.k, h=args.h, persistence=args.persistence)
 
     if args.calibrate:
-        arl0 = calibrate_arl0(cfg)
-        print(f"Empirical ARL0 (k={cfg.k}, h={cfg.h}): {arl0:.0f} obs")
+        sim = dict(seed=args.seed, n_runs=args.n_runs, run_len=args.run_len,
+                   workers=args.workers, table=args.arl_table)
+        if args.target_arl0 is not None:
+            h = solve_h(cfg.k, args.target_arl0,
+                        persistence=cfg.persistence if args.guarded else 0, **sim)
+            print(f"h for ARL0 = {args.target_arl0:.0f} (k={cfg.k}): {h:.4f}")
+        else:
+            arl0 = calibrate_arl0(cfg, guarded=args.guarded, **sim)
+            print(f"Empirical ARL0 (k={cfg.k}, h={cfg.h}): {arl0:.0f} obs")
         return
+    if not args.csvs:
+        p.error("csvs are required unless --calibrate is given")
 
     rows = []
     for csv in args.csvs:
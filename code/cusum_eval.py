@@ -27,9 +27,10 @@ import pandas as pd
 from sklearn.metrics import auc, f1_score, precision_recall_curve, roc_curve
 
 sys.path.insert(0, str(Path(__file__).parent))
-from cusum_damage_detector import cusum  # noqa: E402
+from cusum_damage_detector import cusum_batch, pad_series  # noqa: E402
 from eval import CITIES, run_evaluation  # noqa: E402
 from pwtt import detect_damage  # noqa: E402
+from pwtt.fetch import fetch_columns  # noqa: E402
 
 ee.Initialize(project="ggmap-325812")
 
@@ -150,18 +151,10 @@ def pull_timeseries(zscore_ic: ee.ImageCollection,
     all_obs = ee.FeatureCollection(zscore_ic.map(reduce_one)).flatten()
     all_obs = all_obs.filter(ee.Filter.notNull(["VV", "VH"]))
 
-    rows = []
-    page_size = 5000
     total = all_obs.size().getInfo()
     print(f"    pulling {total:,} (building × date) observations...")
-    offset = 0
-    while offset < total:
-        page = all_obs.toList(page_size, offset).getInfo()
-        for f in page:
-            p = f["properties"]
-            rows.append((p["bid"], p["class"], p["date"], p["VV"], p["VH"]))
-        offset += page_size
-    return pd.DataFrame(rows, columns=["bid", "class", "date", "VV", "VH"])
+    cols = ["bid", "class", "date", "VV", "VH"]
+    return pd.DataFrame(fetch_columns(all_obs, cols, total=total))
 
 
 # ------------------------------ scoring -------------------------------------
@@ -171,21 +164,17 @@ def cusum_score_per_building(df: pd.DataFrame,
                              k: float = 2.0) -> pd.DataFrame:
     """For each building, compute fused magnitude m_t = sqrt(VV²+VH²),
     then max CUSUM as the damage score."""
-    out = []
-    for bid, g in df.sort_values("date").groupby("bid"):
-        vv = g["VV"].to_numpy()
-        vh = g["VH"].to_numpy()
-        m = np.sqrt(vv ** 2 + vh ** 2)
-        s = cusum(m, k)
-        out.append({
-            "bid": bid,
-            "class": int(g["class"].iloc[0]),
-            "n_obs": len(m),
-            "max_m": float(m.max()) if len(m) else np.nan,
-            "max_cusum": float(s.max()) if len(s) else np.nan,
-            "mean_m": float(m.mean()) if len(m) else np.nan,
-        })
-    return pd.DataFrame(out)
+    bids, n_obs, (vv, vh, cls) = pad_series(df, "bid", "date", ["VV", "VH", "class"])
+    m = np.sqrt(vv ** 2 + vh ** 2)
+    s = cusum_batch(m, k)       # padding past each series' end gives S_t = 0
+    return pd.DataFrame({
+        "bid": bids,
+        "class": cls[:, 0].astype(int),
+        "n_obs": n_obs,
+        "max_m": np.nanmax(m, axis=1),
+        "max_cusum": s.max(axis=1),
+        "mean_m": np.nanmean(m, axis=1),
+    })
 
 
 def auc_only(labels, scores, weights=None):
@@ -225,17 +214,8 @@ def pwtt_t_scores(sample: ee.FeatureCollection, bounds: ee.Geometry,
     ).filter(ee.Filter.notNull(["T_statistic"]))
     fc = fc.select(["bid", "class", "T_statistic"], None, False)
 
-    rows = []
-    total = fc.size().getInfo()
-    page_size = 5000
-    offset = 0
-    while offset < total:
-        page = fc.toList(page_size, offset).getInfo()
-        for f in page:
-            p = f["properties"]
-            rows.append((p["bid"], p["class"], p["T_statistic"]))
-        offset += page_size
-    return pd.DataFrame(rows, columns=["bid", "class", "t"])
+    cols = fetch_columns(fc, ["bid", "class", "T_statistic"])
+    return pd.DataFrame({"bid": cols["bid"], "class": cols["class"], "t": cols["T_statistic"]})
 
 
 # ---------------------------------- main ------------------------------------
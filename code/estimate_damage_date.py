@@ -2,13 +2,21 @@
 Estimate the date of damage for flagged buildings by downloading per-orbit
 normalized z-score time series from Sentinel-1.
 
-Reads the damage points CSV, filters to T_statistic > threshold, then for
-each H3 cell queries EE for the orbit-normalized VV/VH z-scores at every
-post-war acquisition date. Exports one CSV per cell to Google Drive, then
-downloads and concatenates them locally. Finally, estimates a damage date
+Reads the damage points CSV, filters to T_statistic > threshold, then
+queries EE for the orbit-normalized VV/VH z-scores at every post-war
+acquisition date of each point. Neighbouring H3 cells are grouped into
+bundles of up to --max-rows expected rows, and each bundle is exported as
+one CSV to Google Drive from a single z-score collection over the bundle's
+cells. The CSVs are then downloaded and concatenated locally. Finally, estimates a damage date
 per building as the first post-war image where max(|z_vv|, |z_vh|) > z_crit
 for two consecutive acquisitions.
 
+The downloaded time series are stored as a Parquet dataset partitioned by
+h3_cell and orbit (int64 date_millis, float32 z-scores; needs pyarrow), next
+to the output as <output>_timeseries/. Cells already in the dataset are not
+downloaded again, and read_timeseries() loads only the requested columns,
+cells and orbits.
+
 Usage:
     python code/estimate_damage_date.py \
         --csv data/iran_damage_points_v20260410.csv \
@@ -19,11 +27,14 @@ Usage:
 
 import argparse
 import ee
+import hashlib
 import os
-import time
 import pandas as pd
 import numpy as np
 
+from pwtt.autosplit import is_resource_error
+from pwtt.scheduler import DEFAULT_MAX_CONCURRENT, Scheduler, escalate
+
 
 def get_s1_base():
     """Base Sentinel-1 collection (log-scale VV/VH, IW mode)."""
@@ -72,11 +83,13 @@ def build_zscore_collection(aoi, war_start, pre_months=12):
     return ee.ImageCollection(orbits.map(normalize_orbit).flatten())
 
 
-def sample_zscore_timeseries(zscore_coll, points_fc, war_start, scale=10):
+def sample_zscore_timeseries(zscore_coll, points_fc, war_start, scale=10, tile_scale=1):
     """Sample the z-score collection at point locations for post-war dates.
 
     Returns an EE FeatureCollection with one row per (point, date) pair,
     containing: latitude, longitude, date_millis, z_vv, z_vh, orbit.
+    tile_scale is passed to sampleRegions (raised on retry after out-of-memory
+    failures).
     """
     post = zscore_coll.filterDate(war_start, ee.Date("2099-01-01"))
 
@@ -87,6 +100,7 @@ def sample_zscore_timeseries(zscore_coll, points_fc, war_start, scale=10):
         sampled = img.select(["VV", "VH"]).sampleRegions(
             collection=points_fc,
             scale=scale,
+            tileScale=tile_scale,
             geometries=False,
         )
         return sampled.map(
@@ -96,6 +110,204 @@ def sample_zscore_timeseries(zscore_coll, points_fc, war_start, scale=10):
     return post.map(sample_one_image).flatten()
 
 
+TS_COLUMNS = ["latitude", "longitude", "date_millis", "orbit", "VV", "VH"]
+TS_DTYPES = {
+    "latitude": "float64",
+    "longitude": "float64",
+    "date_millis": "int64",
+    "orbit": "float64",  # may be empty in the CSV; -1 marks a missing orbit
+    "VV": "float32",
+    "VH": "float32",
+}
+
+
+def plan_bundles(counts, rows_per_point, max_rows, parent_res=None):
+    """Group H3 cells into export bundles of at most max_rows expected rows.
+
+    counts maps cell -> number of points; a point is expected to produce
+    rows_per_point rows (one per post-war acquisition). Cells are taken in
+    order of their parent at parent_res (default: two levels coarser), so a
+    bundle covers neighbouring cells, and a cell over the budget gets a
+    bundle of its own. Returns (name, cells) pairs. A bundle's name
+    zscore_b<hash> depends only on its cells, so re-running with the same
+    points gives the same names and the task database can skip the
+    bundles already exported.
+    """
+    import h3
+
+    def locality(cell):
+        res = h3.get_resolution(cell)
+        return h3.cell_to_parent(cell, max(res - 2, 0) if parent_res is None else parent_res), cell
+
+    bundles, current, rows = [], [], 0
+    for cell in sorted(counts, key=locality):
+        n = counts[cell] * rows_per_point
+        if current and rows + n > max_rows:
+            bundles.append(current)
+            current, rows = [], 0
+        current.append(cell)
+        rows += n
+    if current:
+        bundles.append(current)
+    return [(bundle_name(cells), cells) for cells in bundles]
+
+
+def bundle_name(cells):
+    return "zscore_b" + hashlib.sha1(",".join(sorted(cells)).encode()).hexdigest()[:12]
+
+
+def bundle_retry(params, error):
+    """Scheduler retry policy: halve a bundle that runs out of memory, else escalate tileScale."""
+    cells = params["cells"]
+    if is_resource_error(error) and len(cells) > 1:
+        half = len(cells) // 2
+        return [dict(params, name=f"{params['name']}_{i}", cells=part)
+                for i, part in enumerate((cells[:half], cells[half:]))]
+    return escalate(params, error)
+
+
+def rows_per_point(points, war_start, n_sample=20, seed=0):
+    """Most post-war S1 acquisitions over a sample of the points (one getInfo).
+
+    A heuristic: points where more orbits overlap than at any sampled point
+    produce more rows, so their bundles can exceed max_rows. Such a bundle
+    is halved only after it fails (bundle_retry).
+    """
+    sample = points.sample(min(n_sample, len(points)), random_state=seed)
+    s1 = get_s1_base().filterDate(war_start, ee.Date("2099-01-01"))
+    pts = ee.FeatureCollection([
+        ee.Feature(ee.Geometry.Point([row["longitude"], row["latitude"]]))
+        for _, row in sample.iterrows()
+    ])
+    counts = pts.map(lambda f: f.set("n", s1.filterBounds(f.geometry()).size()))
+    return max(int(counts.aggregate_max("n").getInfo() or 0), 1)
+
+
+def tidy_timeseries(src, cell_id=None):
+    """Parse one exported CSV into typed columns plus h3_cell.
+
+    A per-cell zscore_<cell>.csv takes its cell from cell_id; a bundle's
+    CSV carries an h3_cell column.
+    """
+    if cell_id is None:
+        df = pd.read_csv(src, usecols=TS_COLUMNS + ["h3_cell"], dtype=dict(TS_DTYPES, h3_cell=str))
+    else:
+        df = pd.read_csv(src, usecols=TS_COLUMNS, dtype=TS_DTYPES)
+        df["h3_cell"] = cell_id
+    df["orbit"] = df["orbit"].fillna(-1).astype("int16")
+    return df
+
+
+def tidy_export(src, name, have):
+    """Rows of the exported file name for cells not already in have, or None if there are none."""
+    stem = name[len("zscore_"):].removesuffix(".csv")
+    if stem.startswith("b"):
+        df = tidy_timeseries(src)
+    elif stem in have:
+        return None
+    else:
+        df = tidy_timeseries(src, stem)
+    df = df[~df["h3_cell"].isin(have)]
+    return df if len(df) else None
+
+
+def write_timeseries(df, root):
+    """Append rows to the Parquet dataset at root, partitioned by h3_cell/orbit."""
+    df.to_parquet(root, partition_cols=["h3_cell", "orbit"], index=False)
+
+
+def stored_cells(root):
+    """H3 cells already present in the dataset at root."""
+    if not os.path.isdir(root):
+        return set()
+    return {d.split("=", 1)[1] for d in os.listdir(root) if d.startswith("h3_cell=")}
+
+
+def read_timeseries(root, columns=None, cells=None, orbits=None):
+    """Load the dataset, optionally only some columns / cells / orbits (pushed down)."""
+    filters = []
+    if cells is not None:
+        filters.append(("h3_cell", "in", list(cells)))
+    if orbits is not None:
+        filters.append(("orbit", "in", [int(o) for o in orbits]))
+    return pd.read_parquet(root, columns=columns, filters=filters or None)
+
+
+def estimate_damage_dates(ts_df, z_crit):
+    """Per-building damage date from a long (latitude, longitude, date, z_max) table.
+
+    A building's damage date is the first of two consecutive acquisitions with
+    z_max > z_crit (peak_z is z_max at the second); failing that, its first
+    single exceedance; otherwise NaT with peak_z the series maximum. Rows are
+    sorted once and every building is scored with segment reductions over the
+    sorted arrays, so the cost is one sort regardless of the number of
+    buildings. Returns one row per (latitude, longitude), in sorted order, with
+    columns latitude, longitude, estimated_damage_date, peak_z, n_exceedances,
+    n_acquisitions.
+    """
+    columns = ["latitude", "longitude", "estimated_damage_date", "peak_z",
+               "n_exceedances", "n_acquisitions"]
+    lat = ts_df["latitude"].to_numpy()
+    lon = ts_df["longitude"].to_numpy()
+    order = np.lexsort((ts_df["date"].to_numpy(), lon, lat))
+    # Rows without coordinates are dropped, as groupby does
+    missing = np.isnan(lat) | np.isnan(lon)
+    if missing.any():
+        order = order[~missing[order]]
+    n = len(order)
+    if not n:
+        return pd.DataFrame(columns=columns)
+
+    lat, lon = lat[order], lon[order]
+    new_bldg = np.ones(n, dtype=bool)
+    new_bldg[1:] = (lat[1:] != lat[:-1]) | (lon[1:] != lon[:-1])
+    start = np.flatnonzero(new_bldg)
+    lat, lon = lat[start], lon[start]
+    date = ts_df["date"].to_numpy()[order]
+    z = ts_df["z_max"].to_numpy(dtype=float)[order]
+    del order
+
+    def first_in_building(mask):
+        """Row index of each building's first True, n where there is none."""
+        idx = np.flatnonzero(mask)
+        bldg = np.searchsorted(start, idx, side="right") - 1
+        first = np.full(len(start), n)
+        lead = np.ones(len(idx), dtype=bool)
+        lead[1:] = bldg[1:] != bldg[:-1]
+        first[bldg[lead]] = idx[lead]
+        return first
+
+    above = z > z_crit
+    # Two consecutive exceedances within the same building
+    consecutive = above & ~new_bldg
+    consecutive[1:] &= above[:-1]
+
+    first_consec = first_in_building(consecutive)
+    first_above = first_in_building(above)
+    has_consec = first_consec < n
+    has_above = ~has_consec & (first_above < n)
+
+    damage_date = np.full(len(start), np.datetime64("NaT"), dtype=date.dtype)
+    # Use the date of the first exceedance (one row before the consecutive one)
+    damage_date[has_consec] = date[first_consec[has_consec] - 1]
+    # Single exceedance only — use it but flag as uncertain
+    damage_date[has_above] = date[first_above[has_above]]
+
+    peak_z = np.fmax.reduceat(z, start)
+    peak_z[has_consec] = z[first_consec[has_consec]]
+    peak_z[has_above] = z[first_above[has_above]]
+
+    values = [
+        lat,
+        lon,
+        damage_date,
+        peak_z,
+        np.add.reduceat(above, start, dtype=np.int64),
+        np.diff(np.append(start, n)),
+    ]
+    return pd.DataFrame(dict(zip(columns, values)))
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Estimate damage dates from orbit-normalized S1 z-scores."
@@ -125,13 +337,52 @@ def main():
         help="Z-score threshold for damage detection (default: 2.576 = 99%% CI)",
     )
     parser.add_argument(
-        "--output", default="data/iran_damage_dates.csv", help="Output CSV path"
+        "--output",
+        default="data/iran_damage_dates.csv",
+        help="Output path (.csv, or .parquet for a typed Parquet file)",
+    )
+    parser.add_argument(
+        "--timeseries-dir",
+        default=None,
+        help="Parquet dataset for the z-score time series "
+        "(default: <output stem>_timeseries/)",
     )
     parser.add_argument(
         "--drive-folder",
         default="iran_zscore_timeseries",
         help="Google Drive folder for EE exports",
     )
+    parser.add_argument(
+        "--task-db",
+        default=None,
+        help="SQLite file tracking export tasks across runs "
+        "(default: <output stem>_tasks.sqlite)",
+    )
+    parser.add_argument(
+        "--max-concurrent",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENT,
+        help="Most EE tasks READY or RUNNING at once on the account "
+        f"(default: {DEFAULT_MAX_CONCURRENT})",
+    )
+    parser.add_argument(
+        "--max-rows",
+        type=int,
+        default=2_000_000,
+        help="Expected rows (points x post-war acquisitions) per export task; "
+        "H3 cells are bundled up to this budget (default: 2,000,000). The "
+        "acquisitions per point are the most seen at 20 sampled points, so "
+        "bundles in areas with more orbit overlap can exceed it; those are "
+        "halved if they run out of memory",
+    )
+    parser.add_argument(
+        "--rows-per-point",
+        type=int,
+        default=None,
+        help="Post-war acquisitions per point used to size bundles "
+        "(default: the value stored in the task DB by the first run, else "
+        "measured on EE for a sample of points)",
+    )
     parser.add_argument("--project", default="ggmap-325812", help="GEE project ID")
     parser.add_argument(
         "--download-only",
@@ -149,99 +400,96 @@ def main():
     print(f"  {len(df)} points with T_statistic > {args.threshold}")
     print(f"  {df['h3_cell'].nunique()} H3 cells")
 
-    # ── Step 2: Export z-score time series per H3 cell ───────────────────
+    # ── Step 2: Export z-score time series per bundle of H3 cells ────────
     war_start = ee.Date(args.war_start)
     cells = sorted(df["h3_cell"].unique())
+    task_db = args.task_db or os.path.splitext(args.output)[0] + "_tasks.sqlite"
 
     if not args.download_only:
-        # Check for existing/running tasks to enable resume
-        existing_tasks = set()
-        try:
-            for t in ee.batch.Task.list():
-                if t.state in ("READY", "RUNNING", "COMPLETED"):
-                    existing_tasks.add(t.config.get("description", ""))
-        except Exception:
-            pass
-
-        submitted = 0
-        skipped = 0
-        for i, cell_id in enumerate(cells):
-            task_name = f"zscore_{cell_id}"
-            if task_name in existing_tasks:
-                skipped += 1
-                continue
-
-            cell_df = df[df["h3_cell"] == cell_id]
-            # Build EE point collection for this cell
-            features = []
-            for _, row in cell_df.iterrows():
-                f = ee.Feature(
+        # Neighbouring cells are exported together (one task and one z-score
+        # collection per bundle instead of per cell). Tasks go through a
+        # bounded, resumable queue (pwtt.scheduler): bundles already exported
+        # by an earlier run of this command are not resubmitted, and a bundle
+        # that runs out of memory is split in two, then retried with a higher
+        # sampleRegions tileScale.
+        import h3
+
+        os.makedirs(os.path.dirname(task_db) or ".", exist_ok=True)
+        sched = Scheduler(task_db, max_concurrent=args.max_concurrent)
+
+        # The number of post-war acquisitions grows over time, and with it the
+        # bundle plan and names. A resumed run reuses the count stored with
+        # the first run's jobs, so it plans the same bundles.
+        stored = [p["rows_per_point"] for p in sched.params().values() if "rows_per_point" in p]
+        per_point = args.rows_per_point or (stored[0] if stored else rows_per_point(df, war_start))
+        bundles = plan_bundles(df.groupby("h3_cell").size().to_dict(), per_point, args.max_rows)
+        by_cell = {cell_id: cell_df for cell_id, cell_df in df.groupby("h3_cell")}
+        print(f"  {len(cells)} cells in {len(bundles)} bundles "
+              f"(~{per_point} rows per point, up to {args.max_rows:,} rows per task)")
+
+        def build_task(params):
+            # Build EE point collection for the bundle's cells
+            features = [
+                ee.Feature(
                     ee.Geometry.Point([row["longitude"], row["latitude"]]),
-                    {"latitude": row["latitude"], "longitude": row["longitude"]},
+                    {"latitude": row["latitude"], "longitude": row["longitude"],
+                     "h3_cell": cell_id},
                 )
-                features.append(f)
+                for cell_id in params["cells"]
+                for _, row in by_cell[cell_id].iterrows()
+            ]
             points_fc = ee.FeatureCollection(features)
 
-            # Build AOI from H3 cell boundary
-            import h3
-
-            boundary = h3.cell_to_boundary(cell_id)
-            coords = [[lng, lat] for lat, lng in boundary]
-            coords.append(coords[0])
-            aoi = ee.Geometry.Polygon([coords])
+            # Build AOI from the H3 cell boundaries
+            polygons = []
+            for cell_id in params["cells"]:
+                coords = [[lng, lat] for lat, lng in h3.cell_to_boundary(cell_id)]
+                coords.append(coords[0])
+                polygons.append([coords])
+            aoi = ee.Geometry.MultiPolygon(polygons)
 
             # Build z-score collection and sample
             zscore_coll = build_zscore_collection(aoi, war_start, args.pre_months)
-            sampled = sample_zscore_timeseries(zscore_coll, points_fc, war_start)
+            sampled = sample_zscore_timeseries(
+                zscore_coll, points_fc, war_start, tile_scale=params["tileScale"]
+            )
 
             # Select output properties
-            sampled = sampled.select(
-                ["latitude", "longitude", "date_millis", "orbit", "VV", "VH"]
-            )
+            sampled = sampled.select(TS_COLUMNS + ["h3_cell"])
 
-            task = ee.batch.Export.table.toDrive(
+            return ee.batch.Export.table.toDrive(
                 collection=sampled,
-                description=task_name,
+                description=params["name"],
                 folder=args.drive_folder,
                 fileFormat="CSV",
             )
-            task.start()
-            submitted += 1
 
-            if (submitted) % 10 == 0:
-                print(f"  Submitted {submitted} tasks ({i+1}/{len(cells)} cells)...")
+        for name, bundle_cells in bundles:
+            # Largest bundles first: they take longest
+            n_points = sum(len(by_cell[c]) for c in bundle_cells)
+            sched.add(name, build_task, priority=n_points, retry=bundle_retry,
+                      params={"name": name, "cells": bundle_cells, "tileScale": 1,
+                              "rows_per_point": per_point})
 
-        print(
-            f"  Submitted {submitted} tasks, skipped {skipped} existing. "
-            f"Waiting for completion..."
-        )
+        # ── Step 3: Submit and wait for all tasks ────────────────────────
+        print(f"  Queued {len(bundles)} bundles (task state in {task_db}). Waiting for completion...")
+        sched.run()
 
-        # ── Step 3: Wait for all tasks ───────────────────────────────────
-        while True:
-            tasks = ee.batch.Task.list()
-            zscore_tasks = [
-                t for t in tasks if t.config.get("description", "").startswith("zscore_")
-            ]
-            running = sum(1 for t in zscore_tasks if t.state in ("READY", "RUNNING"))
-            completed = sum(1 for t in zscore_tasks if t.state == "COMPLETED")
-            failed = sum(1 for t in zscore_tasks if t.state == "FAILED")
-            print(
-                f"  Running: {running}  Completed: {completed}  Failed: {failed}",
-                end="\r",
-            )
-            if running == 0:
-                print()
-                break
-            time.sleep(30)
+        failed = sched.failures()
+        if failed:
+            print(f"  WARNING: {len(failed)} tasks failed")
+            for description, err in failed.items():
+                print(f"    {description}: {err}")
 
-        if failed > 0:
-            print(f"  WARNING: {failed} tasks failed")
-            for t in zscore_tasks:
-                if t.state == "FAILED":
-                    print(f"    {t.config.get('description')}: {t.status().get('error_message', '?')}")
+    # Cells of each exported bundle, so bundles already stored are not downloaded again
+    exported = {}
+    if os.path.exists(task_db):
+        exported = {k: p["cells"] for k, p in Scheduler(task_db).params().items() if "cells" in p}
 
     # ── Step 4: Download from Drive ──────────────────────────────────────
-    print("Downloading CSVs from Google Drive...")
+    ts_root = args.timeseries_dir or os.path.splitext(args.output)[0] + "_timeseries"
+    have = stored_cells(ts_root)
+    print(f"Downloading CSVs from Google Drive into {ts_root} ({len(have)} cells stored)...")
     from googleapiclient.discovery import build
     from google.oauth2.credentials import Credentials
     from google_auth_oauthlib.flow import InstalledAppFlow
@@ -287,17 +535,16 @@ def main():
         local_drive = os.path.expanduser(f"~/Google Drive/My Drive/{args.drive_folder}")
         if os.path.isdir(local_drive):
             print(f"  Found local sync: {local_drive}")
-            all_dfs = []
+            n_files = n_rows = 0
             for fname in sorted(os.listdir(local_drive)):
                 if fname.startswith("zscore_") and fname.endswith(".csv"):
-                    chunk = pd.read_csv(os.path.join(local_drive, fname))
-                    all_dfs.append(chunk)
-            if all_dfs:
-                ts_df = pd.concat(all_dfs, ignore_index=True)
-                print(f"  Loaded {len(ts_df)} rows from {len(all_dfs)} files")
-            else:
-                print("  No zscore CSV files found.")
-                return
+                    chunk = tidy_export(os.path.join(local_drive, fname), fname, have)
+                    if chunk is None:
+                        continue
+                    write_timeseries(chunk, ts_root)
+                    n_files += 1
+                    n_rows += len(chunk)
+            print(f"  Loaded {n_rows} rows from {n_files} new files")
         else:
             print("  No local Drive sync found either. Exiting.")
             return
@@ -318,55 +565,36 @@ def main():
                 break
 
         print(f"  Found {len(files)} files in Drive")
-        all_dfs = []
+        n_files = n_rows = 0
         for fi in files:
+            stem = fi["name"].removesuffix(".csv")
+            if stem[len("zscore_"):] in have or have.issuperset(exported.get(stem, [None])):
+                continue
             content = service.files().get_media(fileId=fi["id"]).execute()
-            chunk = pd.read_csv(io.BytesIO(content))
-            all_dfs.append(chunk)
-        ts_df = pd.concat(all_dfs, ignore_index=True)
-        print(f"  Downloaded {len(ts_df)} rows")
+            chunk = tidy_export(io.BytesIO(content), fi["name"], have)
+            if chunk is None:
+                continue
+            write_timeseries(chunk, ts_root)
+            n_files += 1
+            n_rows += len(chunk)
+        print(f"  Downloaded {n_rows} rows from {n_files} new files")
+
+    if not stored_cells(ts_root):
+        print("  No zscore time series found.")
+        return
 
     # ── Step 5: Estimate damage date ─────────────────────────────────────
     print("Estimating damage dates...")
+    ts_df = read_timeseries(
+        ts_root, columns=["latitude", "longitude", "date_millis", "VV", "VH"], cells=cells
+    )
     ts_df["date"] = pd.to_datetime(ts_df["date_millis"], unit="ms")
-    ts_df["z_max"] = ts_df[["VV", "VH"]].abs().max(axis=1)
-    ts_df = ts_df.sort_values(["latitude", "longitude", "date"])
+    # fmax skips a missing polarization, like DataFrame.max(axis=1)
+    ts_df["z_max"] = np.fmax(ts_df["VV"].abs(), ts_df["VH"].abs()).astype(np.float64)
 
     # For each building, find the first date where z_max > z_crit
     # in two consecutive acquisitions (to avoid single-image speckle spikes)
-    results = []
-    for (lat, lon), grp in ts_df.groupby(["latitude", "longitude"]):
-        grp = grp.sort_values("date")
-        above = grp["z_max"] > args.z_crit
-        # Two consecutive exceedances
-        consecutive = above & above.shift(1, fill_value=False)
-        if consecutive.any():
-            first_idx = consecutive.idxmax()
-            # Use the date of the first exceedance (one row before the consecutive one)
-            prev_idx = grp.index[grp.index.get_loc(first_idx) - 1]
-            damage_date = grp.loc[prev_idx, "date"]
-            peak_z = grp.loc[first_idx, "z_max"]
-        elif above.any():
-            # Single exceedance only — use it but flag as uncertain
-            first_idx = above.idxmax()
-            damage_date = grp.loc[first_idx, "date"]
-            peak_z = grp.loc[first_idx, "z_max"]
-        else:
-            damage_date = pd.NaT
-            peak_z = grp["z_max"].max()
-
-        results.append(
-            {
-                "latitude": lat,
-                "longitude": lon,
-                "estimated_damage_date": damage_date,
-                "peak_z": peak_z,
-                "n_exceedances": above.sum(),
-                "n_acquisitions": len(grp),
-            }
-        )
-
-    result_df = pd.DataFrame(results)
+    result_df = estimate_damage_dates(ts_df, args.z_crit)
 
     # Merge back with original damage stats
     orig = pd.read_csv(args.csv)
@@ -374,7 +602,10 @@ def main():
     merged = orig.merge(result_df, on=["latitude", "longitude"], how="left")
 
     os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
-    merged.to_csv(args.output, index=False)
+    if args.output.endswith(".parquet"):
+        merged.to_parquet(args.output, index=False)
+    else:
+        merged.to_csv(args.output, index=False)
     print(f"\nWrote {args.output}")
     print(f"  {len(merged)} buildings")
     print(f"  {merged['estimated_damage_date'].notna().sum()} with estimated damage date")
@@ -382,11 +613,7 @@ def main():
         f"  Date range: {merged['estimated_damage_date'].min()} to "
         f"{merged['estimated_damage_date'].max()}"
     )
-
-    # Also save the raw z-score time series
-    ts_output = args.output.replace(".csv", "_timeseries.csv")
-    ts_df.to_csv(ts_output, index=False)
-    print(f"  Raw time series: {ts_output} ({len(ts_df)} rows)")
+    print(f"  Raw time series: {ts_root} ({len(ts_df)} rows)")
 
 
 if __name__ == "__main__":
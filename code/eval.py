@@ -18,11 +18,22 @@ from sklearn.metrics import (
     precision_score, recall_score, precision_recall_curve,
 )
 from pwtt import detect_damage
+from pwtt.baseline import BaselineCache
+from pwtt import planner
+from pwtt.autosplit import QuadTree, pull_split, with_centroids
+from pwtt.cache import GetInfoCache, graph_key
+from pwtt.fetch import fetch_columns
 
 ee.Initialize(project='ggmap-325812')
 
 POST_INTERVAL = 1
 
+# Footprint pulls are cached by expression graph, so re-running a city with
+# unchanged settings reads from disk instead of recomputing on EE. The graph
+# names assets, not their contents, so entries expire: ground truth and
+# footprints are sometimes re-uploaded in place.
+CACHE_TTL = 7 * 86400
+
 # ========================= Geometries =========================
 
 gaza = ee.Geometry.Polygon([[
@@ -268,12 +279,98 @@ def run_evaluation(labels, scores, area, score_type='t'):
 
 
 
+class StreamingMetrics:
+    """
+    Mergeable area-weighted ROC/PR accumulator over fixed score bins.
+
+    Each update adds a page of (label, score, area) rows to per-bin positive
+    and negative area histograms in O(page); metrics() reads AUC and the
+    best-F1 threshold off the cumulative histograms in O(n_bins), so progress
+    reports cost the same at every page. Accumulators with the same bins can
+    be merged (chunk tiles into a city, cities into a pooled total).
+
+    Scores outside [lo, hi] fall into the end bins. A bin's lower edge is its
+    threshold (predict damage for score >= edge), and ties within a bin are
+    handled like ties in roc_curve, so AUC and F1 match run_evaluation to
+    within the bin width. score_type 'p' takes p-values and bins
+    -log10(p), as run_evaluation does.
+    """
+
+    RANGES = {'t': (0.0, 20.0), 'p': (0.0, 10.0)}
+
+    def __init__(self, score_type='t', n_bins=2000, lo=None, hi=None):
+        d_lo, d_hi = self.RANGES[score_type]
+        self.score_type = score_type
+        self.edges = np.linspace(d_lo if lo is None else lo, d_hi if hi is None else hi, n_bins + 1)
+        self.pos = np.zeros(n_bins)
+        self.neg = np.zeros(n_bins)
+        self.n = 0
+        self.n_pos = 0
+
+    def update(self, labels, scores, area):
+        labels = np.asarray(labels, dtype=float)
+        scores = np.asarray(scores, dtype=float)
+        area = np.asarray(area, dtype=float)
+        valid = ~(np.isnan(labels) | np.isnan(scores) | np.isnan(area))
+        labels, scores, area = labels[valid], scores[valid], area[valid]
+        if self.score_type == 'p':
+            scores = -np.log10(np.clip(scores, 1e-10, 1.0))
+
+        n_bins = len(self.pos)
+        idx = np.clip(np.searchsorted(self.edges, scores, side='right') - 1, 0, n_bins - 1)
+        is_pos = labels == 1
+        self.pos += np.bincount(idx[is_pos], weights=area[is_pos], minlength=n_bins)
+        self.neg += np.bincount(idx[~is_pos], weights=area[~is_pos], minlength=n_bins)
+        self.n += len(labels)
+        self.n_pos += int(is_pos.sum())
+        return self
+
+    def merge(self, other):
+        if self.score_type != other.score_type or not np.array_equal(self.edges, other.edges):
+            raise ValueError("Can only merge StreamingMetrics with the same score type and bins")
+        self.pos += other.pos
+        self.neg += other.neg
+        self.n += other.n
+        self.n_pos += other.n_pos
+        return self
+
+    def metrics(self):
+        """Same keys as run_evaluation: precision, recall, f1, auc, threshold."""
+        # tp[i], fp[i]: area predicted damaged at threshold edges[i]
+        tp = np.cumsum(self.pos[::-1])[::-1]
+        fp = np.cumsum(self.neg[::-1])[::-1]
+        total_pos, total_neg = tp[0], fp[0]
+        if total_pos == 0 or total_neg == 0:
+            return dict(precision=np.nan, recall=np.nan, f1=np.nan, auc=np.nan, threshold=np.nan)
+
+        tpr = np.append(tp / total_pos, 0.0)
+        fpr = np.append(fp / total_neg, 0.0)
+        roc_auc = float(np.sum((fpr[:-1] - fpr[1:]) * (tpr[:-1] + tpr[1:]) / 2))
+
+        f1_curve = 2 * tp / (tp + fp + total_pos)
+        best = int(np.argmax(f1_curve))
+        return dict(
+            precision=tp[best] / (tp[best] + fp[best]),
+            recall=tp[best] / total_pos,
+            f1=f1_curve[best],
+            auc=roc_auc,
+            threshold=self.edges[best],
+        )
+
+
 # ========================= Evaluation =========================
 
 def run_eval(name, pre_interval, post_interval, inference_start,
              ground_truth, footprints, war_start, bounds, method='stouffer',
-             quiet=False, **kwargs):
-    """Run PWTT and evaluate against ground truth damage annotations."""
+             quiet=False, cache=None, max_split_depth=4, **kwargs):
+    """Run PWTT and evaluate against ground truth damage annotations.
+
+    method may be a list: detect_damage then builds all of them in one graph,
+    and one result dict per method is returned (in order). Pulls that exceed
+    EE memory or time are split into quadtree tiles, up to max_split_depth
+    levels (pwtt.autosplit). cache is a GetInfoCache for the footprint pulls
+    (None to always pull from EE).
+    """
 
     inference_date = (
         inference_start if isinstance(inference_start, ee.Date)
@@ -315,54 +412,102 @@ def run_eval(name, pre_interval, post_interval, inference_start,
         )
 
     buffered_pts = points.map(lambda f: f.buffer(10))
-    labeled_fp = join.apply(fp, buffered_pts, spatial_filter).map(count_pts)
 
-    # Reduce PWTT image to footprints
-    fp_sample = image.reduceRegions(
-        collection=labeled_fp, reducer=ee.Reducer.mean(),
-        scale=10, tileScale=8,
-    )
+    # A list of methods comes back as one image with '<method>_' band prefixes,
+    # so all methods share one reduceRegions and one pull
+    methods = [method] if isinstance(method, str) else list(method)
+    score_cols = {m: ('T_statistic', 'p_value') if isinstance(method, str)
+                  else (f'{m}_T_statistic', f'{m}_p_value') for m in methods}
+    columns = ['class', 'area'] + [c for cols in score_cols.values() for c in cols]
+
+    # Large AOIs are split automatically: a pull that runs out of EE memory or
+    # time is retried as quadtree tiles of footprints (by centroid) with a
+    # higher tileScale. The image is still computed on the full bounds, so the
+    # tiles together give exactly the unsplit result.
+    tree = QuadTree(bounds)
+
+    def sample(path, tile_scale):
+        tile_fp = fp if not path else tree.restrict(with_centroids(fp), path)
+        labeled_fp = join.apply(tile_fp, buffered_pts, spatial_filter).map(count_pts)
+
+        # Reduce PWTT image to footprints
+        fp_sample = image.reduceRegions(
+            collection=labeled_fp, reducer=ee.Reducer.mean(),
+            scale=10, tileScale=tile_scale,
+        )
 
-    # Filter to footprints that have valid T_statistic and p_value (non-null)
-    fp_sample = fp_sample.filter(ee.Filter.notNull(['T_statistic', 'p_value']))
-
-    # Select only needed properties and drop geometry to minimize payload
-    fp_sample = fp_sample.select(['class', 'T_statistic', 'p_value', 'area'], retainGeometry=False)
-
-    # Pull data — 1 getInfo call per page (not 4), parse features locally
-    labels, t_scores, p_scores, areas = [], [], [], []
-    page_size = 5000
-    total = fp_sample.size().getInfo()
-    offset = 0
-    while offset < total:
-        page = fp_sample.toList(page_size, offset).getInfo()
-        for f in page:
-            p = f['properties']
-            labels.append(p['class'])
-            t_scores.append(p['T_statistic'])
-            p_scores.append(p['p_value'])
-            areas.append(p['area'])
-        offset += page_size
-        if offset < total and not quiet:
-            # Incremental metrics on data so far
-            inc_t = run_evaluation(labels, t_scores, areas, score_type='t')
-            print(f"    ... {offset:,}/{total:,}  AUC={inc_t['auc']:.3f}  F1={inc_t['f1']:.3f}  t*={inc_t['threshold']:.2f}")
-
-    metrics_t = run_evaluation(labels, t_scores, areas, score_type='t')
-    metrics_p = run_evaluation(labels, p_scores, areas, score_type='p')
-    n_pos = sum(1 for l in labels if l == 1)
-    n_neg = len(labels) - n_pos
-
-    print(f"  {name:<18s} [T] P={metrics_t['precision']:.3f}  R={metrics_t['recall']:.3f}  "
-          f"F1={metrics_t['f1']:.3f}  AUC={metrics_t['auc']:.3f}  t*={metrics_t['threshold']:.2f}")
-    print(f"  {'':<18s} [p] P={metrics_p['precision']:.3f}  R={metrics_p['recall']:.3f}  "
-          f"F1={metrics_p['f1']:.3f}  AUC={metrics_p['auc']:.3f}  -log10(p)*={metrics_p['threshold']:.2f}")
-    print(f"  {'':<18s} (n={len(labels):,}, pos={n_pos:,}, neg={n_neg:,})")
-
-    return dict(name=name, method=method, n=len(labels),
-                n_pos=n_pos, n_neg=n_neg,
-                **{f't_{k}': v for k, v in metrics_t.items()},
-                **{f'p_{k}': v for k, v in metrics_p.items()})
+        # Filter to footprints that have valid T_statistic and p_value (non-null)
+        # for at least one method; per-method validity is applied below
+        fp_sample = fp_sample.filter(ee.Filter.Or(
+            *[ee.Filter.notNull(list(cols)) for cols in score_cols.values()]))
+
+        # Select only needed properties and drop geometry to minimize payload
+        return fp_sample.select(columns, retainGeometry=False)
+
+    # Pull data — pages fetched concurrently, parsed into columns as they land
+    streams = {m: (StreamingMetrics('t'), StreamingMetrics('p')) for m in methods}
+
+    def stream(cols, into):
+        for m, (t_col, p_col) in score_cols.items():
+            ok = ~(np.isnan(cols[t_col]) | np.isnan(cols[p_col]))
+            into[m][0].update(cols['class'][ok], cols[t_col][ok], cols['area'][ok])
+            into[m][1].update(cols['class'][ok], cols[p_col][ok], cols['area'][ok])
+
+    def pull(path, tile_scale):
+        # Pages stream into per-tile accumulators, merged once the tile has
+        # been pulled whole, so a tile that fails and is split is not counted
+        tile = {m: (StreamingMetrics('t'), StreamingMetrics('p')) for m in methods}
+        progress = dict(rows=0)
+
+        def on_page(buf, offset, count):
+            stream(buf.rows(offset, count), tile)
+            progress['rows'] += count
+            if progress['rows'] < buf.n and not quiet:
+                # Incremental metrics on data so far (binned, O(page) per update)
+                inc_t = tile[methods[0]][0].metrics()
+                print(f"    ... {path and f'tile {path} '}{progress['rows']:,}/{buf.n:,}  "
+                      f"AUC={inc_t['auc']:.3f}  F1={inc_t['f1']:.3f}  t*={inc_t['threshold']:.2f}")
+
+        fp_sample = sample(path, tile_scale)
+        if cache is None:
+            cols = fetch_columns(fp_sample, columns, on_page=on_page)
+        else:
+            cols = cache.fetch_columns(fp_sample, columns, on_page=on_page)
+        if progress['rows'] == 0:
+            # Cache hit: on_page never ran
+            stream(cols, tile)
+        for m in methods:
+            streams[m][0].merge(tile[m][0])
+            streams[m][1].merge(tile[m][1])
+        return cols
+
+    plan_key = None if cache is None else graph_key(sample('', 8), columns=columns, plan='autosplit')
+    cols = pull_split(pull, tile_scale=8, max_depth=max_split_depth, cache=cache, key=plan_key,
+                      log=None if quiet else print)
+
+    results = []
+    for m, (t_col, p_col) in score_cols.items():
+        ok = ~(np.isnan(cols[t_col]) | np.isnan(cols[p_col]))
+        labels, t_scores, p_scores, areas = cols['class'][ok], cols[t_col][ok], cols[p_col][ok], cols['area'][ok]
+        stream_t, stream_p = streams[m]
+
+        metrics_t = run_evaluation(labels, t_scores, areas, score_type='t')
+        metrics_p = run_evaluation(labels, p_scores, areas, score_type='p')
+        n_pos = int((labels == 1).sum())
+        n_neg = len(labels) - n_pos
+
+        label = name if isinstance(method, str) else f'{name} {m}'
+        print(f"  {label:<18s} [T] P={metrics_t['precision']:.3f}  R={metrics_t['recall']:.3f}  "
+              f"F1={metrics_t['f1']:.3f}  AUC={metrics_t['auc']:.3f}  t*={metrics_t['threshold']:.2f}")
+        print(f"  {'':<18s} [p] P={metrics_p['precision']:.3f}  R={metrics_p['recall']:.3f}  "
+              f"F1={metrics_p['f1']:.3f}  AUC={metrics_p['auc']:.3f}  -log10(p)*={metrics_p['threshold']:.2f}")
+        print(f"  {'':<18s} (n={len(labels):,}, pos={n_pos:,}, neg={n_neg:,})")
+
+        results.append(dict(name=name, method=m, n=len(labels),
+                            n_pos=n_pos, n_neg=n_neg, stream_t=stream_t, stream_p=stream_p,
+                            **{f't_{k}': v for k, v in metrics_t.items()},
+                            **{f'p_{k}': v for k, v in metrics_p.items()}))
+    return results[0] if isinstance(method, str) else results
 
 
 # ========================= City Configs =========================
@@ -503,6 +648,7 @@ CITIES = [
 
 if __name__ == '__main__':
     import argparse
+    import re
     from concurrent.futures import ThreadPoolExecutor, as_completed
 
     parser = argparse.ArgumentParser(description='Evaluate PWTT against ground truth')
@@ -517,16 +663,52 @@ if __name__ == '__main__':
     parser.add_argument('--workers', type=int, default=4,
                         help='Parallel workers across cities (default: 4, use 1 for sequential)')
     parser.add_argument('--chunks', type=int, default=1,
-                        help='Split bounds of --chunk-cities into N×N tiles, evaluate each separately (default: 1)')
+                        help='Split bounds of --chunk-cities into N tiles of similar predicted cost, evaluate each '
+                             'separately (default: 1). '
+                             'Not needed to fit EE limits: pulls that run out of memory are split automatically')
     parser.add_argument('--chunk-cities', nargs='*', default=['Gaza'],
                         help='Cities whose bounds should be tiled when --chunks > 1 (default: Gaza)')
+    parser.add_argument('--cost-model', default='cost_model.json',
+                        help='Tile cost model fitted by pwtt.planner.calibrate (default: built-in estimates '
+                             'if the file does not exist)')
+    parser.add_argument('--max-split-depth', type=int, default=4,
+                        help='Quadtree levels a city may be split into when EE runs out of memory or time '
+                             '(default: 4, 0 to never split)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always pull from EE, bypassing the local getInfo cache')
+    parser.add_argument('--clear-cache', action='store_true',
+                        help='Empty the local getInfo cache before running')
+    parser.add_argument('--cache-ttl', type=float, default=CACHE_TTL,
+                        help=f'Seconds a cached pull stays valid (default: {CACHE_TTL}, one week)')
+    parser.add_argument('--baseline-assets', default=None,
+                        help='EE asset folder of materialized pre-war baselines to reuse (pwtt.baseline)')
+    parser.add_argument('--materialize-baselines', action='store_true',
+                        help='Start baseline exports for the selected cities into --baseline-assets and exit')
     args = parser.parse_args()
 
+    cache = None if args.no_cache else GetInfoCache(ttl=args.cache_ttl)
+    if args.clear_cache:
+        (cache or GetInfoCache()).clear()
+
     # Build kwargs for detect_damage
     detect_kwargs = dict(
         ttest_type=args.ttest_type,
         sensor=args.sensor,
     )
+    if args.baseline_assets:
+        detect_kwargs['baseline_cache'] = BaselineCache(args.baseline_assets)
+    elif args.materialize_baselines:
+        parser.error('--materialize-baselines needs --baseline-assets')
+
+    if args.materialize_baselines:
+        # Pre-war statistics depend only on (aoi, war_start, pre_interval, lee_mode),
+        # so every method and inference date reuses them
+        for city in CITIES:
+            if args.cities and 'all' not in args.cities and city['name'] not in args.cities:
+                continue
+            tasks = detect_kwargs['baseline_cache'].materialize(city['bounds'], city['war_start'], 12)
+            print(f"  {city['name']:<18s} {len(tasks)} baseline exports started")
+        raise SystemExit(0)
 
     if args.method == 'both':
         methods = ['stouffer', 'max']
@@ -537,91 +719,91 @@ if __name__ == '__main__':
     else:
         methods = [args.method]
 
-    # ---- bounds chunking (e.g. Gaza is too big for one EE call) ----
-    def split_bbox_grid(geom, n):
-        """Split geom's bounding box into ~n tiles (closest n_rows×n_cols), intersected with geom."""
-        import math
-        cols = max(1, int(round(math.sqrt(n))))
-        rows = max(1, int(math.ceil(n / cols)))
-        coords = ee.List(ee.Geometry(geom).bounds().coordinates().get(0))
-        sw = ee.List(coords.get(0))
-        ne = ee.List(coords.get(2))
-        x0 = ee.Number(sw.get(0)); y0 = ee.Number(sw.get(1))
-        x1 = ee.Number(ne.get(0)); y1 = ee.Number(ne.get(1))
-        dx = x1.subtract(x0).divide(cols)
-        dy = y1.subtract(y0).divide(rows)
-        tiles = []
-        for r in range(rows):
-            for c in range(cols):
-                rect = ee.Geometry.Rectangle(
-                    [x0.add(dx.multiply(c)), y0.add(dy.multiply(r)),
-                     x0.add(dx.multiply(c + 1)), y0.add(dy.multiply(r + 1))],
-                    None, False)
-                tiles.append(rect.intersection(geom, 10))
-        return tiles, rows, cols
-
+    # ---- manual bounds chunking (over-limit pulls are also split automatically) ----
+    # Tiles are planned by predicted cost (footprints, urban area, S1 scenes),
+    # so dense and sparse parts of a city get similar amounts of work
     def expand_chunks(cities):
         if args.chunks <= 1:
             return cities
+        model = planner.CostModel.load(args.cost_model)
         out = []
         for c in cities:
             if c['name'] in (args.chunk_cities or []):
-                tiles, _rows, cols = split_bbox_grid(c['bounds'], args.chunks)
-                for i, t in enumerate(tiles):
+                grid = planner.estimate(c['bounds'], c['footprints'], c['war_start'], c['inference_start'],
+                                        pre_interval=12, post_interval=POST_INTERVAL,
+                                        cache=cache)
+                bundles = planner.plan(grid, model, n_tasks=args.chunks)
+                print(f"  {c['name']}: {len(bundles)} tiles, predicted cost spread "
+                      f"{planner.balance(bundles):.2f}x mean")
+                for i, bundle in enumerate(bundles):
                     sub = dict(c)
-                    sub['bounds'] = t
-                    sub['name'] = f"{c['name']}_r{i // cols}c{i % cols}"
+                    sub['bounds'] = planner.region(grid, bundle.paths)
+                    sub['name'] = f"{c['name']}_b{i}"
                     out.append(sub)
             else:
                 out.append(c)
         return out
 
-    for method in methods:
-        print(f"\n{'='*60}")
-        print(f"  method={method}  ttest_type={args.ttest_type}")
-        print(f"{'='*60}\n")
-
-        selected = [
-            c for c in CITIES
-            if not (args.cities and 'all' not in args.cities and c['name'] not in args.cities)
-        ]
-        selected = expand_chunks(selected)
-
-        def _run_one(city, _method=method):
-            return run_eval(
-                name=city['name'],
-                pre_interval=12,
-                post_interval=POST_INTERVAL,
-                inference_start=city['inference_start'],
-                ground_truth=city['ground_truth'],
-                footprints=city['footprints'],
-                war_start=city['war_start'],
-                bounds=city['bounds'],
-                method=_method,
-                quiet=(args.workers > 1),
-                **detect_kwargs,
-            )
-
-        results = []
-        if args.workers <= 1:
-            for city in selected:
+    selected = [
+        c for c in CITIES
+        if not (args.cities and 'all' not in args.cities and c['name'] not in args.cities)
+    ]
+    selected = expand_chunks(selected)
+
+    # All methods go through one detect_damage graph and one reduceRegions per
+    # city; shared stages (normalization, per-orbit tests) are built once
+    def _run_one(city):
+        result = run_eval(
+            name=city['name'],
+            pre_interval=12,
+            post_interval=POST_INTERVAL,
+            inference_start=city['inference_start'],
+            ground_truth=city['ground_truth'],
+            footprints=city['footprints'],
+            war_start=city['war_start'],
+            bounds=city['bounds'],
+            method=methods if len(methods) > 1 else methods[0],
+            quiet=(args.workers > 1),
+            cache=cache,
+            max_split_depth=args.max_split_depth,
+            **detect_kwargs,
+        )
+        return result if isinstance(result, list) else [result]
+
+    print(f"\n{'='*60}")
+    print(f"  method={','.join(methods)}  ttest_type={args.ttest_type}")
+    print(f"{'='*60}\n")
+
+    results_by_method = {m: [] for m in methods}
+
+    def collect(rows):
+        for r in rows:
+            results_by_method[r['method']].append(r)
+
+    if args.workers <= 1:
+        for city in selected:
+            try:
+                collect(_run_one(city))
+            except Exception as e:
+                print(f"  {city['name']:<18s} FAILED: {e}")
+    else:
+        with ThreadPoolExecutor(max_workers=args.workers) as ex:
+            futures = {ex.submit(_run_one, c): c for c in selected}
+            for fut in as_completed(futures):
+                city = futures[fut]
                 try:
-                    results.append(_run_one(city))
+                    collect(fut.result())
                 except Exception as e:
                     print(f"  {city['name']:<18s} FAILED: {e}")
-        else:
-            with ThreadPoolExecutor(max_workers=args.workers) as ex:
-                futures = {ex.submit(_run_one, c): c for c in selected}
-                for fut in as_completed(futures):
-                    city = futures[fut]
-                    try:
-                        results.append(fut.result())
-                    except Exception as e:
-                        print(f"  {city['name']:<18s} FAILED: {e}")
+
+    for method in methods:
+        results = results_by_method[method]
+        if len(methods) > 1:
+            print(f"\n  --- method={method} ---")
 
         # Summary table
         if results:
-            df = pd.DataFrame(results)
+            df = pd.DataFrame(results).drop(columns=['stream_t', 'stream_p'])
             weights = df['n'].values
             avg_t = {col: np.average(df[f't_{col}'], weights=weights)
                      for col in ['precision', 'recall', 'f1', 'auc']}
@@ -633,4 +815,33 @@ if __name__ == '__main__':
                   f"F1={avg_p['f1']:.3f}  AUC={avg_p['auc']:.3f}")
             print(f"  {'':<18s} (n={df['n'].sum():,})")
 
+            # Pooled metrics from the merged histograms: chunk tiles back into
+            # their city, then all cities together
+            def pooled(rows):
+                st, sp = StreamingMetrics('t'), StreamingMetrics('p')
+                for r in rows:
+                    st.merge(r['stream_t'])
+                    sp.merge(r['stream_p'])
+                return st.metrics(), sp.metrics()
+
+            def print_pooled(label, rows):
+                mt, mp = pooled(rows)
+                print(f"  {label:<18s} [T] P={mt['precision']:.3f}  R={mt['recall']:.3f}  "
+                      f"F1={mt['f1']:.3f}  AUC={mt['auc']:.3f}  t*={mt['threshold']:.2f}")
+                print(f"  {'':<18s} [p] P={mp['precision']:.3f}  R={mp['recall']:.3f}  "
+                      f"F1={mp['f1']:.3f}  AUC={mp['auc']:.3f}  -log10(p)*={mp['threshold']:.2f}")
+
+            if args.chunks > 1:
+                by_city = {}
+                for r in results:
+                    by_city.setdefault(re.sub(r'_b\d+$', '', r['name']), []).append(r)
+                for city_name, rows in by_city.items():
+                    if len(rows) > 1:
+                        print_pooled(f"{city_name} (tiles)", rows)
+            print_pooled('Pooled', results)
+
+    if cache is not None:
+        st = cache.stats()
+        print(f"\nCache: {st['hits']} hits, {st['misses']} misses, "
+              f"{st['entries']} entries ({st['bytes'] / 1e6:.1f} MB)")
     print(f"\nDone.")
@@ -0,0 +1,88 @@
+"""
+Size and depth of serialized Earth Engine expression graphs, plus export timing.
+
+Shared by the code/bench_*.py scripts to compare alternative formulations of
+the same computation without (or before) running them.
+
+Usage:
+    from graph_stats import graph_stats
+    print(graph_stats(image))   # {'nodes': ..., 'invocations': ..., 'depth': ..., 'bytes': ...}
+"""
+
+import json
+import time
+
+import ee
+
+
+def _refs(value):
+    """Yield every valueReference id nested inside a serialized value."""
+    stack = [value]
+    while stack:
+        v = stack.pop()
+        if isinstance(v, dict):
+            for key, child in v.items():
+                if key == 'valueReference':
+                    yield child
+                else:
+                    stack.append(child)
+        elif isinstance(v, list):
+            stack.extend(v)
+
+
+def graph_stats(obj):
+    """Node count, function-invocation count, longest dependency chain and payload size.
+
+    Identical sub-expressions are shared by the serializer, so 'nodes' counts
+    distinct computations, which is what the EE backend evaluates.
+    """
+    encoded = ee.serializer.encode(obj, for_cloud_api=True)
+    values = encoded['values']
+    children = {k: list(_refs(v)) for k, v in values.items()}
+
+    # Iterative post-order DFS: depth(node) = 1 + max depth(children)
+    depth = {}
+    stack = [(encoded['result'], False)]
+    while stack:
+        node, expanded = stack.pop()
+        if node in depth:
+            continue
+        if expanded:
+            depth[node] = 1 + max((depth[c] for c in children[node]), default=0)
+            continue
+        stack.append((node, True))
+        stack.extend((c, False) for c in children[node] if c not in depth)
+
+    return dict(
+        nodes=len(values),
+        invocations=sum(1 for v in values.values() if 'functionInvocationValue' in v),
+        depth=depth[encoded['result']],
+        bytes=len(json.dumps(encoded)),
+    )
+
+
+def export_and_time(images, aoi, folder='PWTT_bench', scale=10, tile_scale=4, poll=15):
+    """Export each image's regional mean as a one-row table and report task runtimes.
+
+    images: dict name -> ee.Image. Tasks run concurrently; returns a dict
+    name -> {'state', 'runtime_s', 'eecu_s'} once all have finished.
+    """
+    tasks = {}
+    for name, image in images.items():
+        stats = image.reduceRegion(ee.Reducer.mean(), aoi, scale, tileScale=tile_scale, maxPixels=1e13)
+        fc = ee.FeatureCollection([ee.Feature(None, stats)])
+        task = ee.batch.Export.table.toDrive(
+            collection=fc, description=f'bench_{name}', folder=folder, fileFormat='CSV')
+        task.start()
+        tasks[name] = task
+
+    while any(t.status()['state'] in ('UNSUBMITTED', 'READY', 'RUNNING') for t in tasks.values()):
+        time.sleep(poll)
+
+    out = {}
+    for name, task in tasks.items():
+        st = task.status()
+        runtime = (st.get('update_timestamp_ms', 0) - st.get('start_timestamp_ms', 0)) / 1000
+        out[name] = dict(state=st['state'], runtime_s=runtime,
+                         eecu_s=st.get('batch_eecu_usage_seconds'))
+    return out
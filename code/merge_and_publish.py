@@ -18,9 +18,10 @@ Usage:
 """
 
 import argparse
-import time
 import ee
 
+from pwtt.scheduler import Scheduler, resubmit
+
 
 def merge_folder(folder):
     """Merge all assets in a folder into a single FeatureCollection."""
@@ -34,12 +35,34 @@ def merge_folder(folder):
     ).flatten()
 
 
-def wait_for_task(task):
-    """Poll until an export task finishes."""
-    while task.status()['state'] in ('READY', 'RUNNING', 'UNSUBMITTED'):
-        print(f"  Status: {task.status()['state']}")
-        time.sleep(60)
-    return task.status()['state']
+def export_and_wait(collection, destination, task_db=None):
+    """Export collection to the destination asset and wait; returns the final state.
+
+    The export runs through pwtt.scheduler, so a failed export is retried
+    (the old asset is deleted first) and, with task_db, a re-run after a
+    crash waits for the running export instead of starting another.
+    """
+    description = 'merge_' + destination.split('/')[-1]
+
+    def build(params):
+        # Delete old destination if it exists
+        try:
+            ee.data.deleteAsset(destination)
+            print(f"Deleted existing asset: {destination}")
+        except ee.EEException:
+            pass
+        return ee.batch.Export.table.toAsset(
+            collection=collection,
+            description=description,
+            assetId=destination,
+        )
+
+    sched = Scheduler(task_db or ':memory:', poll_min=30)
+    sched.add(description, build, retry=resubmit)
+    state = sched.run()[description]
+    if state != 'COMPLETED':
+        print(f"Merge export failed: {sched.failures().get(description, state)}")
+    return state
 
 
 def main():
@@ -53,6 +76,9 @@ def main():
                         help='Output asset ID for merged table')
     parser.add_argument('--public', action='store_true',
                         help='Set merged asset ACL to all_users_can_read')
+    parser.add_argument('--task-db', default=None,
+                        help='SQLite file tracking the export task, to resume after a crash '
+                             '(an export it records as completed is not repeated)')
     parser.add_argument('--project', default='ggmap-325812',
                         help='GEE cloud project ID')
     args = parser.parse_args()
@@ -116,28 +142,11 @@ def main():
         else:
             print("No ztest assets found, exporting primary only")
 
-    # Delete old destination if it exists
-    try:
-        ee.data.deleteAsset(args.destination)
-        print(f"Deleted existing asset: {args.destination}")
-    except ee.EEException:
-        pass
-
     # Export merged collection to asset
-    task = ee.batch.Export.table.toAsset(
-        collection=merged,
-        description='merge_' + args.destination.split('/')[-1],
-        assetId=args.destination,
-    )
-    task.start()
-    print(f"Export task started: {task.id}")
-
-    state = wait_for_task(task)
-    if state == 'COMPLETED':
-        print("Merge export completed successfully")
-    else:
-        print(f"Merge export failed: {task.status()}")
+    state = export_and_wait(merged, args.destination, args.task_db)
+    if state != 'COMPLETED':
         return
+    print("Merge export completed successfully")
 
     # Set public ACL
     if args.public:
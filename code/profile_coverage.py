@@ -15,6 +15,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from collections import defaultdict
 
+from pwtt.cache import GetInfoCache
+
 ee.Initialize(project='ggmap-325812')
 
 # ========================= Load data =========================
@@ -29,7 +31,9 @@ fc = ee.FeatureCollection(
     [ee.FeatureCollection(aid) for aid in ids]
 ).flatten()
 
-total = fc.size().getInfo()
+# Reruns on unchanged assets are served from the local cache for a week
+cache = GetInfoCache(ttl=7 * 86400)
+total = cache.get_info(fc.size())
 print(f"  Total buildings: {total:,}")
 
 # ========================= Pull data (paginated) =========================
@@ -39,18 +43,18 @@ props = ['T_statistic', 'p_value', 'Z_statistic', 'Z_p_value',
 fc_select = fc.select(props, retainGeometry=False)
 
 print("Pulling data...")
-rows = []
-page_size = 5000
-offset = 0
-while offset < total:
-    page = fc_select.toList(page_size, offset).getInfo()
-    for f in page:
-        rows.append(f['properties'])
-    offset += page_size
-    if offset < total and offset % 10000 == 0:
-        print(f"  ... {offset:,}/{total:,}")
-
-df = pd.DataFrame(rows)
+pulled = 0
+
+
+def report(buf, offset, count):
+    global pulled
+    pulled += count
+    if pulled < buf.n and pulled // 10000 > (pulled - count) // 10000:
+        print(f"  ... {pulled:,}/{buf.n:,}")
+
+
+cols = cache.fetch_columns(fc_select, props, total=total, on_page=report)
+df = pd.DataFrame(cols)
 print(f"  Pulled {len(df):,} buildings")
 
 # ========================= Compute n_post proxy =========================
@@ -16,30 +16,65 @@ import os
 import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-from sklearn.metrics import f1_score, precision_score, recall_score
 
 
 def compute_metrics_at_thresholds(y_true, scores, weights=None,
-                                  t_min=1.5, t_max=8, n_points=200):
+                                  t_min=1.5, t_max=8, n_points=200,
+                                  thresholds=None):
     """
     Compute precision, recall, and F1 at evenly spaced T-statistic thresholds.
+
+    Scores are sorted once; suffix sums of the (weighted) positives and of all
+    weights then give true positives and predicted positives at every
+    threshold, so any number of thresholds costs O(n log n) in total. Pass
+    `thresholds` (array) to override the linspace, or 'all' to evaluate at
+    every distinct score. Matches sklearn's weighted scores with
+    zero_division=0; thresholds that predict no or all buildings get NaN.
+    NaN scores are never predicted positive.
     """
-    thresholds = np.linspace(t_min, t_max, n_points)
-    rows = []
-    for t in thresholds:
-        y_pred = (scores >= t).astype(int)
-        if y_pred.sum() == 0 or y_pred.sum() == len(y_pred):
-            rows.append({'threshold': t, 'precision': np.nan,
-                         'recall': np.nan, 'f1': np.nan})
-            continue
-        p = precision_score(y_true, y_pred, sample_weight=weights,
-                            zero_division=0)
-        r = recall_score(y_true, y_pred, sample_weight=weights,
-                         zero_division=0)
-        f = f1_score(y_true, y_pred, sample_weight=weights,
-                     zero_division=0)
-        rows.append({'threshold': t, 'precision': p, 'recall': r, 'f1': f})
-    return pd.DataFrame(rows)
+    if thresholds is None:
+        thresholds = np.linspace(t_min, t_max, n_points)
+    y_true = np.asarray(y_true) == 1
+    scores = np.asarray(scores, dtype=float)
+    w = np.ones(len(scores)) if weights is None else np.asarray(weights, dtype=float)
+
+    order = np.argsort(scores, kind='stable')
+    order = order[~np.isnan(scores[order])]
+    s = scores[order]
+    if isinstance(thresholds, str) and thresholds == 'all':
+        thresholds = np.unique(s)
+    thresholds = np.asarray(thresholds, dtype=float)
+
+    # suffix[i] = sum over sorted positions >= i, i.e. over scores >= s[i]
+    def suffix(x):
+        out = np.zeros(len(x) + 1)
+        out[:-1] = np.cumsum(x[::-1])[::-1]
+        return out
+
+    w_sorted = w[order]
+    pred_w = suffix(w_sorted)
+    tp = suffix(w_sorted * y_true[order])
+    pos_w = (w * y_true).sum()
+
+    i = np.searchsorted(s, thresholds, side='left')
+    n_pred = len(s) - i
+    tp, pred_w = tp[i], pred_w[i]
+    fn = pos_w - tp
+    fp = pred_w - tp
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(pred_w > 0, tp / pred_w, 0.0)
+        recall = np.where(pos_w > 0, tp / pos_w, 0.0)
+        denom = 2 * tp + fn + fp
+        f1 = np.where(denom > 0, 2 * tp / denom, 0.0)
+
+    degenerate = (n_pred == 0) | (n_pred == len(scores))
+    return pd.DataFrame({
+        'threshold': thresholds,
+        'precision': np.where(degenerate, np.nan, precision),
+        'recall': np.where(degenerate, np.nan, recall),
+        'f1': np.where(degenerate, np.nan, f1),
+    })
 
 
 def plot_threshold_curves(df, col='T', title='Precision, Recall & F1 vs Threshold',
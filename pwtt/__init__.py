@@ -15,8 +15,13 @@ Usage:
 import math
 import datetime
 
-import ee
-import geemap
+try:
+    import ee
+except ImportError:  # the local backend (pwtt.local, pwtt.tiling) runs without earthengine-api
+    ee = None
+
+from . import baseline as pwtt_baseline
+from .local import smoothing_config
 
 
 __version__ = "0.1.0"
@@ -103,7 +108,46 @@ def lee_filter(image):
     return image.addBands(output, None, True)
 
 
-def ttest(s1, inference_start, war_start, pre_interval, post_interval, ttest_type='welch'):
+def _window_moments(coll, bands=('VV', 'VH'), cross=False):
+    """Per-pixel moments of a collection window from a single combined reduction.
+
+    One mean + stdDev + count reducer with shared inputs replaces separate
+    mean(), reduce(stdDev) and count() scans. A fully-masked sentinel is merged
+    in so every band exists even for an empty window, whose count is 0
+    (unmasked, as for a pixel with no observations) and other bands masked.
+    Returns a dict with 'mean' (bands), 'sd' (<band>_stdDev, population), 'n'
+    (first band's count, named after it) and, when cross=True, 'cov': the
+    Bessel-corrected cross-covariance of the first two bands, from the mean of
+    their product.
+    """
+    bands = list(bands)
+    sentinel = ee.Image.constant([0] * len(bands)).rename(bands).updateMask(0).toFloat()
+    coll = coll.select(bands).merge(ee.ImageCollection([sentinel]))
+    if cross:
+        coll = coll.map(lambda img: img.addBands(
+            img.select(bands[0]).multiply(img.select(bands[1])).rename('cross')))
+
+    reducer = ee.Reducer.mean() \
+        .combine(reducer2=ee.Reducer.stdDev(), sharedInputs=True) \
+        .combine(reducer2=ee.Reducer.count(), sharedInputs=True)
+    stats = coll.reduce(reducer)
+
+    mean = stats.select([f'{b}_mean' for b in bands], bands)
+    out = dict(
+        mean=mean,
+        sd=stats.select([f'{b}_stdDev' for b in bands]),
+        n=stats.select(f'{bands[0]}_count').rename(bands[0]),
+    )
+    if cross:
+        n = out['n']
+        # cov = (E[xy] - E[x]E[y]) * n/(n-1)
+        out['cov'] = stats.select('cross_mean') \
+            .subtract(mean.select(bands[0]).multiply(mean.select(bands[1]))) \
+            .multiply(n).divide(n.subtract(1)).rename('cov')
+    return out
+
+
+def ttest(s1, inference_start, war_start, pre_interval, post_interval, ttest_type='welch', pre_stats=None):
     inference_start = ee.Date(inference_start)
 
     # Filter to pre-event and post-event periods
@@ -113,14 +157,13 @@ def ttest(s1, inference_start, war_start, pre_interval, post_interval, ttest_typ
     )
     post = s1.filterDate(inference_start, inference_start.advance(post_interval, "month"))
 
-    # Per-period statistics
-    pre_mean = pre.mean()
-    pre_sd = pre.reduce(ee.Reducer.stdDev())
-    pre_n = pre.select('VV').count()
+    # Per-period statistics, one fused reduction per window (pre may be precomputed)
+    if pre_stats is None:
+        pre_stats = _window_moments(pre)
+    pre_mean, pre_sd, pre_n = pre_stats['mean'], pre_stats['sd'], pre_stats['n']
 
-    post_mean = post.mean()
-    post_sd = post.reduce(ee.Reducer.stdDev())
-    post_n = post.select('VV').count()
+    post_stats = _window_moments(post)
+    post_mean, post_sd, post_n = post_stats['mean'], post_stats['sd'], post_stats['n']
 
     if ttest_type == 'welch':
         # Welch's t-test: does not assume equal variance
@@ -165,9 +208,10 @@ def ttest(s1, inference_start, war_start, pre_interval, post_interval, ttest_typ
         .addBands(post_n.toFloat().rename('n_post')).addBands(df.toFloat())
 
 
-def ztest(s1, inference_start, war_start, pre_interval):
+def ztest(s1, inference_start, war_start, pre_interval, pre_stats=None):
     """Z-test: compare the single latest post-event image to the pre-war baseline.
-    z = |x_latest - mean_pre| / sd_pre, per pixel.
+    z = |x_latest - mean_pre| / sd_pre, per pixel. pre_stats, if given, replaces
+    the pre-window _window_moments (e.g. from a materialized baseline).
     """
     inference_start = ee.Date(inference_start)
 
@@ -176,9 +220,9 @@ def ztest(s1, inference_start, war_start, pre_interval):
         war_start
     )
 
-    pre_mean = pre.mean()
-    pre_sd = pre.reduce(ee.Reducer.stdDev())
-    pre_n = pre.select('VV').count()
+    if pre_stats is None:
+        pre_stats = _window_moments(pre)
+    pre_mean, pre_sd, pre_n = pre_stats['mean'], pre_stats['sd'], pre_stats['n']
 
     # Latest single image after inference_start
     post = s1.filterDate(inference_start, ee.Date('2099-01-01'))
@@ -221,31 +265,17 @@ def hotelling_t2(s1, inference_start, war_start, pre_interval, post_interval, tt
     )
     post = s1.filterDate(inference_start, inference_start.advance(post_interval, "month"))
 
-    pre_mean = pre.mean()
-    post_mean = post.mean()
-    pre_n = pre.select('VV').count()
-    post_n = post.select('VV').count()
+    # Means, variances, counts and the VV/VH cross-covariance in one pass per window
+    pre_stats = _window_moments(pre, cross=True)
+    post_stats = _window_moments(post, cross=True)
+    pre_mean, pre_n, pre_cov = pre_stats['mean'], pre_stats['n'], pre_stats['cov']
+    post_mean, post_n, post_cov = post_stats['mean'], post_stats['n'], post_stats['cov']
 
     # Per-pixel variances
-    pre_sd = pre.reduce(ee.Reducer.stdDev())
-    post_sd = post.reduce(ee.Reducer.stdDev())
-    pre_var_vv = pre_sd.select('VV_stdDev').pow(2)
-    pre_var_vh = pre_sd.select('VH_stdDev').pow(2)
-    post_var_vv = post_sd.select('VV_stdDev').pow(2)
-    post_var_vh = post_sd.select('VH_stdDev').pow(2)
-
-    # Per-pixel cross-covariance: cov(VV, VH) = E[(VV-mu_VV)(VH-mu_VH)]
-    pre_cov = pre.map(lambda img:
-        img.select('VV').subtract(pre_mean.select('VV'))
-        .multiply(img.select('VH').subtract(pre_mean.select('VH')))
-        .rename('cov')
-    ).mean().multiply(pre_n).divide(pre_n.subtract(1))  # Bessel correction
-
-    post_cov = post.map(lambda img:
-        img.select('VV').subtract(post_mean.select('VV'))
-        .multiply(img.select('VH').subtract(post_mean.select('VH')))
-        .rename('cov')
-    ).mean().multiply(post_n).divide(post_n.subtract(1))  # Bessel correction
+    pre_var_vv = pre_stats['sd'].select('VV_stdDev').pow(2)
+    pre_var_vh = pre_stats['sd'].select('VH_stdDev').pow(2)
+    post_var_vv = post_stats['sd'].select('VV_stdDev').pow(2)
+    post_var_vh = post_stats['sd'].select('VH_stdDev').pow(2)
 
     # Pooled covariance matrix elements: S_pooled = ((n1-1)*S1 + (n2-1)*S2) / (n1+n2-2)
     denom_pool = pre_n.add(post_n).subtract(2)
@@ -371,7 +401,33 @@ def _build_s2_collection(aoi, start, end):
     return joined.map(mask_one)
 
 
-def detect_damage(aoi, inference_start, war_start, pre_interval=12, post_interval=2, footprints=None, viz=False, export=False, export_dir='PWTT_Export', export_name=None, export_scale=10, grid_scale=500, export_grid=False, clip=True, method='stouffer', threshold=3.3, ttest_type='welch', smoothing='default', mask_before_smooth=True, lee_mode='per_image', sensor='s1'):
+METHODS = ('stouffer', 'max', 'ztest', 'hotelling', 'mahalanobis', 'cusum', 'mahalanobis_max')
+
+
+def method_bands(method):
+    """Output band names of detect_damage for one method."""
+    bands = ['T_statistic', 'damage', 'p_value', 'n_pre', 'n_post']
+    if method in ('hotelling', 'mahalanobis', 'cusum', 'mahalanobis_max'):
+        bands += ['Z_statistic', 'Z_p_value']
+    return bands
+
+
+def _s1_orbit_collection(aoi, orbit, lee_mode='per_image'):
+    """Log-scale VV/VH S1 IW collection of one relative orbit over the AOI (all dates).
+
+    Images are Lee-filtered individually when lee_mode='per_image'.
+    """
+    s1 = ee.ImageCollection("COPERNICUS/S1_GRD_FLOAT") \
+        .filter(ee.Filter.listContains("transmitterReceiverPolarisation", "VH")) \
+        .filter(ee.Filter.eq("instrumentMode", "IW")) \
+        .filter(ee.Filter.eq("relativeOrbitNumber_start", orbit)) \
+        .filterBounds(aoi)
+    if lee_mode == 'per_image':
+        s1 = s1.map(lee_filter)
+    return s1.select(['VV', 'VH']).map(lambda image: image.log())
+
+
+def detect_damage(aoi, inference_start, war_start, pre_interval=12, post_interval=2, footprints=None, viz=False, export=False, export_dir='PWTT_Export', export_name=None, export_scale=10, grid_scale=500, export_grid=False, clip=True, method='stouffer', threshold=3.3, ttest_type='welch', smoothing='default', mask_before_smooth=True, lee_mode='per_image', sensor='s1', cusum_mode='array', baseline_cache=None):
     import warnings
 
     if (export or export_grid) and export_name is None:
@@ -387,15 +443,33 @@ def detect_damage(aoi, inference_start, war_start, pre_interval=12, post_interva
                 "The post-war period will use pre-war imagery."
             )
 
+    methods = [method] if isinstance(method, str) else list(method)
+    if not methods or len(set(methods)) != len(methods):
+        raise ValueError(f"method must be a method name or a list of distinct names, got {method!r}")
+    for m in methods:
+        if m not in METHODS:
+            raise ValueError(f"method must be one of {', '.join(METHODS)} (or a list of them), got '{m}'")
     if sensor not in ('s1', 's2', 'combined'):
         raise ValueError(f"sensor must be 's1', 's2', or 'combined', got '{sensor}'")
-    if sensor in ('s2', 'combined') and method not in ('mahalanobis', 'hotelling'):
-        raise ValueError(
-            f"sensor='{sensor}' only supports method in ('mahalanobis', 'hotelling'), got '{method}'"
-        )
+    for m in methods:
+        if sensor in ('s2', 'combined') and m not in ('mahalanobis', 'hotelling'):
+            raise ValueError(
+                f"sensor='{sensor}' only supports method in ('mahalanobis', 'hotelling'), got '{m}'"
+            )
+    if cusum_mode not in ('array', 'iterate'):
+        raise ValueError(f"cusum_mode must be 'array' or 'iterate', got '{cusum_mode}'")
+
+    # Materialized per-orbit pre-war statistics (pwtt.baseline), S1 only; an
+    # ee.ImageCollection is used as is (e.g. pwtt.baseline.graph_baseline)
+    baseline = None
+    if isinstance(baseline_cache, ee.ImageCollection) and sensor != 's2':
+        baseline = baseline_cache
+    elif baseline_cache is not None and sensor != 's2':
+        baseline = baseline_cache.get(aoi, war_start, pre_interval, lee_mode)
 
     inference_start = ee.Date(inference_start)
     war_start = ee.Date(war_start)
+    pre_start = war_start.advance(ee.Number(pre_interval).multiply(-1), "month")
 
     def _setup_s1():
         bl = ['VV', 'VH']
@@ -408,14 +482,7 @@ def detect_damage(aoi, inference_start, war_start, pre_interval=12, post_interva
             .distinct()
 
         def make_s1(orbit):
-            s1 = ee.ImageCollection("COPERNICUS/S1_GRD_FLOAT") \
-                .filter(ee.Filter.listContains("transmitterReceiverPolarisation", "VH")) \
-                .filter(ee.Filter.eq("instrumentMode", "IW")) \
-                .filter(ee.Filter.eq("relativeOrbitNumber_start", orbit)) \
-                .filterBounds(aoi)
-            if lee_mode == 'per_image':
-                s1 = s1.map(lee_filter)
-            return s1.select(['VV', 'VH']).map(lambda image: image.log())
+            return _s1_orbit_collection(aoi, orbit, lee_mode)
 
         return bl, orbs, make_s1
 
@@ -442,398 +509,382 @@ def detect_damage(aoi, inference_start, war_start, pre_interval=12, post_interva
         groups = s1_groups
 
     if sensor == 's1':
-        # Fallback image for orbits with no coverage — all bands present but fully masked
-        empty_orbit = ee.Image.constant([0, 0, 0, 0, 0, 0, 0, 0]).rename(
-            ['VV', 'VH', 'VV_pvalue', 'VH_pvalue', 'n_pre', 'n_post', 'df_VV', 'df_VH']
-        ).updateMask(ee.Image.constant(0)).toFloat()
-
+        # _window_moments merges in a masked sentinel, so an orbit with an empty
+        # window still yields every band: test bands masked, n_pre/n_post 0
         def map_orbit_ttest(orbit):
-            s1 = make_orbit_s1(orbit)
-            result = ttest(s1, inference_start, war_start, pre_interval, post_interval, ttest_type=ttest_type)
-            return ee.Image(ee.Algorithms.If(result.bandNames().size().gt(0), result, empty_orbit))
+            s1 = make_group_collection(orbit)
+            pre_stats, _ = pwtt_baseline.pre_moments(baseline, orbit, s1.filterDate(pre_start, war_start))
+            return ttest(s1, inference_start, war_start, pre_interval, post_interval,
+                         ttest_type=ttest_type, pre_stats=pre_stats)
 
         def map_orbit_ztest(orbit):
-            s1 = make_orbit_s1(orbit)
-            result = ztest(s1, inference_start, war_start, pre_interval)
-            return ee.Image(ee.Algorithms.If(result.bandNames().size().gt(0), result, empty_orbit))
+            s1 = make_group_collection(orbit)
+            pre_stats, _ = pwtt_baseline.pre_moments(baseline, orbit, s1.filterDate(pre_start, war_start))
+            return ztest(s1, inference_start, war_start, pre_interval, pre_stats=pre_stats)
 
     urban = ee.ImageCollection('GOOGLE/DYNAMICWORLD/V1').filterDate(
         war_start.advance(-1 * pre_interval, 'months'), war_start).select('built').mean()
 
-    if method in ('hotelling', 'mahalanobis', 'cusum'):
-
-        def _compute_for_sensor(bl, grps, make_group):
-            """Run per-group z-normalization + pooled Mahalanobis for one sensor.
-
-            Returns a dict with t2, quad_form, pre_n, post_n, valid_mask, p,
-            and z_max (latest-image absolute-z statistic, unmasked).
-            """
-            p = len(bl)
-
-            def normalize_group_images(group_id):
-                coll = make_group(group_id)
-                pre = coll.filterDate(
+    # Intermediate results shared by several methods (per-sensor normalization and
+    # moments, per-orbit test images), built once per detect_damage call
+    shared = {}
+
+    def _shared(key, build):
+        if key not in shared:
+            shared[key] = build()
+        return shared[key]
+
+    def _method_image(method):
+        """Output image (method_bands(method)) for one method, from the shared stages."""
+        if method in ('hotelling', 'mahalanobis', 'cusum'):
+
+            def _compute_for_sensor(bl, grps, make_group):
+                """Run per-group z-normalization + pooled Mahalanobis for one sensor.
+
+                Returns a dict with t2, quad_form, pre_n, post_n, valid_mask, p,
+                z_max (latest-image absolute-z statistic, unmasked) and all_norm
+                (every normalized image, plus a masked sentinel per window).
+                """
+                p = len(bl)
+
+                def normalize_group_images(group_id):
+                    coll = make_group(group_id)
+                    pre = coll.filterDate(pre_start, war_start)
+                    pre_stats, match = pwtt_baseline.pre_moments(baseline, group_id, pre, bands=bl)
+                    has_pre = pwtt_baseline.has_pre(match, pre_stats['n'].reduceRegion(
+                        ee.Reducer.max(), aoi, 1000).values().get(0))
+                    pre_mean = pre_stats['mean']
+                    pre_sd = pre_stats['sd'].rename(bl)
+                    normalized = coll.map(lambda img:
+                        img.select(bl).subtract(pre_mean).divide(pre_sd.max(ee.Image.constant(1e-10)))
+                        .copyProperties(img, ['system:time_start'])
+                    ).toList(500)
+                    return ee.Algorithms.If(ee.Number(has_pre).gt(0), normalized, ee.List([]))
+
+                masked_sentinel = ee.Image.constant([0] * p).rename(bl).updateMask(0).toFloat()
+                pre_sentinel = masked_sentinel.set('system:time_start', war_start.advance(-1, 'day').millis())
+                post_sentinel = masked_sentinel.set('system:time_start', inference_start.advance(1, 'day').millis())
+                all_norm = ee.ImageCollection(grps.map(normalize_group_images).flatten()) \
+                    .merge(ee.ImageCollection([pre_sentinel, post_sentinel]))
+                pre_norm = all_norm.filterDate(
                     war_start.advance(ee.Number(pre_interval).multiply(-1), "month"), war_start)
-                has_pre = pre.select(bl[0]).count().reduceRegion(
-                    ee.Reducer.max(), aoi, 1000).values().get(0)
-                pre_mean = pre.mean()
-                pre_sd = pre.reduce(ee.Reducer.stdDev()).rename(bl)
-                normalized = coll.map(lambda img:
-                    img.select(bl).subtract(pre_mean).divide(pre_sd.max(ee.Image.constant(1e-10)))
-                    .copyProperties(img, ['system:time_start'])
-                ).toList(500)
-                return ee.Algorithms.If(ee.Number(has_pre).gt(0), normalized, ee.List([]))
-
-            masked_sentinel = ee.Image.constant([0] * p).rename(bl).updateMask(0).toFloat()
-            pre_sentinel = masked_sentinel.set('system:time_start', war_start.advance(-1, 'day').millis())
-            post_sentinel = masked_sentinel.set('system:time_start', inference_start.advance(1, 'day').millis())
-            all_norm = ee.ImageCollection(grps.map(normalize_group_images).flatten()) \
-                .merge(ee.ImageCollection([pre_sentinel, post_sentinel]))
-            pre_norm = all_norm.filterDate(
-                war_start.advance(ee.Number(pre_interval).multiply(-1), "month"), war_start)
-            post_norm = all_norm.filterDate(
-                inference_start, inference_start.advance(post_interval, "month"))
-
-            pre_mean_raw = pre_norm.mean()
-            post_mean_raw = post_norm.mean()
-            if sensor == 's1' and lee_mode == 'composite' and bl == ['VV', 'VH']:
-                _add_angle = lambda img: img.addBands(ee.Image.constant(0).rename('angle'))
-                pre_mean = lee_filter(_add_angle(pre_mean_raw)).select(bl)
-                post_mean = lee_filter(_add_angle(post_mean_raw)).select(bl)
-            else:
-                pre_mean = pre_mean_raw
-                post_mean = post_mean_raw
-            pre_n_l = pre_norm.select(bl[0]).count()
-            post_n_l = post_norm.select(bl[0]).count()
-
-            denom_pool = pre_n_l.add(post_n_l).subtract(2)
-
-            def cross_cov(coll, mean_img, n, bi, bj):
-                return coll.map(lambda img:
-                    img.select(bi).subtract(mean_img.select(bi))
-                    .multiply(img.select(bj).subtract(mean_img.select(bj)))
-                    .rename('cov')
-                ).mean().multiply(n).divide(n.subtract(1))
-
-            cov_band_imgs = []
-            for i in range(p):
-                for j in range(p):
-                    bi = bl[i]
-                    bj = bl[j]
-                    pre_ij = cross_cov(pre_norm, pre_mean_raw, pre_n_l, bi, bj)
-                    post_ij = cross_cov(post_norm, post_mean_raw, post_n_l, bi, bj)
-                    s_ij = (pre_ij.multiply(pre_n_l.subtract(1))
-                            .add(post_ij.multiply(post_n_l.subtract(1)))
-                            .divide(denom_pool))
-                    cov_band_imgs.append(s_ij.rename(f's_{i}_{j}'))
-
-            cov_flat = ee.Image.cat(cov_band_imgs).toArray()
-            cov_array = cov_flat.arrayReshape(ee.Image(ee.Array([p, p])), 2)
-            ridge = ee.Image(ee.Array([[1e-10 if i == j else 0.0 for j in range(p)]
-                                        for i in range(p)]))
-            s_inv = cov_array.add(ridge).matrixInverse()
-
-            d_bands = [post_mean.select(b).subtract(pre_mean.select(b)).rename(f'd_{b}')
-                       for b in bl]
-            d_flat = ee.Image.cat(d_bands).toArray()
-            d_col = d_flat.arrayReshape(ee.Image(ee.Array([p, 1])), 2)
-            qf_arr = d_col.arrayTranspose().matrixMultiply(s_inv).matrixMultiply(d_col)
-            quad_form_l = qf_arr.arrayProject([0]).arrayFlatten([['quad']])
-            t2_l = pre_n_l.multiply(post_n_l).divide(pre_n_l.add(post_n_l)).multiply(quad_form_l)
-
-            valid_mask_l = pre_n_l.gte(3).And(post_n_l.gte(2))
-
-            # Latest-image z-test
-            latest_post = all_norm.filterDate(
-                inference_start, inference_start.advance(post_interval, 'month')
-            ).sort('system:time_start', False).mosaic()
-            z_per_band = [latest_post.select(b).abs() for b in bl]
-            z_max_l = z_per_band[0]
-            for zi in z_per_band[1:]:
-                z_max_l = z_max_l.max(zi)
-
-            return dict(
-                t2=t2_l, quad_form=quad_form_l, pre_n=pre_n_l, post_n=post_n_l,
-                valid_mask=valid_mask_l, p=p, z_max=z_max_l, all_norm=all_norm,
-                make_group=make_group, bl=bl,
-            )
+                post_norm = all_norm.filterDate(
+                    inference_start, inference_start.advance(post_interval, "month"))
+
+                pre_mean_raw = pre_norm.mean()
+                post_mean_raw = post_norm.mean()
+                if sensor == 's1' and lee_mode == 'composite' and bl == ['VV', 'VH']:
+                    _add_angle = lambda img: img.addBands(ee.Image.constant(0).rename('angle'))
+                    pre_mean = lee_filter(_add_angle(pre_mean_raw)).select(bl)
+                    post_mean = lee_filter(_add_angle(post_mean_raw)).select(bl)
+                else:
+                    pre_mean = pre_mean_raw
+                    post_mean = post_mean_raw
+                pre_n_l = pre_norm.select(bl[0]).count()
+                post_n_l = post_norm.select(bl[0]).count()
+
+                denom_pool = pre_n_l.add(post_n_l).subtract(2)
+
+                def scatter_matrix(coll, mean_img, n):
+                    """Centered scatter matrix sum_t (x_t - mean)(x_t - mean)' as a p×p array image.
+
+                    toArray() gives each pixel its (images × bands) matrix X of unmasked
+                    observations, so one X'X product covers every band pair in a single
+                    pass over the window, symmetric by construction, instead of one
+                    collection scan per (i, j).
+                    """
+                    x = coll.map(lambda img: img.select(bl).subtract(mean_img.select(bl))) \
+                        .toArray().updateMask(n.gte(1))
+                    return x.arrayTranspose().matrixMultiply(x)
+
+                # S_pooled = ((n1-1)*S1 + (n2-1)*S2) / (n1+n2-2) = (scatter1 + scatter2) / (n1+n2-2)
+                cov_array = scatter_matrix(pre_norm, pre_mean_raw, pre_n_l) \
+                    .add(scatter_matrix(post_norm, post_mean_raw, post_n_l)) \
+                    .divide(denom_pool)
+                ridge = ee.Image(ee.Array([[1e-10 if i == j else 0.0 for j in range(p)]
+                                            for i in range(p)]))
+                s_inv = cov_array.add(ridge).matrixInverse()
+
+                d_bands = [post_mean.select(b).subtract(pre_mean.select(b)).rename(f'd_{b}')
+                           for b in bl]
+                d_flat = ee.Image.cat(d_bands).toArray()
+                d_col = d_flat.arrayReshape(ee.Image(ee.Array([p, 1])), 2)
+                qf_arr = d_col.arrayTranspose().matrixMultiply(s_inv).matrixMultiply(d_col)
+                quad_form_l = qf_arr.arrayProject([0]).arrayFlatten([['quad']])
+                t2_l = pre_n_l.multiply(post_n_l).divide(pre_n_l.add(post_n_l)).multiply(quad_form_l)
+
+                valid_mask_l = pre_n_l.gte(3).And(post_n_l.gte(2))
+
+                # Latest-image z-test
+                latest_post = all_norm.filterDate(
+                    inference_start, inference_start.advance(post_interval, 'month')
+                ).sort('system:time_start', False).mosaic()
+                z_per_band = [latest_post.select(b).abs() for b in bl]
+                z_max_l = z_per_band[0]
+                for zi in z_per_band[1:]:
+                    z_max_l = z_max_l.max(zi)
+
+                return dict(
+                    t2=t2_l, quad_form=quad_form_l, pre_n=pre_n_l, post_n=post_n_l,
+                    valid_mask=valid_mask_l, p=p, z_max=z_max_l, all_norm=all_norm,
+                )
+
+            if sensor in ('s1', 's2'):
+                r = _shared('sensor', lambda: _compute_for_sensor(band_list, groups, make_group_collection))
+                t2 = r['t2']
+                quad_form = r['quad_form']
+                p = r['p']
+                pre_n = r['pre_n']
+                post_n = r['post_n']
+                valid_mask = r['valid_mask']
+                z_max = r['z_max'].updateMask(valid_mask).rename('Z_statistic')
+            else:  # combined: independence assumption → block-diagonal cov → T²_combined = T²_S1 + T²_S2
+                if method == 'cusum':
+                    raise ValueError("sensor='combined' does not support method='cusum'")
+                r1 = _shared('s1', lambda: _compute_for_sensor(s1_band_list, s1_groups, s1_make))
+                r2 = _shared('s2', lambda: _compute_for_sensor(s2_band_list, s2_groups, s2_make))
+                t2 = r1['t2'].unmask(0).add(r2['t2'].unmask(0))
+                # quad_form analogue: use t2 directly for max_change in mahalanobis branch
+                quad_form = r1['quad_form'].unmask(0).add(r2['quad_form'].unmask(0))
+                p = r1['p'] + r2['p']
+                pre_n = r1['pre_n'].unmask(0).add(r2['pre_n'].unmask(0))
+                post_n = r1['post_n'].unmask(0).add(r2['post_n'].unmask(0))
+                # Need both sensors to have valid coverage in a pixel
+                valid_mask = r1['valid_mask'].unmask(0).And(r2['valid_mask'].unmask(0))
+                z_max = r1['z_max'].unmask(0).max(r2['z_max'].unmask(0)) \
+                    .updateMask(valid_mask).rename('Z_statistic')
 
-        if sensor in ('s1', 's2'):
-            r = _compute_for_sensor(band_list, groups, make_group_collection)
-            t2 = r['t2']
-            quad_form = r['quad_form']
-            p = r['p']
-            pre_n = r['pre_n']
-            post_n = r['post_n']
-            valid_mask = r['valid_mask']
-            z_max = r['z_max'].updateMask(valid_mask).rename('Z_statistic')
-        else:  # combined: independence assumption → block-diagonal cov → T²_combined = T²_S1 + T²_S2
             if method == 'cusum':
-                raise ValueError("sensor='combined' does not support method='cusum'")
-            r1 = _compute_for_sensor(s1_band_list, s1_groups, s1_make)
-            r2 = _compute_for_sensor(s2_band_list, s2_groups, s2_make)
-            t2 = r1['t2'].unmask(0).add(r2['t2'].unmask(0))
-            # quad_form analogue: use t2 directly for max_change in mahalanobis branch
-            quad_form = r1['quad_form'].unmask(0).add(r2['quad_form'].unmask(0))
-            p = r1['p'] + r2['p']
-            pre_n = r1['pre_n'].unmask(0).add(r2['pre_n'].unmask(0))
-            post_n = r1['post_n'].unmask(0).add(r2['post_n'].unmask(0))
-            # Need both sensors to have valid coverage in a pixel
-            valid_mask = r1['valid_mask'].unmask(0).And(r2['valid_mask'].unmask(0))
-            z_max = r1['z_max'].unmask(0).max(r2['z_max'].unmask(0)) \
-                .updateMask(valid_mask).rename('Z_statistic')
-
-        if method == 'cusum':
-            # Page's CUSUM on per-pixel fused magnitude m_t = sqrt(sum_b x_b²)
-            # over post-war z-normalized images. Output: max S_t per pixel.
-            def normalize_group_post(group_id):
-                coll = make_group_collection(group_id)
-                pre = coll.filterDate(
-                    war_start.advance(ee.Number(pre_interval).multiply(-1), "month"), war_start)
-                has_pre = pre.select(band_list[0]).count().reduceRegion(
-                    ee.Reducer.max(), aoi, 1000).values().get(0)
-                pre_mean_g = pre.mean()
-                pre_sd_g = pre.reduce(ee.Reducer.stdDev()).rename(band_list)
-                post = coll.filterDate(inference_start, inference_start.advance(post_interval, "month"))
-                normalized = post.map(lambda img:
-                    img.select(band_list).subtract(pre_mean_g).divide(pre_sd_g.max(ee.Image.constant(1e-10)))
-                    .copyProperties(img, ['system:time_start'])
-                ).toList(500)
-                return ee.Algorithms.If(ee.Number(has_pre).gt(0), normalized, ee.List([]))
-
-            post_only = ee.ImageCollection(groups.map(normalize_group_post).flatten())
-            post_sorted = post_only.sort('system:time_start')
-
-            def to_magnitude(img):
-                sq = ee.Image(img).select(band_list).pow(2)
-                # sum across bands → 1-band magnitude
-                total = ee.Image.constant(0)
-                for b in band_list:
-                    total = total.add(sq.select(b))
-                return (total.sqrt().rename('m')
-                        .copyProperties(img, ['system:time_start']))
-
-            mag_ic = post_sorted.map(to_magnitude)
-            first_mag = ee.Image(mag_ic.first())
-            zero_img = first_mag.multiply(0).rename('m')
-            cusum_k = ee.Image.constant(2.0)
-            initial = ee.List([zero_img, zero_img])
-
-            def step(img, prev):
-                prev = ee.List(prev)
-                s_prev = ee.Image(prev.get(0))
-                max_s = ee.Image(prev.get(1))
-                s_new = ee.Image(img).subtract(cusum_k).add(s_prev).max(ee.Image.constant(0))
-                return ee.List([s_new, s_new.max(max_s)])
-
-            final = ee.List(mag_ic.iterate(step, initial))
-            max_change = ee.Image(final.get(1)).rename('max_change')
-            p_value = max_change.multiply(-0.5).exp().max(ee.Image.constant(1e-10)).rename('p_value')
-        elif method == 'mahalanobis':
-            # Effect size: sqrt(Mahalanobis distance) — n-invariant
-            max_change = quad_form.sqrt().rename('max_change')
-            # Chi-squared(p) survival approximation (valid for large n).
-            p_value = t2.multiply(-0.5).exp().max(ee.Image.constant(1e-10)).rename('p_value')
-        else:
-            # Hotelling: sqrt(T²) as test statistic
-            max_change = t2.sqrt().rename('max_change')
-            p_value = t2.multiply(-0.5).exp().max(ee.Image.constant(1e-10)).rename('p_value')
+                # Page's CUSUM on per-pixel fused magnitude m_t = sqrt(sum_b x_b²)
+                # over post-war z-normalized images. Output: max S_t per pixel.
+                # The shared normalized collection, post window: its empty-window
+                # sentinel is fully masked, so it drops out of toArray (array mode)
+                # and leaves S unchanged (iterate mode)
+                post_sorted = r['all_norm'].filterDate(
+                    inference_start, inference_start.advance(post_interval, "month")
+                ).sort('system:time_start')
+
+                def to_magnitude(img):
+                    sq = ee.Image(img).select(band_list).pow(2)
+                    # sum across bands → 1-band magnitude
+                    total = ee.Image.constant(0)
+                    for b in band_list:
+                        total = total.add(sq.select(b))
+                    return (total.sqrt().rename('m')
+                            .copyProperties(img, ['system:time_start']))
+
+                mag_ic = post_sorted.map(to_magnitude)
+                if cusum_mode == 'array':
+                    # Closed form of S_t = max(0, S_{t-1} + m_t - k), S_0 = 0:
+                    # with C_t = sum_{u<=t} (m_u - k), S_t = C_t - min(0, min_{u<=t} C_u).
+                    # toArray() stacks each pixel's unmasked magnitudes in time order
+                    # (T×1), so two arrayAccum scans replace the T-step iterate chain.
+                    m_arr = mag_ic.toArray()
+                    m_arr = m_arr.updateMask(m_arr.arrayLength(0).gt(0))
+                    c_arr = m_arr.subtract(2.0).arrayAccum(0, ee.Reducer.sum())
+                    s_arr = c_arr.subtract(c_arr.arrayAccum(0, ee.Reducer.min()).min(0))
+                    max_change = s_arr.arrayReduce(ee.Reducer.max(), [0]) \
+                        .arrayGet([0, 0]).rename('max_change')
+                else:
+                    zero_img = ee.Image.constant(0).rename('m')
+                    cusum_k = ee.Image.constant(2.0)
+                    initial = ee.List([zero_img, zero_img])
+
+                    def step(img, prev):
+                        prev = ee.List(prev)
+                        s_prev = ee.Image(prev.get(0))
+                        max_s = ee.Image(prev.get(1))
+                        # A masked magnitude (no observation there) leaves S_t unchanged,
+                        # as array mode only scans the unmasked ones
+                        s_new = ee.Image(img).subtract(cusum_k).add(s_prev).max(ee.Image.constant(0)) \
+                            .unmask(s_prev)
+                        return ee.List([s_new, s_new.max(max_s)])
+
+                    final = ee.List(mag_ic.iterate(step, initial))
+                    max_change = ee.Image(final.get(1)).rename('max_change')
+                p_value = max_change.multiply(-0.5).exp().max(ee.Image.constant(1e-10)).rename('p_value')
+            elif method == 'mahalanobis':
+                # Effect size: sqrt(Mahalanobis distance) — n-invariant
+                max_change = quad_form.sqrt().rename('max_change')
+                # Chi-squared(p) survival approximation (valid for large n).
+                p_value = t2.multiply(-0.5).exp().max(ee.Image.constant(1e-10)).rename('p_value')
+            else:
+                # Hotelling: sqrt(T²) as test statistic
+                max_change = t2.sqrt().rename('max_change')
+                p_value = t2.multiply(-0.5).exp().max(ee.Image.constant(1e-10)).rename('p_value')
 
-        max_change = max_change.updateMask(valid_mask)
-        p_value = p_value.updateMask(valid_mask)
-        n_pre = pre_n.rename('n_pre')
-        n_post = post_n.rename('n_post')
-        z_p = two_tailed_pvalue(z_max).updateMask(valid_mask).rename('Z_p_value')
+            max_change = max_change.updateMask(valid_mask)
+            p_value = p_value.updateMask(valid_mask)
+            n_pre = pre_n.rename('n_pre')
+            n_post = post_n.rename('n_post')
+            z_p = two_tailed_pvalue(z_max).updateMask(valid_mask).rename('Z_p_value')
 
-    else:
-        # Per-orbit test → combine across orbits
-        if method == 'ztest':
-            orbit_images = ee.ImageCollection(groups.map(map_orbit_ztest))
-        elif method == 'mahalanobis_max':
-            # JS app-style: per-orbit Mahalanobis on raw log SAR (no z-norm),
-            # always with per-image Lee filter, MAX across orbits.
-            def map_orbit_mahalanobis_raw(orbit):
-                s1 = ee.ImageCollection("COPERNICUS/S1_GRD_FLOAT") \
-                    .filter(ee.Filter.listContains("transmitterReceiverPolarisation", "VH")) \
-                    .filter(ee.Filter.eq("instrumentMode", "IW")) \
-                    .filter(ee.Filter.eq("relativeOrbitNumber_start", orbit)) \
-                    .filterBounds(aoi) \
-                    .map(lee_filter) \
-                    .select(['VV', 'VH']) \
-                    .map(lambda image: image.log())
-                pre = s1.filterDate(
-                    war_start.advance(ee.Number(pre_interval).multiply(-1), 'month'), war_start)
-                post = s1.filterDate(
-                    inference_start, inference_start.advance(post_interval, 'month'))
-
-                pre_n_o = pre.select('VV').count()
-                post_n_o = post.select('VV').count()
-                pre_mean_o = pre.mean()
-                post_mean_o = post.mean()
-
-                pre_sd_o = pre.reduce(ee.Reducer.stdDev())
-                post_sd_o = post.reduce(ee.Reducer.stdDev())
-                pre_var_vv = pre_sd_o.select('VV_stdDev').pow(2)
-                pre_var_vh = pre_sd_o.select('VH_stdDev').pow(2)
-                post_var_vv = post_sd_o.select('VV_stdDev').pow(2)
-                post_var_vh = post_sd_o.select('VH_stdDev').pow(2)
-
-                pre_cov_o = pre.map(lambda img:
-                    img.select('VV').subtract(pre_mean_o.select('VV'))
-                       .multiply(img.select('VH').subtract(pre_mean_o.select('VH')))
-                       .rename('cov')
-                ).mean().multiply(pre_n_o).divide(pre_n_o.subtract(1))
-                post_cov_o = post.map(lambda img:
-                    img.select('VV').subtract(post_mean_o.select('VV'))
-                       .multiply(img.select('VH').subtract(post_mean_o.select('VH')))
-                       .rename('cov')
-                ).mean().multiply(post_n_o).divide(post_n_o.subtract(1))
-
-                denom = pre_n_o.add(post_n_o).subtract(2)
-                s11 = pre_var_vv.multiply(pre_n_o.subtract(1)) \
-                    .add(post_var_vv.multiply(post_n_o.subtract(1))).divide(denom)
-                s22 = pre_var_vh.multiply(pre_n_o.subtract(1)) \
-                    .add(post_var_vh.multiply(post_n_o.subtract(1))).divide(denom)
-                s12 = pre_cov_o.multiply(pre_n_o.subtract(1)) \
-                    .add(post_cov_o.multiply(post_n_o.subtract(1))).divide(denom)
-                det = s11.multiply(s22).subtract(s12.pow(2)).max(ee.Image.constant(1e-10))
-
-                d_vv = post_mean_o.select('VV').subtract(pre_mean_o.select('VV'))
-                d_vh = post_mean_o.select('VH').subtract(pre_mean_o.select('VH'))
-                quad = d_vv.pow(2).multiply(s22) \
-                    .subtract(d_vv.multiply(d_vh).multiply(s12).multiply(2)) \
-                    .add(d_vh.pow(2).multiply(s11)) \
-                    .divide(det)
-                mahal = quad.sqrt().rename('mahal')
-
-                # Hotelling T² → chi-squared(p) approx for p-value
-                t2 = pre_n_o.multiply(post_n_o).divide(pre_n_o.add(post_n_o)).multiply(quad)
-                p_v = t2.multiply(-0.5).exp().max(ee.Image.constant(1e-10)).rename('p_value')
-
-                return mahal.addBands(p_v) \
-                    .addBands(pre_n_o.toFloat().rename('n_pre')) \
-                    .addBands(post_n_o.toFloat().rename('n_post'))
-
-            orbit_images = ee.ImageCollection(groups.map(map_orbit_mahalanobis_raw))
         else:
-            orbit_images = ee.ImageCollection(groups.map(map_orbit_ttest))
-
-        if method == 'stouffer':
-            # Stouffer's weighted Z-score: weight each orbit by sqrt(df).
-            # Combined Z = sum(w*t)/sqrt(sum(w²)) is standard normal under H0.
-            def add_stouffer_bands(img):
-                df = img.select('df_VV').max(img.select('df_VH'))
-                w = df.sqrt()
-                return img.addBands(img.select('VV').multiply(w).rename('w_VV')) \
-                          .addBands(img.select('VH').multiply(w).rename('w_VH')) \
-                          .addBands(df.rename('w_sq'))
-
-            orbit_images = orbit_images.map(add_stouffer_bands)
-            sum_w_sq = orbit_images.select('w_sq').sum()
-            z_vv = orbit_images.select('w_VV').sum().divide(sum_w_sq.sqrt()).rename('VV')
-            z_vh = orbit_images.select('w_VH').sum().divide(sum_w_sq.sqrt()).rename('VH')
-
-            max_change = z_vv.max(z_vh).rename('max_change')
-            # Independent VV/VH tests → Bonferroni correction ×2
-            p_value = two_tailed_pvalue(max_change).multiply(2) \
-                .min(ee.Image.constant(1)).rename('p_value')
-            n_pre = orbit_images.select('n_pre').sum()
-            n_post = orbit_images.select('n_post').sum()
-
-        elif method in ('max', 'ztest'):
-            # max t-value (or z-value) across orbits, min p-value, Bonferroni
-            t_max = orbit_images.select(['VV', 'VH']).max()
-            p_min = orbit_images.select(['VV_pvalue', 'VH_pvalue']).min()
-            n_pre = orbit_images.select('n_pre').max()
-            n_post = orbit_images.select('n_post').max()
-            image = t_max.addBands(p_min)
-
-            max_change = image.select('VV').max(image.select('VH')).rename('max_change')
-            p_value = image.select('VV_pvalue').min(image.select('VH_pvalue')).rename('p_value')
-            n_orbits = groups.size()
-            p_value = p_value.multiply(n_orbits).min(ee.Image.constant(1)).rename('p_value')
-
-        elif method == 'mahalanobis_max':
-            max_change = orbit_images.select('mahal').max().rename('max_change')
-            p_value = orbit_images.select('p_value').min().rename('p_value')
-            n_pre = orbit_images.select('n_pre').max()
-            n_post = orbit_images.select('n_post').max()
-            valid_mask_l = n_pre.gte(3).And(n_post.gte(2))
-            max_change = max_change.updateMask(valid_mask_l)
-            p_value = p_value.updateMask(valid_mask_l)
-            # Z_statistic placeholders (zero-valued) for output schema parity with mahalanobis
-            z_max = ee.Image.constant(0).toFloat().rename('Z_statistic').updateMask(valid_mask_l)
-            z_p = ee.Image.constant(1).toFloat().rename('Z_p_value').updateMask(valid_mask_l)
+            # Per-orbit test → combine across orbits
+            if method == 'ztest':
+                orbit_images = _shared('ztest', lambda: ee.ImageCollection(groups.map(map_orbit_ztest)))
+            elif method == 'mahalanobis_max':
+                # JS app-style: per-orbit Mahalanobis on raw log SAR (no z-norm),
+                # always with per-image Lee filter, MAX across orbits.
+                def map_orbit_mahalanobis_raw(orbit):
+                    s1 = _s1_orbit_collection(aoi, orbit)
+                    pre = s1.filterDate(
+                        war_start.advance(ee.Number(pre_interval).multiply(-1), 'month'), war_start)
+                    post = s1.filterDate(
+                        inference_start, inference_start.advance(post_interval, 'month'))
+
+                    pre_stats_o = _window_moments(pre, cross=True)
+                    post_stats_o = _window_moments(post, cross=True)
+                    pre_n_o, post_n_o = pre_stats_o['n'], post_stats_o['n']
+                    pre_mean_o, post_mean_o = pre_stats_o['mean'], post_stats_o['mean']
+                    pre_cov_o, post_cov_o = pre_stats_o['cov'], post_stats_o['cov']
+
+                    pre_var_vv = pre_stats_o['sd'].select('VV_stdDev').pow(2)
+                    pre_var_vh = pre_stats_o['sd'].select('VH_stdDev').pow(2)
+                    post_var_vv = post_stats_o['sd'].select('VV_stdDev').pow(2)
+                    post_var_vh = post_stats_o['sd'].select('VH_stdDev').pow(2)
+
+                    denom = pre_n_o.add(post_n_o).subtract(2)
+                    s11 = pre_var_vv.multiply(pre_n_o.subtract(1)) \
+                        .add(post_var_vv.multiply(post_n_o.subtract(1))).divide(denom)
+                    s22 = pre_var_vh.multiply(pre_n_o.subtract(1)) \
+                        .add(post_var_vh.multiply(post_n_o.subtract(1))).divide(denom)
+                    s12 = pre_cov_o.multiply(pre_n_o.subtract(1)) \
+                        .add(post_cov_o.multiply(post_n_o.subtract(1))).divide(denom)
+                    det = s11.multiply(s22).subtract(s12.pow(2)).max(ee.Image.constant(1e-10))
+
+                    d_vv = post_mean_o.select('VV').subtract(pre_mean_o.select('VV'))
+                    d_vh = post_mean_o.select('VH').subtract(pre_mean_o.select('VH'))
+                    quad = d_vv.pow(2).multiply(s22) \
+                        .subtract(d_vv.multiply(d_vh).multiply(s12).multiply(2)) \
+                        .add(d_vh.pow(2).multiply(s11)) \
+                        .divide(det)
+                    mahal = quad.sqrt().rename('mahal')
+
+                    # Hotelling T² → chi-squared(p) approx for p-value
+                    t2 = pre_n_o.multiply(post_n_o).divide(pre_n_o.add(post_n_o)).multiply(quad)
+                    p_v = t2.multiply(-0.5).exp().max(ee.Image.constant(1e-10)).rename('p_value')
+
+                    return mahal.addBands(p_v) \
+                        .addBands(pre_n_o.toFloat().rename('n_pre')) \
+                        .addBands(post_n_o.toFloat().rename('n_post'))
+
+                orbit_images = ee.ImageCollection(groups.map(map_orbit_mahalanobis_raw))
+            else:
+                orbit_images = _shared('ttest', lambda: ee.ImageCollection(groups.map(map_orbit_ttest)))
+
+            if method == 'stouffer':
+                # Stouffer's weighted Z-score: weight each orbit by sqrt(df).
+                # Combined Z = sum(w*t)/sqrt(sum(w²)) is standard normal under H0.
+                def add_stouffer_bands(img):
+                    df = img.select('df_VV').max(img.select('df_VH'))
+                    w = df.sqrt()
+                    return img.addBands(img.select('VV').multiply(w).rename('w_VV')) \
+                              .addBands(img.select('VH').multiply(w).rename('w_VH')) \
+                              .addBands(df.rename('w_sq'))
+
+                orbit_images = orbit_images.map(add_stouffer_bands)
+                sum_w_sq = orbit_images.select('w_sq').sum()
+                z_vv = orbit_images.select('w_VV').sum().divide(sum_w_sq.sqrt()).rename('VV')
+                z_vh = orbit_images.select('w_VH').sum().divide(sum_w_sq.sqrt()).rename('VH')
+
+                max_change = z_vv.max(z_vh).rename('max_change')
+                # Independent VV/VH tests → Bonferroni correction ×2
+                p_value = two_tailed_pvalue(max_change).multiply(2) \
+                    .min(ee.Image.constant(1)).rename('p_value')
+                n_pre = orbit_images.select('n_pre').sum()
+                n_post = orbit_images.select('n_post').sum()
+
+            elif method in ('max', 'ztest'):
+                # max t-value (or z-value) across orbits, min p-value, Bonferroni
+                t_max = orbit_images.select(['VV', 'VH']).max()
+                p_min = orbit_images.select(['VV_pvalue', 'VH_pvalue']).min()
+                n_pre = orbit_images.select('n_pre').max()
+                n_post = orbit_images.select('n_post').max()
+                image = t_max.addBands(p_min)
+
+                max_change = image.select('VV').max(image.select('VH')).rename('max_change')
+                p_value = image.select('VV_pvalue').min(image.select('VH_pvalue')).rename('p_value')
+                n_orbits = groups.size()
+                p_value = p_value.multiply(n_orbits).min(ee.Image.constant(1)).rename('p_value')
+
+            elif method == 'mahalanobis_max':
+                max_change = orbit_images.select('mahal').max().rename('max_change')
+                p_value = orbit_images.select('p_value').min().rename('p_value')
+                n_pre = orbit_images.select('n_pre').max()
+                n_post = orbit_images.select('n_post').max()
+                valid_mask_l = n_pre.gte(3).And(n_post.gte(2))
+                max_change = max_change.updateMask(valid_mask_l)
+                p_value = p_value.updateMask(valid_mask_l)
+                # Z_statistic placeholders (zero-valued) for output schema parity with mahalanobis
+                z_max = ee.Image.constant(0).toFloat().rename('Z_statistic').updateMask(valid_mask_l)
+                z_p = ee.Image.constant(1).toFloat().rename('Z_p_value').updateMask(valid_mask_l)
 
+            else:
+                raise ValueError(f"method must be one of {', '.join(METHODS)}, got '{method}'")
+
+        # Build a fully-masked empty image as fallback for areas with no S1 coverage
+        empty_bands = method_bands(method)
+        empty_vals = [0, 0, 1, 0, 0, 0, 1][:len(empty_bands)]
+        empty = ee.Image.constant(empty_vals).rename(empty_bands) \
+            .updateMask(ee.Image.constant(0)).toFloat()
+
+        # Constrain to areas with valid raw data before smoothing
+        raw_data_mask = max_change.mask()
+        urban_mask = urban.gt(0.1)
+
+        # Parse smoothing config
+        smooth_cfg = smoothing_config(smoothing, method)
+
+        # Urban mask ordering: before or after focal median
+        if mask_before_smooth:
+            max_change_input = max_change.updateMask(urban_mask).updateMask(raw_data_mask)
+            t_smooth = max_change_input.focalMedian(smooth_cfg['focal_radius'], 'gaussian', 'meters')
+            if clip:
+                t_smooth = t_smooth.clip(aoi)
         else:
-            raise ValueError(f"method must be 'stouffer', 'max', 'ztest', 'hotelling', 'mahalanobis', or 'mahalanobis_max', got '{method}'")
-
-    # Build a fully-masked empty image as fallback for areas with no S1 coverage
-    empty_bands = ['T_statistic', 'damage', 'p_value', 'n_pre', 'n_post']
-    empty_vals = [0, 0, 1, 0, 0]
-    if method in ('hotelling', 'mahalanobis', 'cusum', 'mahalanobis_max'):
-        empty_bands += ['Z_statistic', 'Z_p_value']
-        empty_vals += [0, 1]
-    empty = ee.Image.constant(empty_vals).rename(empty_bands) \
-        .updateMask(ee.Image.constant(0)).toFloat()
-
-    # Constrain to areas with valid raw data before smoothing
-    raw_data_mask = max_change.mask()
-    urban_mask = urban.gt(0.1)
-
-    # Parse smoothing config
-    if method == 'mahalanobis_max' and smoothing == 'default':
-        # JS-app default: 20m gaussian focal median, no multi-scale convolutions
-        smoothing = dict(focal_radius=20, kernels=[], weights=[1.0])
-    if smoothing == 'default':
-        smooth_cfg = dict(focal_radius=10, kernels=[50, 100, 150], weights=[0.25, 0.25, 0.25, 0.25])
-    elif smoothing == 'focal_only':
-        smooth_cfg = dict(focal_radius=10, kernels=[], weights=[1.0])
-    elif isinstance(smoothing, dict):
-        smooth_cfg = smoothing
-    else:
-        raise ValueError(f"smoothing must be 'default', 'focal_only', or a dict, got '{smoothing}'")
-
-    # Urban mask ordering: before or after focal median
-    if mask_before_smooth:
-        max_change_input = max_change.updateMask(urban_mask).updateMask(raw_data_mask)
-        t_smooth = max_change_input.focalMedian(smooth_cfg['focal_radius'], 'gaussian', 'meters')
-        if clip:
-            t_smooth = t_smooth.clip(aoi)
-    else:
-        t_smooth = max_change.focalMedian(smooth_cfg['focal_radius'], 'gaussian', 'meters')
+            t_smooth = max_change.focalMedian(smooth_cfg['focal_radius'], 'gaussian', 'meters')
+            if clip:
+                t_smooth = t_smooth.clip(aoi)
+            t_smooth = t_smooth.updateMask(urban_mask).updateMask(raw_data_mask)
+
+        # Multi-scale convolutions
+        layers = [t_smooth]
+        for radius in smooth_cfg.get('kernels', []):
+            layers.append(t_smooth.convolve(ee.Kernel.circle(radius, 'meters', True)))
+
+        # Weighted average across scales
+        weights = smooth_cfg['weights']
+        T_statistic = ee.Image.constant(0).toFloat()
+        for layer, w in zip(layers, weights):
+            T_statistic = T_statistic.add(layer.multiply(w))
+        T_statistic = T_statistic.rename('T_statistic')
+
+        # Re-apply raw data mask so T_statistic doesn't extend beyond where n_post is valid
+        T_statistic = T_statistic.updateMask(raw_data_mask)
+        damage = T_statistic.gt(threshold).rename('damage')
+
+        # Mask p-values with urban mask
+        p_value = p_value.updateMask(urban.gt(0.1))
         if clip:
-            t_smooth = t_smooth.clip(aoi)
-        t_smooth = t_smooth.updateMask(urban_mask).updateMask(raw_data_mask)
-
-    # Multi-scale convolutions
-    layers = [t_smooth]
-    for radius in smooth_cfg.get('kernels', []):
-        layers.append(t_smooth.convolve(ee.Kernel.circle(radius, 'meters', True)))
-
-    # Weighted average across scales
-    weights = smooth_cfg['weights']
-    T_statistic = ee.Image.constant(0).toFloat()
-    for layer, w in zip(layers, weights):
-        T_statistic = T_statistic.add(layer.multiply(w))
-    T_statistic = T_statistic.rename('T_statistic')
-
-    # Re-apply raw data mask so T_statistic doesn't extend beyond where n_post is valid
-    T_statistic = T_statistic.updateMask(raw_data_mask)
-    damage = T_statistic.gt(threshold).rename('damage')
-
-    # Mask p-values with urban mask
-    p_value = p_value.updateMask(urban.gt(0.1))
-    if clip:
-        p_value = p_value.clip(aoi)
+            p_value = p_value.clip(aoi)
 
-    image = T_statistic.addBands(damage).addBands(p_value).addBands(n_pre).addBands(n_post)
-    if method in ('hotelling', 'mahalanobis', 'cusum', 'mahalanobis_max'):
-        image = image.addBands(z_max).addBands(z_p)
-    image = image.toFloat()
+        image = T_statistic.addBands(damage).addBands(p_value).addBands(n_pre).addBands(n_post)
+        if method in ('hotelling', 'mahalanobis', 'cusum', 'mahalanobis_max'):
+            image = image.addBands(z_max).addBands(z_p)
+        image = image.toFloat()
+
+        # If no groups had coverage, return the empty fallback
+        image = ee.Image(ee.Algorithms.If(groups.size().gt(0), image, empty))
+        return image
 
-    # If no groups had coverage, return the empty fallback
-    image = ee.Image(ee.Algorithms.If(groups.size().gt(0), image, empty))
+    if isinstance(method, str):
+        image = _method_image(method)
+    else:
+        # One image with a band set per method, e.g. 'stouffer_T_statistic'
+        image = ee.Image.cat([
+            _method_image(m).rename([f'{m}_{b}' for b in method_bands(m)]) for m in method
+        ])
     if clip:
         image = image.clip(aoi)
 
@@ -854,9 +905,12 @@ def detect_damage(aoi, inference_start, war_start, pre_interval=12, post_interva
         task_grid.start()
 
     if viz:
+        import geemap
+
         Map = geemap.Map()
         Map.add_basemap('SATELLITE')
-        Map.addLayer(image.select('T_statistic'), {'min': 3, 'max': 5, 'opacity': 0.5, 'palette': ["yellow", "red", "purple"]}, "T-test")
+        t_band = 'T_statistic' if isinstance(method, str) else f'{methods[0]}_T_statistic'
+        Map.addLayer(image.select(t_band), {'min': 3, 'max': 5, 'opacity': 0.5, 'palette': ["yellow", "red", "purple"]}, "T-test")
         Map.centerObject(aoi)
         return Map
 
@@ -0,0 +1,241 @@
+"""
+Automatic quadtree splitting of AOIs whose EE computations run out of memory or time.
+
+Large AOIs used to be split by hand (``eval.py --chunks``) or at a fixed H3
+resolution. Here a region is first tried whole. If it fails with an EE
+resource error ("User memory limit exceeded", "Computation timed out",
+...), its bounding-box quadrant is split into four child tiles with double
+the ``tileScale`` (up to 16). Each child is tried in turn and split again
+if it fails too, down to ``max_depth`` levels. Transient and other errors
+are not split; they propagate (pulls) or go to the scheduler's normal
+retry (exports).
+
+A tile is identified by its path from the root: ``''`` is the whole AOI,
+and ``'03'`` is quadrant 3 of quadrant 0. Quadrants are numbered
+0 = south-west, 1 = south-east, 2 = north-west and 3 = north-east.
+
+Only the *work* is split; the image is computed over the full AOI as before.
+``QuadTree.filter`` keeps the features whose centroid lies in the tile's
+half-open box. Boxes on the edge of the AOI's bounding box are open on the
+outside, so a footprint that crosses the AOI edge with its centroid outside
+the bounding box still belongs to exactly one tile. A split run therefore
+gives exactly the features and values of an unsplit one, and merging the
+tiles is a concatenation.
+
+Re-runs do not redo successful tiles:
+- ``pull_split`` stores the split plan in a ``GetInfoCache``, and each
+  tile's pull is itself cached by graph;
+- ``queue_export`` tiles are scheduler jobs (``pwtt.scheduler``), so
+  completed tiles are skipped on resume.
+
+Usage:
+    from pwtt.autosplit import QuadTree, pull_split, queue_export
+
+    tree = QuadTree(aoi)
+    cols = pull_split(lambda path, tile_scale: fetch_columns(sample(tree, path, tile_scale), columns),
+                      cache=cache, key=plan_key)
+
+    sched = Scheduler('exports.sqlite')
+    queue_export(sched, 'gaza_stouffer', image, aoi, footprints=fp)
+    sched.run()
+"""
+
+try:
+    import ee
+except ImportError:  # pull_split and split_policy run without EE
+    ee = None
+import numpy as np
+
+
+RESOURCE_ERRORS = (
+    'user memory limit exceeded', 'computation timed out', 'out of memory', 'memory limit',
+    'execution timed out',
+)
+MAX_TILE_SCALE = 16
+CENTROID = ('centroid_x', 'centroid_y')
+
+
+def is_resource_error(error):
+    """True for EE errors that a smaller region or a higher ``tileScale`` can fix."""
+    msg = str(error).lower()
+    return any(s in msg for s in RESOURCE_ERRORS)
+
+
+def child_tile_scale(tile_scale):
+    return min(tile_scale * 2, MAX_TILE_SCALE)
+
+
+def with_centroids(fc):
+    """``fc`` with ``centroid_x`` / ``centroid_y`` (lon/lat) properties, for ``QuadTree.filter``."""
+    def add(f):
+        xy = f.geometry().centroid(10).coordinates()
+        return f.set(CENTROID[0], xy.get(0), CENTROID[1], xy.get(1))
+    return ee.FeatureCollection(fc).map(add)
+
+
+class QuadTree:
+    """Quadtree over ``aoi``'s bounding box; ``bbox`` (x0, y0, x1, y1) is fetched on first use if not given."""
+
+    def __init__(self, aoi, bbox=None):
+        self.aoi = ee.Geometry(aoi)
+        self._bbox = None if bbox is None else [float(v) for v in bbox]
+
+    @property
+    def bbox(self):
+        if self._bbox is None:
+            ring = np.asarray(self.aoi.bounds().coordinates().getInfo()[0], dtype=np.float64)
+            self._bbox = [ring[:, 0].min(), ring[:, 1].min(), ring[:, 0].max(), ring[:, 1].max()]
+        return self._bbox
+
+    def bounds(self, path):
+        """(x0, y0, x1, y1) of tile ``path``."""
+        x0, y0, x1, y1 = self.bbox
+        for q in path:
+            q = int(q)
+            xm, ym = (x0 + x1) / 2, (y0 + y1) / 2
+            x0, x1 = (x0, xm) if q % 2 == 0 else (xm, x1)
+            y0, y1 = (y0, ym) if q < 2 else (ym, y1)
+        return x0, y0, x1, y1
+
+    def region(self, path):
+        """Geometry of tile ``path``: its box intersected with the AOI (the AOI itself at the root)."""
+        if not path:
+            return self.aoi
+        return ee.Geometry.Rectangle(list(self.bounds(path)), None, False).intersection(self.aoi, 10)
+
+    def filter(self, path):
+        """``ee.Filter`` on ``with_centroids`` properties: centroid in the tile's half-open box.
+
+        Sides on the edge of the root box are left open, so every centroid,
+        including those of footprints that stick out of the bounding box,
+        falls in exactly one leaf (as if clamped to the root box).
+        """
+        if not path:
+            return None
+        x0, y0, x1, y1 = self.bounds(path)
+        rx0, ry0, rx1, ry1 = self.bbox
+        cx, cy = CENTROID
+        bounds = []
+        if x0 > rx0:
+            bounds.append(ee.Filter.gte(cx, x0))
+        if x1 < rx1:
+            bounds.append(ee.Filter.lt(cx, x1))
+        if y0 > ry0:
+            bounds.append(ee.Filter.gte(cy, y0))
+        if y1 < ry1:
+            bounds.append(ee.Filter.lt(cy, y1))
+        return ee.Filter.And(*bounds)
+
+    def restrict(self, fc, path):
+        """Features of ``fc`` (with centroids) assigned to tile ``path``."""
+        return fc if not path else fc.filter(self.filter(path))
+
+
+# ------------------------------------------------------------------ pulls
+
+def _concat(parts):
+    """Concatenate column dicts (same keys) from several tiles."""
+    parts = [p for p in parts if p]
+    if len(parts) == 1:
+        return parts[0]
+    if not parts:
+        return {}
+    return {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+
+
+def pull_split(pull, tile_scale=1, max_depth=4, cache=None, key=None, log=print):
+    """``pull(path, tile_scale)`` for the whole AOI, splitting tiles that fail with resource errors.
+
+    ``pull`` returns a dict of equal-length column arrays (as
+    ``fetch_columns``), and the tiles' columns are concatenated in path
+    order. With ``cache`` (a ``GetInfoCache``) and ``key``, the paths that
+    had to be split are stored, so a re-run goes straight to the leaves. If
+    ``pull`` caches its results too, tiles that already succeeded cost
+    nothing. Raises the last error if a tile still fails at ``max_depth``.
+    """
+    split = set(cache.get(key, []) if cache is not None and key is not None else [])
+    log = log or (lambda *args, **kwargs: None)
+
+    def run(path, scale):
+        if path not in split:
+            try:
+                return pull(path, scale)
+            except Exception as exc:
+                if not is_resource_error(exc) or len(path) >= max_depth:
+                    raise
+                log(f"    tile '{path or 'root'}' failed ({exc}); splitting into 4")
+                split.add(path)
+                if cache is not None and key is not None:
+                    cache.put(key, sorted(split))
+        return _concat([run(path + str(q), child_tile_scale(scale)) for q in range(4)])
+
+    return run('', tile_scale)
+
+
+# ---------------------------------------------------------------- exports
+
+def split_policy(max_depth=4):
+    """Scheduler retry policy: four child tiles on resource errors, else resubmit unchanged.
+
+    Parameters carry the tile ``path`` and ``tileScale``; a tile at
+    ``max_depth`` is resubmitted with a higher ``tileScale`` until that is
+    exhausted.
+    """
+    def retry(params, error):
+        path, scale = params.get('path', ''), params.get('tileScale', 1)
+        if not is_resource_error(error):
+            return params
+        if len(path) < max_depth:
+            return [dict(params, path=path + str(q), tileScale=child_tile_scale(scale)) for q in range(4)]
+        if scale < MAX_TILE_SCALE:
+            return dict(params, tileScale=child_tile_scale(scale))
+        return None
+    return retry
+
+
+def tile_description(description, path):
+    """Task description of tile ``path``: ``description`` plus ``_<quadrant>`` per level."""
+    return description + ''.join(f'_{q}' for q in path)
+
+
+def queue_export(sched, description, image, aoi, footprints=None, folder='PWTT_Export', scale=10,
+                 tile_scale=8, max_depth=4, priority=0, bbox=None):
+    """Queue a ``detect_damage`` export on ``sched`` that splits itself on resource errors.
+
+    Without ``footprints`` it is an image export (GeoTIFF to Drive) of the
+    tile's region. With ``footprints`` it is a GeoJSON table of the image's
+    mean per footprint, as ``detect_damage(footprints=...)``, with
+    ``tileScale`` escalating from ``tile_scale``. Tiles are exported as
+    ``tile_description(description, path)``, so the parts of a split export
+    are the files or assets with that prefix. ``parts`` lists them.
+    """
+    tree = QuadTree(aoi, bbox)
+    fc = None
+    if footprints is not None:
+        fc = with_centroids(ee.FeatureCollection(footprints).filterBounds(tree.aoi))
+
+    def build(params):
+        path = params['path']
+        name = tile_description(description, path)
+        if fc is None:
+            return ee.batch.Export.image.toDrive(
+                image=image, description=name, folder=folder, region=tree.region(path),
+                scale=scale, maxPixels=1e13,
+            )
+        table = image.reduceRegions(
+            collection=tree.restrict(fc, path), reducer=ee.Reducer.mean(),
+            scale=scale, tileScale=params['tileScale'],
+        )
+        return ee.batch.Export.table.toDrive(
+            collection=table, description=name, folder=folder, fileFormat='GEOJSON',
+        )
+
+    return sched.add(description, build, priority=priority,
+                     params=dict(path='', tileScale=tile_scale), retry=split_policy(max_depth))
+
+
+def parts(sched, description):
+    """Descriptions of the completed leaf tiles of a ``queue_export`` job, in path order."""
+    prefix = description + '_'
+    return sorted(k for k, state in sched.states().items()
+                  if state == 'COMPLETED' and (k == description or k.startswith(prefix)))
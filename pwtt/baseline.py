@@ -0,0 +1,195 @@
+"""
+Materialized pre-war baselines, reused across inference dates.
+
+For a fixed AOI, ``war_start``, ``pre_interval`` and ``lee_mode``, each orbit's
+pre-war window statistics (mean, stdDev, count, VV/VH covariance) are the same
+for every ``inference_start``. ``BaselineCache`` exports them once as an
+ImageCollection asset with one image per orbit, keyed on those four values.
+``detect_damage(baseline_cache=...)`` then reads the stored image for every
+orbit it has and computes the rest as before. Reruns and sweeps pay only for
+the post window. Orbit images carry the ``has_pre`` flag that
+``normalize_group_images`` otherwise gets with a ``reduceRegion``.
+
+By default each orbit's statistics are stored on the grid of its first
+pre-war S1 scene (that scene's UTM ``crs`` and 10 m ``crsTransform``), the
+grid the in-graph baseline is computed from, so reads line up with the S1
+pixels instead of being resampled from a lat/lon grid. Pass ``crs`` with
+``crs_transform`` (or ``scale``) to store them on another grid, e.g. the one
+you export ``detect_damage`` on.
+
+Usage:
+    from pwtt import detect_damage
+    from pwtt.baseline import BaselineCache
+
+    baselines = BaselineCache('projects/my-project/assets/pwtt_baselines')
+    tasks = baselines.materialize(aoi, '2023-10-10', pre_interval=12)  # once
+    img = detect_damage(aoi, '2024-07-01', '2023-10-10', baseline_cache=baselines)
+"""
+
+try:
+    import ee
+except ImportError:  # imported by pwtt/__init__; only needed once a baseline is built
+    ee = None
+
+from .cache import graph_key
+
+
+BANDS = ['VV', 'VH']
+
+
+def pack_moments(moments, bands=BANDS):
+    """One image from a ``_window_moments(cross=True)`` dict: means, ``<b>_stdDev``, ``n``, ``cov``."""
+    return moments['mean'].select(bands) \
+        .addBands(moments['sd']) \
+        .addBands(moments['n'].rename('n')) \
+        .addBands(moments['cov'].rename('cov'))
+
+
+def unpack_moments(image, bands=BANDS):
+    """Inverse of ``pack_moments``: the ``_window_moments`` dict of a stored baseline image."""
+    image = ee.Image(image)
+    return dict(
+        mean=image.select(bands),
+        sd=image.select([f'{b}_stdDev' for b in bands]),
+        n=image.select('n').rename(bands[0]),
+        cov=image.select('cov'),
+    )
+
+
+def _pre_scenes(aoi, war, pre_interval):
+    """Pre-war S1 IW VV/VH scenes over ``aoi``, all orbits."""
+    return ee.ImageCollection('COPERNICUS/S1_GRD_FLOAT') \
+        .filter(ee.Filter.listContains('transmitterReceiverPolarisation', 'VH')) \
+        .filter(ee.Filter.eq('instrumentMode', 'IW')) \
+        .filterBounds(aoi).filterDate(war.advance(-pre_interval, 'month'), war)
+
+
+def _pre_orbits(aoi, war, pre_interval):
+    """Server-side list of the relative orbits with pre-war S1 IW VV/VH imagery over ``aoi``."""
+    return _pre_scenes(aoi, war, pre_interval).aggregate_array('relativeOrbitNumber_start').distinct()
+
+
+class BaselineCache:
+    """ImageCollection assets of per-orbit pre-war moments under ``asset_root``; see module docstring."""
+
+    def __init__(self, asset_root, scale=10, crs=None, crs_transform=None):
+        self.asset_root = asset_root.rstrip('/')
+        self.scale = scale
+        self.crs = crs
+        self.crs_transform = crs_transform
+        self._found = {}
+
+    def grid(self, aoi, orbit, war, pre_interval):
+        """Export grid arguments for one orbit: the given ``crs``, else its first pre-war scene's."""
+        if self.crs is not None:
+            if self.crs_transform is not None:
+                return dict(crs=self.crs, crsTransform=self.crs_transform)
+            return dict(crs=self.crs, scale=self.scale)
+        proj = _pre_scenes(aoi, war, pre_interval) \
+            .filter(ee.Filter.eq('relativeOrbitNumber_start', orbit)) \
+            .first().select('VV').projection().getInfo()
+        return dict(crs=proj['crs'], crsTransform=proj['transform'])
+
+    def key(self, aoi, war_start, pre_interval, lee_mode):
+        # ee.Date(...) so '2023-10-10' and ee.Date('2023-10-10') give the same key
+        return graph_key(ee.Geometry(aoi), war_start=ee.Date(war_start).serialize(),
+                         pre_interval=pre_interval, lee_mode=lee_mode)
+
+    def asset_id(self, aoi, war_start, pre_interval, lee_mode):
+        return f'{self.asset_root}/baseline_{self.key(aoi, war_start, pre_interval, lee_mode)[:16]}'
+
+    def get(self, aoi, war_start, pre_interval, lee_mode):
+        """The stored collection for this baseline, or None if it was never materialized."""
+        asset_id = self.asset_id(aoi, war_start, pre_interval, lee_mode)
+        if asset_id not in self._found:
+            self._found[asset_id] = ee.data.getInfo(asset_id) is not None
+        return ee.ImageCollection(asset_id) if self._found[asset_id] else None
+
+    def materialize(self, aoi, war_start, pre_interval=12, lee_mode='per_image', orbits=None):
+        """Start one export per orbit with pre-war imagery over ``aoi``; returns the tasks.
+
+        Orbits already in the collection are skipped, so this can be re-run
+        to fill in orbits whose exports failed.
+        """
+        asset_id = self.asset_id(aoi, war_start, pre_interval, lee_mode)
+        war = ee.Date(war_start)
+        aoi = ee.Geometry(aoi)
+        if orbits is None:
+            orbits = _pre_orbits(aoi, war, pre_interval).getInfo()
+
+        if ee.data.getInfo(asset_id) is None:
+            ee.data.createAsset({'type': 'IMAGE_COLLECTION'}, asset_id)
+            done = set()
+        else:
+            done = set(ee.ImageCollection(asset_id).aggregate_array('orbit').getInfo())
+
+        tasks = []
+        for orbit in sorted(orbits):
+            if orbit in done:
+                continue
+            image = baseline_image(aoi, orbit, war_start, pre_interval, lee_mode)
+            task = ee.batch.Export.image.toAsset(
+                image=image,
+                description=f'{asset_id.rsplit("/", 1)[-1]}_{orbit}',
+                assetId=f'{asset_id}/orbit_{orbit}',
+                region=aoi, maxPixels=1e13, **self.grid(aoi, orbit, war, pre_interval),
+            )
+            task.start()
+            tasks.append(task)
+        self._found.pop(asset_id, None)
+        return tasks
+
+
+def baseline_image(aoi, orbit, war_start, pre_interval=12, lee_mode='per_image'):
+    """One orbit's packed pre-war moments with ``orbit`` and ``has_pre`` properties (orbit may be server-side)."""
+    from . import _s1_orbit_collection, _window_moments
+
+    war = ee.Date(war_start)
+    start = war.advance(-pre_interval, 'month')
+    aoi = ee.Geometry(aoi)
+    pre = _s1_orbit_collection(aoi, orbit, lee_mode).filterDate(start, war)
+    moments = _window_moments(pre, cross=True)
+    has_pre = moments['n'].reduceRegion(ee.Reducer.max(), aoi, 1000).values().get(0)
+    return pack_moments(moments).toFloat().set(dict(
+        orbit=orbit, has_pre=has_pre, war_start=war.millis(),
+        pre_interval=pre_interval, lee_mode=lee_mode,
+    ))
+
+
+def graph_baseline(aoi, war_start, pre_interval=12, lee_mode='per_image'):
+    """The collection ``BaselineCache.materialize`` would store, as an unexported graph.
+
+    Passed to ``detect_damage(baseline_cache=...)`` for several inference
+    dates, it makes every date reference the same per-orbit pre-war node
+    instead of each building its own (see ``pwtt.sweep``).
+    """
+    war = ee.Date(war_start)
+    aoi = ee.Geometry(aoi)
+    return ee.ImageCollection(_pre_orbits(aoi, war, pre_interval).map(
+        lambda orbit: baseline_image(aoi, orbit, war, pre_interval, lee_mode)))
+
+
+def pre_moments(baseline, orbit, pre, bands=BANDS, cross=False):
+    """``_window_moments(pre)`` for one orbit, from the stored baseline when it has the orbit.
+
+    ``baseline`` is the collection from ``BaselineCache.get`` (or None) and
+    ``orbit`` may be server-side. The lookup is an ``ee.Algorithms.If``, so
+    orbits missing from the collection are computed from ``pre``. Returns
+    ``(moments, match)``: ``match`` is the filtered baseline collection for
+    ``has_pre``, or None if no baseline applies (other bands than VV/VH).
+    """
+    from . import _window_moments
+
+    if baseline is None or list(bands) != BANDS:
+        return _window_moments(pre, bands, cross), None
+    match = baseline.filter(ee.Filter.eq('orbit', orbit))
+    image = ee.Algorithms.If(match.size().gt(0), match.first(),
+                             pack_moments(_window_moments(pre, bands, cross=True), bands))
+    return unpack_moments(image, bands), match
+
+
+def has_pre(match, fallback):
+    """The stored ``has_pre`` flag of a ``pre_moments`` match, else ``fallback``."""
+    if match is None:
+        return fallback
+    return ee.Algorithms.If(match.size().gt(0), match.first().get('has_pre'), fallback)
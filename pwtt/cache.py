@@ -0,0 +1,213 @@
+"""
+Content-addressed on-disk cache for Earth Engine ``getInfo`` results.
+
+Entries are keyed by the SHA-256 of an object's serialized expression graph
+plus any extra configuration, so re-running the same ``detect_damage`` →
+``reduceRegions`` pull (same AOI, dates, method, properties) is one disk read
+instead of a server round trip, while any change to the graph is a new key.
+Column pulls are stored as compressed ``.npz`` files (object columns as JSON
+inside them, so nothing is ever unpickled from the shared directory), other
+values as gzipped JSON. The directory is bounded by ``max_bytes`` with least-recently-used
+eviction (file mtime is the access time), entries can expire after ``ttl``
+seconds, and ``stats()`` reports hits, misses and evictions.
+
+Usage:
+    from pwtt.cache import GetInfoCache
+
+    cache = GetInfoCache('~/.cache/pwtt', max_bytes=2e9, ttl=7 * 86400)
+    total = cache.get_info(fc.size())
+    cols = cache.fetch_columns(fc, ['class', 'T_statistic', 'area'])
+    cache.invalidate(fc, columns=['class', 'T_statistic', 'area'])
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+DEFAULT_DIR = os.environ.get('PWTT_CACHE_DIR', '~/.cache/pwtt')
+
+
+def graph_key(obj, **config):
+    """SHA-256 hex digest of ``obj``'s serialized graph and ``config``.
+
+    ``obj`` is an EE object (anything with ``serialize()``) or a plain
+    JSON-serializable value.
+    """
+    graph = obj.serialize() if hasattr(obj, 'serialize') else json.dumps(obj, sort_keys=True, default=str)
+    h = hashlib.sha256(graph.encode())
+    h.update(json.dumps(config, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+class GetInfoCache:
+    """Size-bounded LRU directory cache of ``getInfo`` results; see module docstring."""
+
+    def __init__(self, directory=DEFAULT_DIR, max_bytes=2e9, ttl=None):
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = dict(hits=0, misses=0, expired=0, writes=0, evictions=0)
+
+    # ------------------------------------------------------------------ files
+
+    def _path(self, key, ext):
+        return self.directory / key[:2] / f'{key}{ext}'
+
+    def _find(self, key):
+        for ext in ('.npz', '.json.gz'):
+            path = self._path(key, ext)
+            if path.exists():
+                return path
+        return None
+
+    def _write(self, path, write):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _entries(self):
+        return [p for p in self.directory.glob('*/*') if not p.name.endswith('.tmp')]
+
+    def _evict(self):
+        entries = [(p.stat(), p) for p in self._entries()]
+        used = sum(st.st_size for st, _ in entries)
+        for st, path in sorted(entries, key=lambda e: e[0].st_mtime):
+            if used <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            used -= st.st_size
+            self._stats['evictions'] += 1
+
+    # ------------------------------------------------------------- get / put
+
+    def get(self, key, default=None):
+        """Cached value for ``key``, or ``default`` on a miss or expired entry."""
+        with self._lock:
+            path = self._find(key)
+            if path is None:
+                self._stats['misses'] += 1
+                return default
+            if path.suffix == '.npz':
+                try:
+                    created, value = _load_columns(path)
+                except (KeyError, ValueError):  # old format, which pickled object columns
+                    path.unlink(missing_ok=True)
+                    self._stats['misses'] += 1
+                    return default
+            else:
+                with gzip.open(path, 'rt') as f:
+                    entry = json.load(f)
+                created, value = entry['created'], entry['value']
+            if self.ttl is not None and time.time() - created > self.ttl:
+                path.unlink(missing_ok=True)
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return default
+            os.utime(path)  # mark as recently used
+            self._stats['hits'] += 1
+            return value
+
+    def put(self, key, value):
+        """Store ``value``: a dict of arrays goes to .npz, anything else to gzipped JSON."""
+        with self._lock:
+            old = self._find(key)
+            if old is not None:
+                old.unlink()
+            created = time.time()
+            if isinstance(value, dict) and value and all(isinstance(v, np.ndarray) for v in value.values()):
+                self._write(self._path(key, '.npz'), lambda f: _save_columns(f, created, value))
+            else:
+                payload = json.dumps(dict(created=created, value=value)).encode()
+                self._write(self._path(key, '.json.gz'), lambda f: f.write(gzip.compress(payload)))
+            self._stats['writes'] += 1
+            self._evict()
+        return value
+
+    # -------------------------------------------------------- EE convenience
+
+    def get_info(self, obj, **config):
+        """``obj.getInfo()``, from the cache when the same graph was fetched before."""
+        key = graph_key(obj, **config)
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = self.put(key, obj.getInfo())
+        return value
+
+    def fetch_columns(self, collection, columns, **kwargs):
+        """``pwtt.fetch.fetch_columns`` through the cache (keyed on graph + columns).
+
+        On a hit ``on_page`` is not called; the columns come back whole.
+        """
+        from .fetch import fetch_columns
+
+        key = graph_key(collection, columns=list(columns))
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = self.put(key, fetch_columns(collection, columns, **kwargs))
+        return value
+
+    # ------------------------------------------------------------ management
+
+    def invalidate(self, key_or_obj, **config):
+        """Drop one entry, given its key or the object (and config) it was cached under."""
+        key = key_or_obj if isinstance(key_or_obj, str) else graph_key(key_or_obj, **config)
+        with self._lock:
+            path = self._find(key)
+            if path is None:
+                return False
+            path.unlink()
+            return True
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            for path in self._entries():
+                path.unlink(missing_ok=True)
+
+    def stats(self):
+        """Hit/miss/eviction counters plus current entry count and bytes on disk."""
+        with self._lock:
+            entries = self._entries()
+            return dict(self._stats, entries=len(entries),
+                        bytes=sum(p.stat().st_size for p in entries))
+
+
+_MISSING = object()
+
+
+def _save_columns(f, created, columns):
+    """Numeric and string columns as arrays, object columns as one JSON document."""
+    arrays = {k: v for k, v in columns.items() if v.dtype != object}
+    objects = {k: v.tolist() for k, v in columns.items() if v.dtype == object}
+    meta = json.dumps(dict(order=list(columns), objects=objects),
+                      default=lambda o: o.item() if isinstance(o, np.generic) else str(o))
+    np.savez_compressed(f, __created__=created, __meta__=np.array(meta), **arrays)
+
+
+def _load_columns(path):
+    """``(created, columns)`` of an entry written by ``_save_columns``."""
+    with np.load(path, allow_pickle=False) as z:
+        meta = json.loads(str(z['__meta__']))
+        arrays = {k: z[k] for k in z.files if k not in ('__created__', '__meta__')}
+        created = float(z['__created__'])
+    for k, values in meta['objects'].items():
+        col = np.empty(len(values), dtype=object)
+        col[:] = values
+        arrays[k] = col
+    return created, {k: arrays[k] for k in meta['order']}
@@ -0,0 +1,1301 @@
+"""
+In-process emulator for the subset of Earth Engine that ``pwtt`` uses.
+
+Lets ``detect_damage``, ``ttest``, ``ztest``, ``hotelling_t2`` and
+``lee_filter`` run unchanged on NumPy stacks (synthetic, or cached scenes),
+for offline tests and benchmarks without an EE session or a queued task.
+
+Inside ``with session:`` every ``pwtt`` module's ``ee`` name points at this
+module, which provides ``Image``, ``ImageCollection``, ``Number``, ``List``,
+``Date``, ``Filter``, ``Reducer``, ``Kernel``, ``Algorithms.If`` and friends.
+Images are lazy: each one is a node that evaluates a window of pixels on
+demand (band name -> values, mask). Neighbourhood operators
+(``reduceNeighborhood``, ``focalMedian``, ``convolve``) pull a window grown
+by their radius from their input, and window sums are block-anchored (see
+``pwtt.local._box_sum``). Tiled evaluation therefore equals whole-raster
+evaluation bit for bit, whatever ``tile_size`` is. Metadata (band names,
+properties, collection membership, numbers, dates) is computed lazily in
+Python. A value that depends on pixels, such as a ``reduceRegion`` that
+``Algorithms.If`` branches on, evaluates the image it needs when forced.
+
+Semantics follow EE where ``pwtt`` depends on them:
+- division by zero gives 0;
+- masks are intersected by binary operations;
+- ``stdDev``/``variance`` are population statistics;
+- collection ``count()`` is 0 where nothing is valid;
+- ``mosaic()`` puts the last image on top;
+- ``toArray()`` stacks only the unmasked observations of each pixel.
+
+Math results keep the left operand's properties.
+The raster is the AOI: geometries are accepted and ignored (``clip`` and
+``filterBounds`` are no-ops). Sentinel-2, joins, exports, feature
+collections and terrain operators are not emulated.
+
+Usage:
+    import pwtt
+    from pwtt import emulator
+
+    session = emulator.Session(shape=(ny, nx), scale=10)
+    session.add_s1(orbit, linear_stack, times)   # (time, y, x, 2) VV/VH, NaN = masked
+    session.add_urban(built, '2023-06-01')       # Dynamic World 'built' probability
+    with session:
+        image = pwtt.detect_damage(session.aoi, '2024-07-01', '2023-10-10')
+    bands = image.compute(tile_size=512)         # {'T_statistic': (y, x) float32, ...}
+"""
+
+import datetime
+import math
+import sys
+
+import numpy as np
+
+from . import local
+
+
+class EEException(Exception):
+    """Raised where Earth Engine would report an error."""
+
+
+_SESSIONS = []
+
+
+def _current():
+    return _SESSIONS[-1] if _SESSIONS else None
+
+
+# ------------------------------------------------------------- computed values
+
+class ComputedObject:
+    """Lazily computed metadata value (number, string, list, dictionary, date, ...)."""
+
+    def __init__(self, thunk):
+        self._thunk = thunk
+        self._done = False
+        self._v = None
+
+    def _value(self):
+        if not self._done:
+            self._v = _value(self._thunk())
+            self._done = True
+            self._thunk = None
+        return self._v
+
+    def getInfo(self):
+        return _info(self._value())
+
+
+def _value(x):
+    """Force a computed object to its Python value (Images and collections stay as they are)."""
+    while isinstance(x, ComputedObject):
+        x = x._value()
+    return x
+
+
+def _info(x):
+    """Deep Python value, as ``getInfo`` returns it."""
+    x = _value(x)
+    if isinstance(x, (list, tuple)):
+        return [_info(v) for v in x]
+    if isinstance(x, dict):
+        return {k: _info(v) for k, v in x.items()}
+    if isinstance(x, Image):
+        return x.getInfo()
+    return x
+
+
+def _wrap(x):
+    """Wrap a Python value in the matching computed type, as EE's ``get`` results behave."""
+    if isinstance(x, (ComputedObject, Image, ImageCollection)):
+        return x
+    if isinstance(x, (bool, int, float, np.number)):
+        return Number(x)
+    if isinstance(x, str):
+        return String(x)
+    if isinstance(x, (list, tuple)):
+        return List(list(x))
+    if isinstance(x, dict):
+        return Dictionary(x)
+    return x
+
+
+def _lazy(cls, fn):
+    obj = cls.__new__(cls)
+    ComputedObject.__init__(obj, fn)
+    return obj
+
+
+def _div(a, b):
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64))
+    return np.divide(a, b, out=np.zeros(a.shape), where=(b != 0))
+
+
+def _scalar_div(a, b):
+    return 0 if b == 0 else a / b
+
+
+class Number(ComputedObject):
+    def __init__(self, value):
+        super().__init__(lambda: value)
+
+    def _op(self, other, fn):
+        return _lazy(Number, lambda: fn(_value(self), _value(other)))
+
+    def _unary(self, fn):
+        return _lazy(Number, lambda: fn(_value(self)))
+
+    def add(self, o): return self._op(o, lambda a, b: a + b)
+    def subtract(self, o): return self._op(o, lambda a, b: a - b)
+    def multiply(self, o): return self._op(o, lambda a, b: a * b)
+    def divide(self, o): return self._op(o, _scalar_div)
+    def pow(self, o): return self._op(o, lambda a, b: a ** b)
+    def max(self, o): return self._op(o, max)
+    def min(self, o): return self._op(o, min)
+    def gt(self, o): return self._op(o, lambda a, b: int(a > b))
+    def gte(self, o): return self._op(o, lambda a, b: int(a >= b))
+    def lt(self, o): return self._op(o, lambda a, b: int(a < b))
+    def lte(self, o): return self._op(o, lambda a, b: int(a <= b))
+    def eq(self, o): return self._op(o, lambda a, b: int(a == b))
+    def neq(self, o): return self._op(o, lambda a, b: int(a != b))
+    def And(self, o): return self._op(o, lambda a, b: int(bool(a) and bool(b)))
+    def Or(self, o): return self._op(o, lambda a, b: int(bool(a) or bool(b)))
+    def Not(self): return self._unary(lambda a: int(not a))
+    def abs(self): return self._unary(abs)
+    def sqrt(self): return self._unary(math.sqrt)
+    def exp(self): return self._unary(math.exp)
+    def log(self): return self._unary(math.log)
+    def int(self): return self._unary(int)
+    def toInt(self): return self._unary(int)
+    def format(self, pattern='%s'): return _lazy(String, lambda: pattern % _value(self))
+
+
+class String(ComputedObject):
+    def __init__(self, value):
+        super().__init__(lambda: value)
+
+    def cat(self, other):
+        return _lazy(String, lambda: str(_value(self)) + str(_value(other)))
+
+
+class List(ComputedObject):
+    def __init__(self, items):
+        super().__init__(lambda: list(_value(items)))
+
+    def get(self, index):
+        return _wrap(self._value()[int(_value(index))])
+
+    def size(self):
+        return _lazy(Number, lambda: len(self._value()))
+
+    def length(self):
+        return self.size()
+
+    def map(self, fn):
+        return _lazy(List, lambda: [fn(_wrap(v)) for v in self._value()])
+
+    def flatten(self):
+        def flat(items):
+            out = []
+            for v in items:
+                v = _value(v)
+                out.extend(flat(v) if isinstance(v, list) else [v])
+            return out
+        return _lazy(List, lambda: flat(self._value()))
+
+    def distinct(self):
+        def distinct():
+            out = []
+            for v in self._value():
+                if _info(v) not in [_info(u) for u in out]:
+                    out.append(v)
+            return out
+        return _lazy(List, distinct)
+
+    def remove(self, element):
+        def remove():
+            items = list(self._value())
+            target = _info(element)
+            for i, v in enumerate(items):
+                if _info(v) == target:
+                    del items[i]
+                    break
+            return items
+        return _lazy(List, remove)
+
+    def add(self, element):
+        return _lazy(List, lambda: self._value() + [element])
+
+    def cat(self, other):
+        return _lazy(List, lambda: self._value() + list(_value(other)))
+
+    def contains(self, element):
+        return _lazy(Number, lambda: int(_info(element) in [_info(v) for v in self._value()]))
+
+    def slice(self, start, end=None):
+        return _lazy(List, lambda: self._value()[int(_value(start)):None if end is None else int(_value(end))])
+
+
+class Dictionary(ComputedObject):
+    def __init__(self, value):
+        super().__init__(lambda: dict(_value(value)))
+
+    def get(self, key):
+        return _wrap(self._value()[_value(key)])
+
+    def keys(self):
+        return _lazy(List, lambda: list(self._value()))
+
+    def values(self):
+        return _lazy(List, lambda: list(self._value().values()))
+
+
+_UNIT_MS = dict(week=7 * 86400000, day=86400000, hour=3600000, minute=60000, second=1000)
+
+
+class Date(ComputedObject):
+    """Epoch-millis date; ``advance`` uses ``local.advance_months`` for months and years."""
+
+    def __init__(self, date):
+        def millis():
+            d = _value(date)
+            if isinstance(d, datetime.datetime):
+                return local.to_millis(d)
+            return local.to_millis(int(d) if isinstance(d, (int, float, np.number)) else d)
+        super().__init__(millis)
+
+    def advance(self, delta, unit):
+        def advance():
+            n = _value(delta)
+            u = str(unit).rstrip('s')
+            if u in ('month', 'year'):
+                return local.advance_months(self._value(), n * (12 if u == 'year' else 1))
+            return int(self._value() + n * _UNIT_MS[u])
+        return _lazy(Date, advance)
+
+    def millis(self):
+        return _lazy(Number, self._value)
+
+    def format(self, pattern='YYYY-MM-dd'):
+        fmt = str(pattern).replace('YYYY', '%Y').replace('MM', '%m').replace('dd', '%d') \
+            .replace('HH', '%H').replace('mm', '%M').replace('ss', '%S')
+        return _lazy(String, lambda: datetime.datetime.fromtimestamp(
+            self._value() / 1000, datetime.timezone.utc).strftime(fmt))
+
+    def serialize(self):
+        return f'Date({self._value()})'
+
+
+class Algorithms:
+    @staticmethod
+    def If(condition, trueCase, falseCase):
+        return ComputedObject(lambda: trueCase if _value(condition) else falseCase)
+
+
+class Array:
+    def __init__(self, values):
+        self.values = np.asarray(_info(values), dtype=np.float64)
+
+
+class Geometry:
+    """Accepted wherever EE takes a geometry; the emulated raster is the AOI."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    @classmethod
+    def Rectangle(cls, *args, **kwargs):
+        return cls()
+
+    def bounds(self, *args, **kwargs):
+        return self
+
+    def geometry(self, *args, **kwargs):
+        return self
+
+    def intersection(self, *args, **kwargs):
+        return self
+
+
+# ----------------------------------------------------------- filters, reducers
+
+class Filter:
+    def __init__(self, test):
+        self._test = test
+
+    @staticmethod
+    def _cmp(name, value, fn):
+        def test(props):
+            v = _value(props.get(name))
+            return v is not None and fn(v, _info(value))
+        return Filter(test)
+
+    @classmethod
+    def eq(cls, name, value): return cls._cmp(name, value, lambda a, b: a == b)
+    @classmethod
+    def neq(cls, name, value): return cls._cmp(name, value, lambda a, b: a != b)
+    @classmethod
+    def lt(cls, name, value): return cls._cmp(name, value, lambda a, b: a < b)
+    @classmethod
+    def lte(cls, name, value): return cls._cmp(name, value, lambda a, b: a <= b)
+    @classmethod
+    def gt(cls, name, value): return cls._cmp(name, value, lambda a, b: a > b)
+    @classmethod
+    def gte(cls, name, value): return cls._cmp(name, value, lambda a, b: a >= b)
+    @classmethod
+    def listContains(cls, leftField, rightValue): return cls._cmp(leftField, rightValue, lambda a, b: b in a)
+    @classmethod
+    def inList(cls, leftField, rightValue): return cls._cmp(leftField, rightValue, lambda a, b: a in b)
+
+    @classmethod
+    def notNull(cls, properties):
+        return Filter(lambda props: all(_value(props.get(p)) is not None for p in properties))
+
+    @classmethod
+    def And(cls, *filters):
+        return Filter(lambda props: all(f._test(props) for f in filters))
+
+    @classmethod
+    def Or(cls, *filters):
+        return Filter(lambda props: any(f._test(props) for f in filters))
+
+    @classmethod
+    def date(cls, start, end=None):
+        start = Date(start)
+        end = start.advance(1, 'second') if end is None else Date(end)
+        return Filter(lambda props: props.get('system:time_start') is not None
+                      and start._value() <= _value(props['system:time_start']) < end._value())
+
+
+def _reduce(kind, vals, valid, axis=0):
+    """One reducer over ``axis`` of ``vals`` where ``valid``; returns (values, mask)."""
+    n = valid.sum(axis=axis)
+    has = n > 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x = np.where(valid, vals, 0.0)
+        if kind == 'count':
+            return n.astype(np.float64), np.ones(n.shape, bool)
+        if kind == 'sum':
+            return x.sum(axis=axis), has
+        if kind in ('mean', 'stdDev', 'variance'):
+            mean = _div(x.sum(axis=axis), n)
+            if kind == 'mean':
+                return mean, has
+            dev = np.where(valid, vals - np.expand_dims(mean, axis), 0.0)
+            var = _div((dev * dev).sum(axis=axis), n)
+            return (var if kind == 'variance' else np.sqrt(var)), has
+        if kind == 'max':
+            return np.where(valid, vals, -np.inf).max(axis=axis), has
+        if kind == 'min':
+            return np.where(valid, vals, np.inf).min(axis=axis), has
+        if kind == 'median':
+            import warnings
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', RuntimeWarning)
+                return np.nanmedian(np.where(valid, vals, np.nan), axis=axis), has
+    raise EEException(f"reducer '{kind}' is not emulated")
+
+
+class Reducer:
+    """Named reducer outputs; ``combine(sharedInputs=True)`` concatenates them."""
+
+    def __init__(self, outputs):
+        self.outputs = list(outputs)
+
+    def combine(self, reducer2, outputPrefix='', sharedInputs=False):
+        return Reducer(self.outputs + [(outputPrefix + name, kind) for name, kind in reducer2.outputs])
+
+    def setOutputs(self, outputs):
+        return Reducer([(name, kind) for name, (_, kind) in zip(outputs, self.outputs)])
+
+
+for _kind in ('mean', 'stdDev', 'variance', 'count', 'sum', 'max', 'min', 'median'):
+    setattr(Reducer, _kind, staticmethod(lambda _k=_kind: Reducer([(_k, _k)])))
+
+
+class Kernel:
+    def __init__(self, shape, radius, units='pixels', normalize=True):
+        self.shape, self.radius, self.units, self.normalize = shape, radius, units, normalize
+
+    @classmethod
+    def square(cls, radius=1, units='pixels', normalize=True, magnitude=1):
+        return cls('square', radius, units, normalize)
+
+    @classmethod
+    def circle(cls, radius=1, units='pixels', normalize=True, magnitude=1):
+        return cls('circle', radius, units, normalize)
+
+    def pixels(self, scale):
+        """Radius in pixels at ``scale`` metres per pixel."""
+        return self.radius / scale if self.units == 'meters' else float(self.radius)
+
+
+# ----------------------------------------------------------------------- images
+
+class _Band:
+    """Pixel values ``(h, w, *array_shape)``, mask ``(h, w)`` and, for
+    ``ImageCollection.toArray`` arrays, which entries of variable-length
+    array axis ``raxis`` exist (``rows``, ``(h, w, length)``)."""
+
+    __slots__ = ('values', 'mask', 'rows', 'raxis')
+
+    def __init__(self, values, mask, rows=None, raxis=0):
+        self.values, self.mask, self.rows, self.raxis = values, mask, rows, raxis
+
+    @property
+    def ndim(self):
+        return self.values.ndim - 2
+
+
+def _expand(values, ndim):
+    return values.reshape(values.shape + (1,) * (ndim - (values.ndim - 2)))
+
+
+def _shape(win):
+    return win[1] - win[0], win[3] - win[2]
+
+
+def _names(spec):
+    """Band names from a string, an int, a (nested computed) list of them."""
+    spec = _info(spec)
+    return [spec] if isinstance(spec, (str, int)) else list(spec)
+
+
+class Image:
+    """Lazy image node: ``_bands()`` gives the band names and ``_get(ctx, win)``
+    the ``{name: _Band}`` of a window ``(y0, y1, x0, x1)``."""
+
+    def __init__(self, args=None):
+        if isinstance(args, Image):
+            src = args
+        elif args is None:
+            src = Image._node([], lambda ctx, win: {})
+        elif isinstance(args, ComputedObject):
+            src = Image._deferred(lambda: Image._coerce(_value(args)))
+        else:
+            src = Image._coerce(args)
+        self.__dict__.update(Image._proxy(src).__dict__)
+
+    # -------------------------------------------------------------- plumbing
+
+    @classmethod
+    def _node(cls, bands, evaluate, props=None):
+        img = cls.__new__(cls)
+        img._bands_fn = bands if callable(bands) else (lambda b=list(bands): b)
+        img._evaluate = evaluate
+        img._props_fn = props if callable(props) else (lambda p=dict(props or {}): p)
+        img._bands_memo = img._props_memo = None
+        img._session = _current()
+        return img
+
+    @classmethod
+    def _proxy(cls, src, props=None):
+        return cls._node(lambda: src._bands(), lambda ctx, win: src._get(ctx, win),
+                         props if props is not None else (lambda: src._props))
+
+    @classmethod
+    def _deferred(cls, resolve):
+        """An image known only once ``resolve()`` (e.g. an ``Algorithms.If``) is forced."""
+        memo = []
+
+        def src():
+            if not memo:
+                memo.append(resolve())
+            return memo[0]
+        return cls._node(lambda: src()._bands(), lambda ctx, win: src()._get(ctx, win),
+                         lambda: src()._props)
+
+    @classmethod
+    def _coerce(cls, x):
+        if isinstance(x, Image):
+            return x
+        if isinstance(x, ComputedObject):
+            return cls._deferred(lambda: cls._coerce(_value(x)))
+        if isinstance(x, Array):
+            return cls._array_constant(x.values)
+        if isinstance(x, (int, float, np.number, list, tuple)):
+            return cls.constant(x)
+        raise EEException(f'cannot make an image from {type(x).__name__}')
+
+    def _bands(self):
+        if self._bands_memo is None:
+            self._bands_memo = [str(b) for b in _info(self._bands_fn())]
+        return self._bands_memo
+
+    @property
+    def _props(self):
+        if self._props_memo is None:
+            self._props_memo = dict(self._props_fn())
+        return self._props_memo
+
+    def _get(self, ctx, win):
+        key = (id(self), win)
+        cache = ctx['cache']
+        if key not in cache:
+            out = self._evaluate(ctx, win)
+            cache[key] = {name: out[name] for name in self._bands()}
+        return cache[key]
+
+    def _derive(self, bands, evaluate):
+        """A node with this image's properties."""
+        return Image._node(bands, evaluate, lambda: self._props)
+
+    def _map_bands(self, fn):
+        """Per-band ``fn(_Band) -> _Band``, same names."""
+        return self._derive(lambda: self._bands(),
+                            lambda ctx, win: {n: fn(b) for n, b in self._get(ctx, win).items()})
+
+    # ---------------------------------------------------------- constructors
+
+    @classmethod
+    def constant(cls, value):
+        values = _info(value)
+        values = list(values) if isinstance(values, (list, tuple)) else [values]
+        names = ['constant'] if len(values) == 1 else [f'constant_{i}' for i in range(len(values))]
+
+        def evaluate(ctx, win):
+            shape = _shape(win)
+            return {n: _Band(np.full(shape, float(v)), np.ones(shape, bool)) for n, v in zip(names, values)}
+        return cls._node(names, evaluate)
+
+    @classmethod
+    def _array_constant(cls, array):
+        def evaluate(ctx, win):
+            shape = _shape(win)
+            return {'constant': _Band(np.broadcast_to(array, shape + array.shape), np.ones(shape, bool))}
+        return cls._node(['constant'], evaluate)
+
+    @classmethod
+    def cat(cls, *images):
+        images = [Image._coerce(i) for i in (images[0] if len(images) == 1 and isinstance(images[0], (list, tuple)) else images)]
+
+        def bands():
+            names = [n for i in images for n in i._bands()]
+            if len(set(names)) != len(names):
+                raise EEException(f'Image.cat: duplicate band names in {names}')
+            return names
+
+        def evaluate(ctx, win):
+            out = {}
+            for i in images:
+                out.update(i._get(ctx, win))
+            return out
+        return cls._node(bands, evaluate, lambda: images[0]._props if images else {})
+
+    # -------------------------------------------------------------- metadata
+
+    def bandNames(self):
+        return _lazy(List, self._bands)
+
+    def get(self, prop):
+        return ComputedObject(lambda: self._props.get(_value(prop)))
+
+    def set(self, *args):
+        if len(args) == 1:
+            updates = dict(_value(args[0]))
+        else:
+            updates = dict(zip(args[0::2], args[1::2]))
+        return Image._proxy(self, lambda: {**self._props, **updates})
+
+    def copyProperties(self, source=None, properties=None, exclude=None):
+        def props():
+            src = source._props
+            keys = _names(properties) if properties is not None else [
+                k for k in src if k not in (exclude or []) and not k.startswith('system:')]
+            return {**self._props, **{k: src[k] for k in keys if k in src}}
+        return Image._proxy(self, props)
+
+    def getInfo(self):
+        return dict(type='Image', bands=[dict(id=n) for n in self._bands()],
+                    properties=_info(self._props))
+
+    # ---------------------------------------------------------- band algebra
+
+    def select(self, *args):
+        if len(args) == 2 and isinstance(_info(args[1]), list):
+            selectors, new = args
+        elif len(args) == 1:
+            selectors, new = args[0], None
+        else:
+            selectors, new = list(args), None
+
+        def picked():
+            names = self._bands()
+            out = []
+            for s in _names(selectors):
+                if isinstance(s, int):
+                    out.append(names[s])
+                elif s in names:
+                    out.append(s)
+                else:
+                    raise EEException(f"Image.select: Pattern '{s}' did not match any bands. Available: {names}")
+            return out
+
+        def bands():
+            return _names(new) if new is not None else picked()
+
+        def evaluate(ctx, win):
+            data = self._get(ctx, win)
+            return {n: data[s] for n, s in zip(bands(), picked())}
+        return self._derive(bands, evaluate)
+
+    def rename(self, *names):
+        def bands():
+            new = _names(names[0]) if len(names) == 1 else list(names)
+            if len(new) != len(self._bands()):
+                raise EEException(f'Image.rename: {len(new)} names for {len(self._bands())} bands')
+            return new
+        return self._derive(bands, lambda ctx, win: dict(zip(bands(), self._get(ctx, win).values())))
+
+    def addBands(self, srcImg, names=None, overwrite=False):
+        srcImg = Image._coerce(srcImg)
+
+        def added():
+            src = srcImg._bands()
+            return src if names is None else [n for n in src if n in _names(names)]
+
+        def bands():
+            ours = self._bands()
+            new = added()
+            clash = [n for n in new if n in ours]
+            if clash and not overwrite:
+                raise EEException(f'Image.addBands: duplicate band names {clash}')
+            return ours + [n for n in new if n not in ours]
+
+        def evaluate(ctx, win):
+            out = dict(self._get(ctx, win))
+            src = srcImg._get(ctx, win)
+            out.update({n: src[n] for n in added()})
+            return out
+        return self._derive(bands, evaluate)
+
+    def _binary(self, other, fn):
+        other = Image._coerce(other)
+
+        def bands():
+            a, b = self._bands(), other._bands()
+            if len(a) == len(b) or len(b) == 1:
+                return a
+            if len(a) == 1:
+                return b
+            raise EEException(f'Images must contain the same number of bands or only 1 band. '
+                              f'Got {len(a)} and {len(b)}.')
+
+        def evaluate(ctx, win):
+            xs = list(self._get(ctx, win).values())
+            ys = list(other._get(ctx, win).values())
+            out = {}
+            for i, name in enumerate(bands()):
+                x, y = xs[i if len(xs) > 1 else 0], ys[i if len(ys) > 1 else 0]
+                nd = max(x.ndim, y.ndim)
+                with np.errstate(all='ignore'):
+                    values = fn(_expand(x.values, nd), _expand(y.values, nd))
+                rows, raxis = (x.rows, x.raxis) if x.rows is not None else (y.rows, y.raxis)
+                out[name] = _Band(np.asarray(values, dtype=np.float64), x.mask & y.mask, rows, raxis)
+            return out
+        return self._derive(bands, evaluate)
+
+    def _unary(self, fn):
+        def apply(b):
+            with np.errstate(all='ignore'):
+                return _Band(np.asarray(fn(b.values), dtype=np.float64), b.mask, b.rows, b.raxis)
+        return self._map_bands(apply)
+
+    def add(self, o): return self._binary(o, np.add)
+    def subtract(self, o): return self._binary(o, np.subtract)
+    def multiply(self, o): return self._binary(o, np.multiply)
+    def divide(self, o): return self._binary(o, _div)
+    def pow(self, o): return self._binary(o, np.power)
+    def max(self, o): return self._binary(o, np.maximum)
+    def min(self, o): return self._binary(o, np.minimum)
+    def gt(self, o): return self._binary(o, np.greater)
+    def gte(self, o): return self._binary(o, np.greater_equal)
+    def lt(self, o): return self._binary(o, np.less)
+    def lte(self, o): return self._binary(o, np.less_equal)
+    def eq(self, o): return self._binary(o, np.equal)
+    def neq(self, o): return self._binary(o, np.not_equal)
+    def And(self, o): return self._binary(o, lambda a, b: (a != 0) & (b != 0))
+    def Or(self, o): return self._binary(o, lambda a, b: (a != 0) | (b != 0))
+    def Not(self): return self._unary(lambda a: a == 0)
+    def abs(self): return self._unary(np.abs)
+    def sqrt(self): return self._unary(np.sqrt)
+    def exp(self): return self._unary(np.exp)
+    def log(self): return self._unary(np.log)
+    def cos(self): return self._unary(np.cos)
+    def sin(self): return self._unary(np.sin)
+    def tan(self): return self._unary(np.tan)
+    def acos(self): return self._unary(np.arccos)
+    def atan(self): return self._unary(np.arctan)
+    def toFloat(self): return self
+    def toDouble(self): return self
+    def float(self): return self
+
+    def clip(self, geometry):
+        return self
+
+    def reproject(self, *args, **kwargs):
+        return self
+
+    def resample(self, mode='bilinear'):
+        return self
+
+    # ----------------------------------------------------------------- masks
+
+    def mask(self):
+        return self._map_bands(lambda b: _Band(b.mask.astype(np.float64), np.ones(b.mask.shape, bool)))
+
+    def updateMask(self, mask):
+        mask = Image._coerce(mask)
+
+        def evaluate(ctx, win):
+            data = self._get(ctx, win)
+            ms = list(mask._get(ctx, win).values())
+            if len(ms) not in (1, len(data)):
+                raise EEException(f'updateMask: mask has {len(ms)} bands, image has {len(data)}')
+            out = {}
+            for i, (n, b) in enumerate(data.items()):
+                m = ms[i if len(ms) > 1 else 0]
+                out[n] = _Band(b.values, b.mask & m.mask & (m.values != 0), b.rows, b.raxis)
+            return out
+        return self._derive(lambda: self._bands(), evaluate)
+
+    def unmask(self, value=0, sameFootprint=True):
+        if isinstance(value, Image):
+            # Masked pixels take the other image's value and mask
+            def evaluate(ctx, win):
+                data = self._get(ctx, win)
+                vs = list(value._get(ctx, win).values())
+                out = {}
+                for i, (n, b) in enumerate(data.items()):
+                    v = vs[i if len(vs) > 1 else 0]
+                    out[n] = _Band(np.where(b.mask, b.values, v.values), b.mask | v.mask)
+                return out
+            return self._derive(lambda: self._bands(), evaluate)
+        fill = float(_value(value))
+        return self._map_bands(lambda b: _Band(np.where(_expand(b.mask, b.ndim), b.values, fill),
+                                               np.ones(b.mask.shape, bool), b.rows, b.raxis))
+
+    def where(self, test, value):
+        test, value = Image._coerce(test), Image._coerce(value)
+
+        def evaluate(ctx, win):
+            data = self._get(ctx, win)
+            ts = list(test._get(ctx, win).values())
+            vs = list(value._get(ctx, win).values())
+            out = {}
+            for i, (n, b) in enumerate(data.items()):
+                t, v = ts[i if len(ts) > 1 else 0], vs[i if len(vs) > 1 else 0]
+                hit = t.mask & (t.values != 0)
+                out[n] = _Band(np.where(hit, v.values, b.values), np.where(hit, v.mask, b.mask))
+            return out
+        return self._derive(lambda: self._bands(), evaluate)
+
+    # ---------------------------------------------------------- neighbourhood
+
+    def _neighbourhood(self, radius, fn, suffixes=None):
+        """``fn(values, valid, origin) -> [values per suffix]`` on the window grown by ``radius``."""
+        r = int(radius)
+
+        def bands():
+            return [f'{n}_{s}' for n in self._bands() for s in suffixes] if suffixes else self._bands()
+
+        def evaluate(ctx, win):
+            y0, y1, x0, x1 = win
+            ny, nx = ctx['shape']
+            big = (max(y0 - r, 0), min(y1 + r, ny), max(x0 - r, 0), min(x1 + r, nx))
+            crop = (slice(y0 - big[0], y1 - big[0]), slice(x0 - big[2], x1 - big[2]))
+            out = {}
+            for n, b in self._get(ctx, big).items():
+                results = fn(b.values, b.mask, (big[0], big[2]))
+                for s, v in zip(suffixes or [None], results):
+                    out[f'{n}_{s}' if s else n] = _Band(v[crop], b.mask[crop])
+            return out
+        return self._derive(bands, evaluate)
+
+    def reduceNeighborhood(self, reducer, kernel, inputWeight='kernel', skipMasked=True,
+                           optimization=None):
+        """Square-kernel mean/variance/stdDev/count/sum from block-anchored box sums."""
+        if kernel.shape != 'square':
+            raise EEException('reduceNeighborhood is emulated for square kernels only')
+        kinds = [kind for _, kind in reducer.outputs]
+        if any(k not in ('mean', 'variance', 'stdDev', 'count', 'sum') for k in kinds):
+            raise EEException(f'reduceNeighborhood is not emulated for {kinds}')
+        scale = self._scale()
+        r = int(math.floor(kernel.pixels(scale)))
+
+        def fn(values, valid, origin):
+            x0 = np.where(valid, values, 0.0)[None, ..., None]
+            n = local._box_sum(valid[None, ..., None].astype(np.float64), r, origin)[0, ..., 0]
+            s = local._box_sum(x0, r, origin)[0, ..., 0]
+            mean = _div(s, n)
+            var = np.maximum(_div(local._box_sum(x0 * x0, r, origin)[0, ..., 0], n) - mean ** 2, 0)
+            table = dict(mean=mean, variance=var, stdDev=np.sqrt(var), count=n, sum=s)
+            return [table[k] for k in kinds]
+        return self._neighbourhood(r, fn, [name for name, _ in reducer.outputs])
+
+    def focalMedian(self, radius=1.5, kernelType='circle', units='pixels', iterations=1, kernel=None):
+        """Exact median over the kernel footprint ('gaussian' and 'square': the square support)."""
+        scale = self._scale()
+        r_px = radius / scale if units == 'meters' else float(radius)
+        if kernelType in ('gaussian', 'square'):
+            r = int(math.floor(r_px))
+            offsets = {dy: r for dy in range(-r, r + 1)}
+        elif kernelType == 'circle':
+            offsets = local.circle_offsets(r_px)
+        else:
+            raise EEException(f"focalMedian is not emulated for kernelType '{kernelType}'")
+        reach = max(offsets) if offsets else 0
+
+        def fn(values, valid, origin):
+            x = np.pad(np.where(valid, values, np.nan), reach, constant_values=np.nan)
+            h, w = values.shape
+            shifted = [x[reach + dy:reach + dy + h, reach + dx:reach + dx + w]
+                       for dy, hw in offsets.items() for dx in range(-hw, hw + 1)]
+            return [_reduce('median', np.stack(shifted), ~np.isnan(np.stack(shifted)))[0]]
+        return self._neighbourhood(reach, fn)
+
+    def convolve(self, kernel):
+        """Normalized circle kernels, as ``local.convolve_circles(method='rows')``."""
+        if kernel.shape != 'circle' or not kernel.normalize:
+            raise EEException('convolve is emulated for normalized circle kernels only')
+        scale = self._scale()
+        r_px = kernel.pixels(scale)
+
+        def fn(values, valid, origin):
+            x = np.where(valid, values, np.nan)
+            return [local.convolve_circles(x, [r_px * scale], scale, 'rows', origin)[0].astype(np.float64)]
+        return self._neighbourhood(math.floor(r_px), fn)
+
+    def _scale(self):
+        session = self._session or _current()
+        return session.scale if session is not None else 10
+
+    # ---------------------------------------------------------------- arrays
+
+    def toArray(self, axis=0):
+        def evaluate(ctx, win):
+            data = list(self._get(ctx, win).values())
+            return {'array': _Band(np.stack([b.values for b in data], axis=-1),
+                                   np.logical_and.reduce([b.mask for b in data]))}
+        return self._derive(['array'], evaluate)
+
+    def arrayTranspose(self, axis1=0, axis2=1):
+        def fn(b):
+            raxis = {axis1: axis2, axis2: axis1}.get(b.raxis, b.raxis)
+            return _Band(np.swapaxes(b.values, 2 + axis1, 2 + axis2), b.mask, b.rows, raxis)
+        return self._map_bands(fn)
+
+    def matrixMultiply(self, image2):
+        image2 = Image._coerce(image2)
+
+        def evaluate(ctx, win):
+            (n, a), = self._get(ctx, win).items()
+            (_, b), = image2._get(ctx, win).items()
+            av, bv = a.values, b.values
+            for band, axis in ((a, 1), (b, 0)):
+                if band.rows is not None and band.raxis != axis:
+                    raise EEException('matrixMultiply: variable-length axis must be the contracted one')
+            if a.rows is not None:
+                av = np.where(a.rows[..., None, :], av, 0.0)
+            if b.rows is not None:
+                bv = np.where(b.rows[..., :, None], bv, 0.0)
+            return {n: _Band(np.matmul(av, bv), a.mask & b.mask)}
+        return self._derive(lambda: self._bands(), evaluate)
+
+    def matrixInverse(self):
+        def fn(b):
+            v = b.values
+            ok = b.mask & np.isfinite(v).all(axis=(-2, -1))
+            ok &= np.abs(np.linalg.det(np.where(ok[..., None, None], v, np.eye(v.shape[-1])))) > 0
+            inv = np.linalg.inv(np.where(ok[..., None, None], v, np.eye(v.shape[-1])))
+            return _Band(inv, ok)
+        return self._map_bands(fn)
+
+    def arrayReshape(self, lengths, dimensions):
+        lengths = Image._coerce(lengths)
+
+        def evaluate(ctx, win):
+            (_, shape_band), = lengths._get(ctx, (0, 1, 0, 1)).items()
+            shape = tuple(int(s) for s in shape_band.values[0, 0])
+            return {n: _Band(b.values.reshape(b.values.shape[:2] + shape), b.mask)
+                    for n, b in self._get(ctx, win).items()}
+        return self._derive(lambda: self._bands(), evaluate)
+
+    def arrayProject(self, axes):
+        keep = [int(a) for a in _info(axes)]
+
+        def fn(b):
+            drop = tuple(2 + a for a in range(b.ndim) if a not in keep)
+            return _Band(b.values.squeeze(axis=drop), b.mask)
+        return self._map_bands(fn)
+
+    def arrayFlatten(self, coordinateLabels, separator='_'):
+        labels = _info(coordinateLabels)
+        names = labels[0] if len(labels) == 1 else \
+            [f'{a}{separator}{b}' for a in labels[0] for b in labels[1]]
+
+        def evaluate(ctx, win):
+            (_, b), = self._get(ctx, win).items()
+            flat = b.values.reshape(b.values.shape[:2] + (-1,))
+            return {name: _Band(flat[..., i], b.mask) for i, name in enumerate(names)}
+        return self._derive(names, evaluate)
+
+    def arrayLength(self, axis):
+        def fn(b):
+            if b.rows is not None and b.raxis == axis:
+                return _Band(b.rows.sum(axis=-1).astype(np.float64), b.mask)
+            return _Band(np.full(b.mask.shape, float(b.values.shape[2 + axis])), b.mask)
+        return self._map_bands(fn)
+
+    def arrayAccum(self, axis, reducer=None):
+        kind = reducer.outputs[0][1] if reducer is not None else 'sum'
+        ufunc = dict(sum=np.add, min=np.minimum, max=np.maximum)[kind]
+        fill = dict(sum=0.0, min=np.inf, max=-np.inf)[kind]
+
+        def fn(b):
+            v = b.values
+            if b.rows is not None and b.raxis == axis:
+                rows = np.expand_dims(b.rows, tuple(range(b.rows.ndim, v.ndim)))
+                v = np.where(np.moveaxis(rows, 2, 2 + axis), v, fill)
+            return _Band(ufunc.accumulate(v, axis=2 + axis), b.mask, b.rows, b.raxis)
+        return self._map_bands(fn)
+
+    def arrayReduce(self, reducer, axes, fieldAxis=None):
+        kind = reducer.outputs[0][1]
+        axes = [int(a) for a in _info(axes)]
+
+        def fn(b):
+            v = b.values
+            valid = np.ones(v.shape, bool)
+            if b.rows is not None:
+                rows = np.expand_dims(b.rows, tuple(range(b.rows.ndim, v.ndim)))
+                valid = np.broadcast_to(np.moveaxis(rows, 2, 2 + b.raxis), v.shape)
+            mask = b.mask.copy()
+            for a in axes:
+                v, has = _reduce(kind, v, valid, axis=2 + a)
+                valid = np.expand_dims(has, 2 + a)
+                v = np.expand_dims(v, 2 + a)
+            mask &= valid.reshape(valid.shape[:2] + (-1,)).any(axis=-1)
+            return _Band(v, mask)
+        return self._map_bands(fn)
+
+    def arrayGet(self, position):
+        index = tuple(int(p) for p in _info(position))
+        return self._map_bands(lambda b: _Band(b.values[(Ellipsis,) + index], b.mask))
+
+    # ------------------------------------------------------------ evaluation
+
+    def reduceRegion(self, reducer=None, geometry=None, scale=None, **kwargs):
+        """Dictionary of the reducer over every pixel of the raster (``scale`` is ignored)."""
+        def reduce():
+            bands = self.compute()
+            out = {}
+            for name, values in bands.items():
+                valid = ~np.isnan(values)
+                for out_name, kind in reducer.outputs:
+                    v, has = _reduce(kind, values.ravel(), valid.ravel())
+                    key = name if len(reducer.outputs) == 1 else f'{name}_{out_name}'
+                    out[key] = float(v) if bool(has) else None
+            return out
+        return _lazy(Dictionary, reduce)
+
+    def compute(self, tile_size=None, shape=None):
+        """Evaluate every band over the session raster; ``{name: float32 array}``, NaN = masked.
+
+        ``tile_size`` bounds memory by evaluating square tiles one at a time;
+        the result does not depend on it.
+        """
+        session = self._session or _current()
+        if shape is None:
+            if session is None:
+                raise EEException('compute() needs a session or an explicit shape')
+            shape = session.shape
+        ny, nx = shape
+        step = tile_size or max(ny, nx, 1)
+        out = {}
+        for y0 in range(0, ny, step):
+            for x0 in range(0, nx, step):
+                win = (y0, min(y0 + step, ny), x0, min(x0 + step, nx))
+                ctx = dict(cache={}, shape=(ny, nx))
+                for name, b in self._get(ctx, win).items():
+                    values = b.values
+                    if b.rows is not None:
+                        rows = np.expand_dims(b.rows, tuple(range(b.rows.ndim, values.ndim)))
+                        values = np.where(np.moveaxis(rows, 2, 2 + b.raxis), values, np.nan)
+                    if name not in out:
+                        out[name] = np.full((ny, nx) + values.shape[2:], np.nan, dtype=np.float32)
+                    out[name][win[0]:win[1], win[2]:win[3]] = np.where(_expand(b.mask, b.ndim), values, np.nan)
+        return out
+
+
+# ------------------------------------------------------------------ collections
+
+class ImageCollection:
+    """Lazy list of images; filters act on image properties."""
+
+    def __init__(self, args):
+        if isinstance(args, ImageCollection):
+            self._images_fn = args._images
+        elif isinstance(args, str):
+            session = _current()
+            if session is None or args not in session.collections:
+                raise EEException(f"ImageCollection '{args}' is not in the emulator session")
+            images = list(session.collections[args])
+            self._images_fn = lambda: images
+        elif isinstance(args, Image):
+            self._images_fn = lambda: [args]
+        else:
+            self._images_fn = lambda: [Image._coerce(_value(i)) for i in _value(args)]
+        self._memo = None
+        self._session = _current()
+
+    @classmethod
+    def _from(cls, fn):
+        coll = cls.__new__(cls)
+        coll._images_fn, coll._memo, coll._session = fn, None, _current()
+        return coll
+
+    def _images(self):
+        if self._memo is None:
+            self._memo = list(self._images_fn())
+        return self._memo
+
+    # ------------------------------------------------------------- metadata
+
+    def filter(self, f):
+        return ImageCollection._from(lambda: [i for i in self._images() if f._test(i._props)])
+
+    def filterDate(self, start, end=None):
+        return self.filter(Filter.date(start, end))
+
+    def filterBounds(self, geometry):
+        return self
+
+    def select(self, *args):
+        return ImageCollection._from(lambda: [i.select(*args) for i in self._images()])
+
+    def map(self, fn):
+        return ImageCollection._from(lambda: [Image._coerce(_value(fn(i))) for i in self._images()])
+
+    def sort(self, prop, ascending=True):
+        return ImageCollection._from(lambda: sorted(
+            self._images(), key=lambda i: _value(i._props.get(prop)), reverse=not ascending))
+
+    def merge(self, other):
+        return ImageCollection._from(lambda: self._images() + other._images())
+
+    def size(self):
+        return _lazy(Number, lambda: len(self._images()))
+
+    def first(self):
+        return Image._deferred(lambda: self._images()[0] if self._images() else Image())
+
+    def toList(self, count, offset=0):
+        return _lazy(List, lambda: self._images()[int(_value(offset)):int(_value(offset)) + int(_value(count))])
+
+    def aggregate_array(self, prop):
+        return _lazy(List, lambda: [v for v in (_value(i._props.get(prop)) for i in self._images())
+                                    if v is not None])
+
+    def iterate(self, algorithm, first=None):
+        def fold():
+            acc = first
+            for image in self._images():
+                acc = algorithm(image, acc)
+            return acc
+        return ComputedObject(fold)
+
+    # ------------------------------------------------------------ reductions
+
+    def _union_bands(self):
+        names = []
+        for image in self._images():
+            names += [n for n in image._bands() if n not in names]
+        return names
+
+    def _stack(self, ctx, win, name):
+        h, w = _shape(win)
+        vals, valid = [], []
+        for image in self._images():
+            b = image._get(ctx, win).get(name)
+            if b is None:
+                vals.append(np.zeros((h, w)))
+                valid.append(np.zeros((h, w), bool))
+            else:
+                vals.append(b.values)
+                valid.append(b.mask)
+        if not vals:
+            return np.zeros((0, h, w)), np.zeros((0, h, w), bool)
+        return np.stack(vals), np.stack(valid)
+
+    def reduce(self, reducer, parallelScale=1):
+        outputs = reducer.outputs
+
+        def bands():
+            return [f'{b}_{name}' for b in self._union_bands() for name, _ in outputs]
+
+        def evaluate(ctx, win):
+            out = {}
+            for b in self._union_bands():
+                vals, valid = self._stack(ctx, win, b)
+                for name, kind in outputs:
+                    v, m = _reduce(kind, vals, valid)
+                    out[f'{b}_{name}'] = _Band(v, m)
+            return out
+        return Image._node(bands, evaluate)
+
+    def _simple(self, kind):
+        def evaluate(ctx, win):
+            return {b: _Band(*_reduce(kind, *self._stack(ctx, win, b))) for b in self._union_bands()}
+        return Image._node(self._union_bands, evaluate)
+
+    def mean(self): return self._simple('mean')
+    def sum(self): return self._simple('sum')
+    def max(self): return self._simple('max')
+    def min(self): return self._simple('min')
+    def count(self): return self._simple('count')
+    def median(self): return self._simple('median')
+
+    def mosaic(self):
+        """Last image on top: each pixel takes the last unmasked value."""
+        def evaluate(ctx, win):
+            out = {}
+            for b in self._union_bands():
+                vals, valid = self._stack(ctx, win, b)
+                if not len(vals):
+                    h, w = _shape(win)
+                    out[b] = _Band(np.zeros((h, w)), np.zeros((h, w), bool))
+                    continue
+                last = len(vals) - 1 - np.argmax(valid[::-1], axis=0)
+                out[b] = _Band(np.take_along_axis(vals, last[None], 0)[0], valid.any(axis=0))
+            return out
+        return Image._node(self._union_bands, evaluate)
+
+    def toArray(self):
+        """Per-pixel (images x bands) array of the images unmasked in every band."""
+        def evaluate(ctx, win):
+            h, w = _shape(win)
+            images = self._images()
+            names = images[0]._bands() if images else []
+            stacks = [self._stack(ctx, win, b) for b in names]
+            if not stacks:
+                return {'array': _Band(np.zeros((h, w, 0, 0)), np.ones((h, w), bool),
+                                       np.zeros((h, w, 0), bool))}
+            values = np.stack([v for v, _ in stacks], axis=-1)          # (T, h, w, B)
+            rows = np.logical_and.reduce([m for _, m in stacks])        # (T, h, w)
+            return {'array': _Band(np.moveaxis(values, 0, 2), np.ones((h, w), bool),
+                                   np.moveaxis(rows, 0, 2))}
+        return Image._node(['array'], evaluate)
+
+
+class _Unsupported:
+    """Namespace whose members (exports, assets, joins, ...) are not emulated."""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        raise EEException(f'ee.{self._name}.{attr} is not supported by the emulator')
+
+    def __call__(self, *args, **kwargs):
+        raise EEException(f'ee.{self._name} is not supported by the emulator')
+
+
+batch = _Unsupported('batch')
+data = _Unsupported('data')
+Join = _Unsupported('Join')
+Terrain = _Unsupported('Terrain')
+FeatureCollection = _Unsupported('FeatureCollection')
+
+
+# ---------------------------------------------------------------------- session
+
+class Session:
+    """Emulated catalogue for one raster of ``shape`` pixels at ``scale`` metres.
+
+    Register stacks with ``add_s1`` / ``add_urban`` / ``add_image``, then run
+    ``pwtt`` code inside ``with session:``.
+    """
+
+    S1 = 'COPERNICUS/S1_GRD_FLOAT'
+    DYNAMIC_WORLD = 'GOOGLE/DYNAMICWORLD/V1'
+
+    def __init__(self, shape, scale=10):
+        self.shape = tuple(shape)
+        self.scale = scale
+        self.collections = {}
+        self.aoi = Geometry()
+        self._saved = []
+
+    def add_image(self, collection_id, bands, **properties):
+        """Add an image of ``{name: (y, x) array}`` (NaN = masked) to a collection."""
+        bands = dict(bands)
+        for name, values in bands.items():
+            if tuple(values.shape) != self.shape:
+                raise ValueError(f'band {name} has shape {values.shape}, session is {self.shape}')
+
+        def evaluate(ctx, win):
+            out = {}
+            for name, values in bands.items():
+                v = np.asarray(values[win[0]:win[1], win[2]:win[3]], dtype=np.float64)
+                out[name] = _Band(v, ~np.isnan(v))
+            return out
+        props = {k.replace('__', ':'): v for k, v in properties.items()}
+        _SESSIONS.append(self)
+        try:
+            image = Image._node(list(bands), evaluate, props)
+        finally:
+            _SESSIONS.pop()
+        self.collections.setdefault(collection_id, []).append(image)
+        return image
+
+    def add_s1(self, orbit, stack, times, angle=None):
+        """Add one relative orbit: a ``(time, y, x, 2)`` VV/VH stack in linear units.
+
+        ``times`` are epoch millis (or dates); ``angle`` is an optional
+        ``(y, x)`` incidence-angle band. Images get the S1 GRD properties the
+        pipeline filters on.
+        """
+        times = [local.to_millis(t) for t in times]
+        if stack.shape[0] != len(times) or tuple(stack.shape[1:3]) != self.shape:
+            raise ValueError(f'stack must be (time, y, x, 2) with {len(times)} times and '
+                             f'(y, x) = {self.shape}, got {stack.shape}')
+        for i, t in enumerate(times):
+            bands = {'VV': _Slice(stack, i, 0), 'VH': _Slice(stack, i, 1)}
+            if angle is not None:
+                bands['angle'] = np.asarray(angle)
+            self.add_image(self.S1, bands, **{
+                'system__time_start': t, 'relativeOrbitNumber_start': orbit,
+                'instrumentMode': 'IW', 'transmitterReceiverPolarisation': ['VV', 'VH'],
+            })
+
+    def add_urban(self, built, date):
+        """Add a Dynamic World image with the ``built`` probability band, dated ``date``."""
+        self.add_image(self.DYNAMIC_WORLD, {'built': np.asarray(built, dtype=np.float64)},
+                       system__time_start=local.to_millis(date))
+
+    def __enter__(self):
+        _SESSIONS.append(self)
+        this = sys.modules[__name__]
+        for name, module in list(sys.modules.items()):
+            if (name == 'pwtt' or name.startswith('pwtt.')) and module is not this \
+                    and hasattr(module, 'ee'):
+                self._saved.append((module, module.ee))
+                module.ee = this
+        return self
+
+    def __exit__(self, *exc):
+        for module, ee in reversed(self._saved):
+            module.ee = ee
+        self._saved = []
+        _SESSIONS.remove(self)
+        return False
+
+
+class _Slice:
+    """Lazy ``stack[i, :, :, band]`` view, so memmapped stacks are read tile by tile."""
+
+    def __init__(self, stack, i, band):
+        self.stack, self.i, self.band = stack, i, band
+        self.shape = stack.shape[1:3]
+
+    def __getitem__(self, window):
+        return self.stack[(self.i,) + window + (self.band,)]
@@ -0,0 +1,240 @@
+"""
+Concurrent, retrying paged download of Earth Engine feature collections.
+
+Replaces the serial ``size().getInfo()`` / ``toList(page_size, offset).getInfo()``
+loop: pages are requested by a bounded thread pool, transient errors are
+retried with jittered exponential backoff, pages that hit EE's payload or
+element limits are split in half and re-queued, and feature properties are
+written straight into preallocated NumPy columns (in collection order) as
+pages arrive. Works with anything exposing ``size().getInfo()`` and
+``toList(count, offset).getInfo()``, such as ``FakeCollection`` below.
+
+Usage:
+    import pandas as pd
+    from pwtt.fetch import fetch_columns
+
+    fc = fc.select(['class', 'T_statistic', 'area'], retainGeometry=False)
+    df = pd.DataFrame(fetch_columns(fc, ['class', 'T_statistic', 'area']))
+"""
+
+import json
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+
+
+# Substrings of EE error messages. Payload errors shrink the page; transient
+# errors are retried at the same size; anything else is raised at once. Memory
+# and computation-timeout failures come from the graph, not the page, so they
+# are raised for the caller (e.g. pwtt.autosplit) to handle.
+PAYLOAD_ERRORS = (
+    'payload size exceeds', 'response size exceeds', 'too large',
+)
+TRANSIENT_ERRORS = (
+    'too many requests', 'quota', 'rate limit', 'too many concurrent',
+    'deadline', 'internal error', 'backend error',
+    'bad gateway', 'service unavailable', 'gateway timeout', 'connection',
+    'temporarily',
+)
+
+
+class PayloadTooLarge(Exception):
+    """A page's response exceeded EE's payload or element limit."""
+
+
+def _classify(exc):
+    msg = str(exc).lower()
+    if any(s in msg for s in PAYLOAD_ERRORS):
+        return 'payload'
+    if any(s in msg for s in TRANSIENT_ERRORS):
+        return 'transient'
+    return 'fatal'
+
+
+class ColumnBuffer:
+    """Preallocated columnar store for ``n`` rows, filled by absolute row position.
+
+    Each column becomes a float64 array (None → NaN) unless its first non-null
+    value is a string, in which case it is an object array (None kept).
+    Columns are allocated when that first value is seen, so ``dtypes`` only
+    needs to name columns whose type should be forced. A float64 column that
+    later receives a non-numeric value (string, list, ...) becomes an object
+    array, keeping the rows already written.
+    """
+
+    def __init__(self, n, columns, dtypes=None):
+        self.n = n
+        self.columns = list(columns)
+        self.dtypes = dict(dtypes or {})
+        self.data = {}
+
+    def _column(self, name, sample):
+        col = self.data.get(name)
+        if col is None:
+            dtype = self.dtypes.get(name, object if isinstance(sample, str) else np.float64)
+            col = np.full(self.n, np.nan) if np.dtype(dtype) == np.float64 \
+                else np.empty(self.n, dtype=dtype)
+            self.data[name] = col
+        return col
+
+    def put(self, offset, rows):
+        """Write a page of property dicts at rows ``offset .. offset + len(rows)``."""
+        for name in self.columns:
+            values = [r.get(name) for r in rows]
+            sample = next((v for v in values if v is not None), None)
+            if sample is None and name not in self.data:
+                continue
+            col = self._column(name, sample)
+            if col.dtype == np.float64:
+                if all(v is None or isinstance(v, (int, float)) for v in values):
+                    col[offset:offset + len(rows)] = [np.nan if v is None else v for v in values]
+                    continue
+                col = self.data[name] = col.astype(object)
+            col[offset:offset + len(rows)] = values
+
+    def rows(self, offset, count):
+        """Dict of column slices for rows ``offset .. offset + count`` (absent columns as NaN)."""
+        return {name: self.data[name][offset:offset + count] if name in self.data
+                else np.full(count, np.nan) for name in self.columns}
+
+    def result(self, stop=None):
+        """Dict of column arrays (all-null columns as NaN), truncated to ``stop`` rows."""
+        stop = self.n if stop is None else stop
+        return {name: (self.data[name] if name in self.data else np.full(self.n, np.nan))[:stop]
+                for name in self.columns}
+
+
+def _fetch_page(collection, offset, count, max_retries, backoff):
+    """One toList(count, offset).getInfo() with retries on transient errors."""
+    for attempt in range(max_retries + 1):
+        try:
+            return collection.toList(count, offset).getInfo()
+        except Exception as exc:
+            kind = _classify(exc)
+            if kind == 'payload':
+                raise PayloadTooLarge(str(exc)) from exc
+            if kind == 'fatal' or attempt == max_retries:
+                raise
+            time.sleep(backoff * 2 ** attempt * (0.5 + random.random()))
+
+
+def fetch_columns(collection, columns, page_size=5000, workers=8, total=None,
+                  max_retries=5, backoff=1.0, min_page_size=50, dtypes=None,
+                  on_page=None):
+    """Download ``columns`` of every feature's properties as NumPy arrays.
+
+    collection: an ``ee.FeatureCollection`` (or stand-in); select the needed
+    properties with ``retainGeometry=False`` first to keep pages small.
+    Pages of ``page_size`` rows (EE caps ``toList().getInfo()`` at 5000) are
+    fetched by up to ``workers`` threads. A page that fails with a payload
+    error is split in two, down to ``min_page_size``, and later pages use the
+    reduced size. ``on_page(buffer, offset, count)`` is called in the calling
+    thread after each page lands, e.g. for progress or streaming metrics over
+    ``buffer.rows(offset, count)``.
+
+    Returns a dict column -> array in collection order.
+    """
+    if total is None:
+        total = collection.size().getInfo()
+    buffer = ColumnBuffer(total, columns, dtypes)
+    next_offset = 0
+
+    def next_range():
+        nonlocal next_offset
+        if next_offset >= total:
+            return None
+        count = min(page_size, total - next_offset)
+        next_offset += count
+        return next_offset - count, count
+
+    pending = {}
+    retry_ranges = []
+    short_at = None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        def submit(rng):
+            fut = pool.submit(_fetch_page, collection, rng[0], rng[1], max_retries, backoff)
+            pending[fut] = rng
+
+        for _ in range(workers):
+            rng = next_range()
+            if rng is None:
+                break
+            submit(rng)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                offset, count = pending.pop(fut)
+                try:
+                    page = fut.result()
+                except PayloadTooLarge:
+                    if count <= min_page_size:
+                        raise
+                    half = max(count // 2, min_page_size)
+                    page_size = min(page_size, half)
+                    retry_ranges += [(offset, half), (offset + half, count - half)]
+                    continue
+
+                rows = [f['properties'] for f in page]
+                buffer.put(offset, rows)
+                if len(rows) < count:
+                    # Collection shorter than size() reported (e.g. it changed)
+                    short_at = offset + len(rows) if short_at is None else min(short_at, offset + len(rows))
+                if on_page is not None:
+                    on_page(buffer, offset, len(rows))
+
+            while len(pending) < workers:
+                rng = retry_ranges.pop() if retry_ranges else next_range()
+                if rng is None:
+                    break
+                submit(rng)
+
+    return buffer.result(short_at)
+
+
+class FakeCollection:
+    """In-process stand-in for a FeatureCollection, for testing and benchmarking the fetcher.
+
+    Serves ``rows`` (a list of property dicts) through ``size().getInfo()``
+    and ``toList(count, offset).getInfo()``, after ``latency`` seconds,
+    failing a ``fail_rate`` fraction of calls with a transient error and any
+    page over ``max_page`` rows with a payload error.
+    """
+
+    class _Info:
+        def __init__(self, fn):
+            self.getInfo = fn
+
+    def __init__(self, rows, latency=0.0, fail_rate=0.0, max_page=5000, seed=0):
+        self.rows = rows
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.max_page = max_page
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def serialize(self):
+        """Stable description of the served rows, standing in for the EE graph."""
+        return json.dumps(self.rows, sort_keys=True, default=str)
+
+    def size(self):
+        return self._Info(lambda: len(self.rows))
+
+    def toList(self, count, offset=0):
+        def get():
+            with self._lock:
+                self.calls += 1
+                fail = self._rng.random() < self.fail_rate
+            time.sleep(self.latency)
+            if fail:
+                raise RuntimeError('Too many concurrent aggregations.')
+            if count > self.max_page:
+                raise RuntimeError(f'Response size exceeds limit ({count} > {self.max_page} features).')
+            return [{'type': 'Feature', 'geometry': None, 'properties': r}
+                    for r in self.rows[offset:offset + count]]
+        return self._Info(get)
@@ -0,0 +1,528 @@
+"""
+Local NumPy backend for the PWTT statistics.
+
+Mirrors the Earth Engine implementations in ``pwtt`` on in-memory or
+memory-mapped Sentinel-1 stacks, so cached scenes can be reprocessed without an
+EE session. A stack is a ``(time, y, x, band)`` float array with bands
+``['VV', 'VH']`` (log backscatter) and NaN marking masked observations.
+Acquisition times are epoch milliseconds, as in ``system:time_start``.
+
+Usage:
+    import numpy as np
+    from pwtt import local
+
+    out = local.ttest(stack, times, inference_start='2024-07-01',
+                      war_start='2023-10-10', pre_interval=12, post_interval=1)
+    t_vv = out[..., local.TTEST_BANDS.index('VV')]
+"""
+
+import calendar
+import datetime
+import math
+
+import numpy as np
+
+
+TTEST_BANDS = ['VV', 'VH', 'VV_pvalue', 'VH_pvalue', 'n_pre', 'n_post', 'df_VV', 'df_VH']
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def smoothing_config(smoothing='default', method='stouffer'):
+    """Resolve ``detect_damage``'s ``smoothing`` argument to a config dict.
+
+    Returns ``dict(focal_radius=..., kernels=[...], weights=[...])``: a
+    gaussian focal median of ``focal_radius`` metres, circle convolutions of
+    each radius in ``kernels`` (metres), and one weight per layer (the focal
+    median first).
+    """
+    if method == 'mahalanobis_max' and smoothing == 'default':
+        # JS-app default: 20m gaussian focal median, no multi-scale convolutions
+        smoothing = dict(focal_radius=20, kernels=[], weights=[1.0])
+    if smoothing == 'default':
+        return dict(focal_radius=10, kernels=[50, 100, 150], weights=[0.25, 0.25, 0.25, 0.25])
+    if smoothing == 'focal_only':
+        return dict(focal_radius=10, kernels=[], weights=[1.0])
+    if isinstance(smoothing, dict):
+        return smoothing
+    raise ValueError(f"smoothing must be 'default', 'focal_only', or a dict, got '{smoothing}'")
+
+
+def to_millis(date):
+    """Convert a date-like value (ISO string, datetime, datetime64 or millis) to UTC epoch millis."""
+    if isinstance(date, (int, np.integer)):
+        return int(date)
+    if isinstance(date, str):
+        date = datetime.datetime.fromisoformat(date)
+    if isinstance(date, np.datetime64):
+        return int(date.astype('datetime64[ms]').astype(np.int64))
+    if not isinstance(date, datetime.datetime):
+        date = datetime.datetime(date.year, date.month, date.day)
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return int((date - _EPOCH) // datetime.timedelta(milliseconds=1))
+
+
+def advance_months(date, months):
+    """Calendar-month arithmetic matching ``ee.Date.advance(months, 'month')``.
+
+    The day of month is clamped to the length of the target month (Jan 31 + 1
+    month = Feb 28/29). Returns UTC epoch millis.
+    """
+    ms = to_millis(date)
+    d = _EPOCH + datetime.timedelta(milliseconds=ms)
+    total = d.year * 12 + (d.month - 1) + int(months)
+    year, month = divmod(total, 12)
+    month += 1
+    day = min(d.day, calendar.monthrange(year, month)[1])
+    return to_millis(d.replace(year=year, month=month, day=day))
+
+
+def window_indices(times, start, end):
+    """Indices of acquisitions in ``[start, end)``, as ``ImageCollection.filterDate``."""
+    times = np.asarray(times, dtype=np.int64)
+    return np.flatnonzero((times >= to_millis(start)) & (times < to_millis(end)))
+
+
+def _div(a, b):
+    """Element-wise a / b with EE semantics: division by zero returns 0."""
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64))
+    return np.divide(a, b, out=np.zeros(a.shape), where=(b != 0))
+
+
+def normal_cdf_approx(x):
+    """Abramowitz & Stegun 26.2.17 standard normal CDF for positive x (max error < 7.5e-8)."""
+    b1 = 0.319381530
+    b2 = -0.356563782
+    b3 = 1.781477937
+    b4 = -1.882575977
+    b5 = 1.330274429
+
+    x = np.asarray(x, dtype=np.float64)
+    t = 1.0 / (1.0 + 0.2316419 * x)
+    phi = np.exp(-0.5 * x ** 2) / math.sqrt(2 * math.pi)
+    poly = t * (b1 + t * (b2 + t * (b3 + t * (b4 + t * b5))))
+    return 1.0 - phi * poly
+
+
+def two_tailed_pvalue(t):
+    """Two-tailed p-value from absolute t-values using the normal approximation."""
+    with np.errstate(over='ignore', invalid='ignore'):
+        return np.maximum(2.0 * (1.0 - normal_cdf_approx(t)), 1e-10)
+
+
+def _window_sum(a, radius, axis, origin=0):
+    """Sum over a centred (2r+1) window along ``axis``, anchored to global coordinates.
+
+    The axis is cut into blocks of ``w = 2r+1`` cells starting at multiples of
+    ``w`` in global coordinates (``origin`` is the global index of ``a``'s
+    first cell). Every window spans at most two blocks, so its sum is a block
+    suffix sum plus a block prefix sum (van Herk / Gil-Werman): O(1) per cell,
+    and the additions only involve cells inside the window, in an order that
+    depends only on global position. A tile that holds the whole window
+    therefore gets bit-identical sums to the full array. Out-of-bounds
+    neighbours count as zero.
+    """
+    w = 2 * radius + 1
+    n = a.shape[axis]
+    lead = (origin - radius) % w
+    total = lead + n + 2 * radius
+    tail = -total % w
+    pad = [(0, 0)] * a.ndim
+    pad[axis] = (lead + radius, radius + tail)
+    x = np.pad(np.asarray(a, dtype=np.float64), pad)
+    shape = x.shape[:axis] + ((total + tail) // w, w) + x.shape[axis + 1:]
+    blocks = x.reshape(shape)
+    prefix = np.cumsum(blocks, axis=axis + 1).reshape(x.shape)
+    suffix = np.flip(np.cumsum(np.flip(blocks, axis + 1), axis=axis + 1), axis + 1).reshape(x.shape)
+
+    idx = [slice(None)] * a.ndim
+    idx[axis] = slice(lead, lead + n)
+    head = suffix[tuple(idx)]
+    idx[axis] = slice(lead + w - 1, lead + w - 1 + n)
+    rest = prefix[tuple(idx)]
+    # A window starting on a block boundary is that whole block (the suffix sum)
+    starts = ((lead + np.arange(n)) % w == 0).reshape((-1,) + (1,) * (a.ndim - axis - 1))
+    return head + np.where(starts, 0.0, rest)
+
+
+def _box_sum(a, radius, origin=(0, 0)):
+    """Sum over a (2r+1) x (2r+1) window on axes 1, 2 of a 4-D array.
+
+    Separable block-anchored window sums (see ``_window_sum``); ``origin`` is
+    the global (y, x) of ``a[:, 0, 0]``, so tiles of a larger raster give the
+    same sums as the whole raster. Out-of-bounds neighbours count as zero, so
+    dividing by the box sum of a validity mask gives the mean over the pixels
+    that exist, as ``reduceNeighborhood`` does at image edges and around
+    masked pixels.
+    """
+    return _window_sum(_window_sum(a, radius, 1, origin[0]), radius, 2, origin[1])
+
+
+def circle_offsets(radius):
+    """Half-widths of a pixel disk: ``{dy: h}`` with the row ``dy`` spanning ``[-h, h]``.
+
+    A pixel is in the disk when its centre is within ``radius`` pixels of the
+    centre pixel, as ``ee.Kernel.circle``.
+    """
+    r = int(math.floor(radius))
+    return {dy: int(math.floor(math.sqrt(radius * radius - dy * dy))) for dy in range(-r, r + 1)}
+
+
+def circle_kernel(radius):
+    """Unnormalized 0/1 ``ee.Kernel.circle(radius, 'pixels')`` as a square float64 array."""
+    offsets = circle_offsets(radius)
+    r = max(offsets)
+    dx = np.arange(-r, r + 1)
+    return np.array([np.abs(dx) <= offsets[dy] for dy in range(-r, r + 1)], dtype=np.float64)
+
+
+def _fft_size(n):
+    """Smallest 2^a 3^b 5^c >= n (fast FFT lengths)."""
+    best = 1 << max(n - 1, 0).bit_length()
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            p = p35
+            while p < n:
+                p *= 2
+            best = min(best, p)
+            p35 *= 3
+        p5 *= 5
+    return best
+
+
+def _disk_sums_fft(z, radii):
+    """Disk sums of complex ``z`` for each radius (pixels), from one forward FFT."""
+    ny, nx = z.shape
+    reach = max(max(circle_offsets(r)) for r in radii)
+    shape = (_fft_size(ny + 2 * reach), _fft_size(nx + 2 * reach))
+    spectrum = np.fft.fft2(z, shape)
+    sums = []
+    for r in radii:
+        k = circle_kernel(r)
+        kr = k.shape[0] // 2
+        # Kernel centred on (0, 0) with wrap-around, so the output is not shifted
+        kpad = np.zeros(shape)
+        kpad[:k.shape[0], :k.shape[1]] = k
+        kpad = np.roll(kpad, (-kr, -kr), axis=(0, 1))
+        sums.append(np.fft.ifft2(spectrum * np.fft.fft2(kpad))[:ny, :nx])
+    return sums
+
+
+def _disk_sum_rows(a, radius, origin=(0, 0)):
+    """Exact disk sum of a 2-D array from block-anchored row-window sums.
+
+    The disk is a stack of horizontal runs; each run is a ``_window_sum``
+    along x (O(1) per pixel) shifted by its row offset, so the cost is
+    O(radius) per pixel and, like ``_box_sum``, tiles give bit-identical sums.
+    """
+    offsets = circle_offsets(radius)
+    r = max(offsets)
+    ny, nx = a.shape
+    rows = {h: np.pad(_window_sum(a, h, 1, origin[1]), ((r, r), (0, 0)))
+            for h in sorted(set(offsets.values()))}
+    total = np.zeros(a.shape)
+    for dy, h in offsets.items():
+        total += rows[h][r + dy:r + dy + ny]
+    return total
+
+
+def convolve_circles(image, radii, scale=10, method='fft', origin=(0, 0)):
+    """Masked, normalized circle convolutions of a 2-D image at several radii.
+
+    Local counterpart of ``image.convolve(ee.Kernel.circle(r, 'meters', True))``
+    for each ``r`` in ``radii`` (metres, ``scale`` metres per pixel). NaN
+    pixels are masked: each output is the mean over the valid pixels in the
+    disk (normalized convolution, sum(k·x·m) / sum(k·m)) and masked pixels
+    stay NaN.
+
+    ``method='fft'`` packs x·m and m into one complex array, so a single
+    forward transform serves every radius, with one product and inverse
+    transform per radius. The disk sums are exact up to FFT rounding, about
+    ``1e-16 * log2(N) * sum|x|`` for an N-pixel padded transform. The valid
+    count of a valid pixel is at least 1, so the ratio is well conditioned.
+    ``method='rows'`` computes the same sums exactly in O(radius) per pixel
+    from anchored row sums. Use it when tiled output must match the untiled
+    output bit for bit (see ``pwtt.tiling``).
+
+    Returns a list of float32 arrays, one per radius.
+    """
+    x = np.asarray(image, dtype=np.float64)
+    valid = ~np.isnan(x)
+    x0 = np.where(valid, x, 0.0)
+    radii_px = [r / scale for r in radii]
+    if method == 'fft':
+        sums = [(s.real, s.imag) for s in _disk_sums_fft(x0 + 1j * valid, radii_px)]
+    elif method == 'rows':
+        sums = [(_disk_sum_rows(x0, r, origin), _disk_sum_rows(valid, r, origin)) for r in radii_px]
+    else:
+        raise ValueError(f"method must be 'fft' or 'rows', got '{method}'")
+    return [np.where(valid, _div(num, den), np.nan).astype(np.float32) for num, den in sums]
+
+
+def median_bins(values, n_bins=256):
+    """Adaptive bin edges for ``focal_median``: half equal-count, half uniform.
+
+    Equal-count (quantile) edges put fine bins where the values are dense; the
+    uniform edges cap every bin at ``2 * (max - min) / n_bins``. ``focal_median``
+    returns bin midpoints, so its error is at most half the width of the bins
+    holding the middle values: never more than ``(max - min) / n_bins``, and
+    far less in well-populated ranges. Pass the same edges to every tile of a
+    raster so the tiles quantize identically.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return np.array([0.0, 1.0])
+    half = max(n_bins // 2, 1)
+    lo, hi = values.min(), values.max()
+    edges = np.unique(np.concatenate([np.quantile(values, np.linspace(0, 1, half + 1)),
+                                      np.linspace(lo, hi, half + 1)]))
+    return edges if len(edges) > 1 else np.array([lo, lo + 1.0])
+
+
+def focal_median(image, radius, scale=10, kernel='gaussian', edges=None, n_bins=256, origin=(0, 0)):
+    """Sliding-histogram focal median of a masked 2-D image.
+
+    Local counterpart of ``image.focalMedian(radius, kernel, 'meters')`` with
+    ``radius`` in metres at ``scale`` metres per pixel. ``'gaussian'`` and
+    ``'square'`` use the kernel's (2r+1)² square support (unweighted), and
+    ``'circle'`` uses the disk. NaN pixels are masked: they are left out of
+    their neighbours' windows and stay NaN.
+
+    Values are quantized to the bins ``edges`` (default
+    ``median_bins(image, n_bins)``; see there for the error bound). The window
+    histogram slides along each row, vectorized over all rows (Huang): each
+    step adds and removes the footprint's edge pixels, and a two-level
+    (coarse/fine) histogram finds the middle bins in O(sqrt(n_bins)). The
+    cost per pixel is O(r + sqrt(n_bins)), not O(r²). For an even count the
+    result is the mean of the two middle bins' midpoints. The counts are
+    integers, so tiles that share ``edges`` give bit-identical results;
+    ``origin`` is accepted for ``pwtt.tiling`` and unused.
+    """
+    x = np.asarray(image, dtype=np.float64)
+    valid = ~np.isnan(x)
+    r = int(math.floor(radius / scale))
+    if r == 0:
+        return np.where(valid, x, np.nan).astype(np.float32)
+    if kernel in ('gaussian', 'square'):
+        offsets = {dy: r for dy in range(-r, r + 1)}
+    elif kernel == 'circle':
+        offsets = circle_offsets(radius / scale)
+    else:
+        raise ValueError(f"kernel must be 'gaussian', 'square' or 'circle', got '{kernel}'")
+
+    if edges is None:
+        edges = median_bins(x[valid], n_bins)
+    edges = np.asarray(edges, dtype=np.float64)
+    nb = len(edges) - 1
+    mids = (edges[:-1] + edges[1:]) / 2
+    fine = max(int(math.isqrt(nb)), 1)
+    n_coarse = -(-nb // fine)
+
+    q = np.clip(np.searchsorted(edges, x, side='right') - 1, 0, nb - 1)
+    q[~valid] = -1
+    ny, nx = x.shape
+    hmax = max(offsets.values())
+    qp = np.pad(q, ((r, r), (hmax, hmax)), constant_values=-1)
+
+    hist = np.zeros((ny, n_coarse * fine), dtype=np.int32)
+    coarse = np.zeros((ny, n_coarse), dtype=np.int32)
+    count = np.zeros(ny, dtype=np.int32)
+    rows = np.arange(ny)
+
+    def update(dy, col, sign):
+        v = qp[r + dy:r + dy + ny, hmax + col]
+        ok = v >= 0
+        hist[rows[ok], v[ok]] += sign
+        coarse[rows[ok], v[ok] // fine] += sign
+        count[ok] += sign
+
+    def select(k):
+        """Bin of the k-th smallest (0-based) value in each row's window."""
+        cum = np.cumsum(coarse, axis=1)
+        cb = np.minimum((cum <= k[:, None]).sum(axis=1), n_coarse - 1)
+        k = k - (cum[rows, cb] - coarse[rows, cb])
+        block = np.take_along_axis(hist, cb[:, None] * fine + np.arange(fine), axis=1)
+        fb = np.minimum((np.cumsum(block, axis=1) <= k[:, None]).sum(axis=1), fine - 1)
+        return np.minimum(cb * fine + fb, nb - 1)
+
+    out = np.full(x.shape, np.nan, dtype=np.float32)
+    for dy, h in offsets.items():
+        for dx in range(-h, h + 1):
+            update(dy, dx, 1)
+    for col in range(nx):
+        if col > 0:
+            for dy, h in offsets.items():
+                update(dy, col - 1 - h, -1)
+                update(dy, col + h, 1)
+        has = valid[:, col] & (count > 0)
+        k = np.maximum(count, 1)
+        out[has, col] = ((mids[select((k - 1) // 2)] + mids[select(k // 2)]) / 2)[has]
+    return out
+
+
+def multiscale_smooth(t_smooth, smoothing='default', method='stouffer', scale=10, conv='fft', origin=(0, 0)):
+    """Weighted multi-scale stage of ``detect_damage``'s smoothing on a 2-D image.
+
+    ``t_smooth`` is the focal-median layer (NaN = masked). The layers are
+    ``t_smooth`` and its circle convolutions for each radius in the
+    smoothing config's ``kernels``. The result is the ``weights``-weighted sum
+    of the layers, paired as ``zip`` pairs them. ``conv`` is passed to
+    ``convolve_circles`` as its ``method``.
+    """
+    cfg = smoothing_config(smoothing, method)
+    t = np.asarray(t_smooth, dtype=np.float32)
+    layers = [t]
+    if cfg.get('kernels'):
+        layers += convolve_circles(t, cfg['kernels'], scale, conv, origin)
+    out = np.zeros(t.shape, dtype=np.float32)
+    for layer, w in zip(layers, cfg['weights']):
+        out += layer * np.float32(w)
+    return out
+
+
+def smooth(max_change, smoothing='default', method='stouffer', scale=10, conv='fft', edges=None,
+           origin=(0, 0)):
+    """``detect_damage``'s smoothing stage on a 2-D image: focal median, then multi-scale.
+
+    ``max_change`` is the per-pixel statistic with masked pixels (urban and
+    raw-data masks, as with ``mask_before_smooth=True``) set to NaN. Applies
+    ``focal_median`` with the config's gaussian ``focal_radius`` and then
+    ``multiscale_smooth``. Returns the ``T_statistic`` image (float32, NaN
+    where masked).
+    """
+    cfg = smoothing_config(smoothing, method)
+    t_smooth = focal_median(max_change, cfg['focal_radius'], scale, 'gaussian', edges)
+    return multiscale_smooth(t_smooth, cfg, method, scale, conv, origin)
+
+
+def lee_filter(stack, radius=1, enl=5, batch_size=8, out=None, origin=(0, 0)):
+    """Lee MMSE speckle filter on a ``(time, y, x, band)`` stack of linear backscatter.
+
+    Local counterpart of ``pwtt.lee_filter``: neighbourhood mean and
+    (population) variance over a ``(2*radius+1)``-pixel square window, speckle
+    sigma ``1/sqrt(enl)`` and the weight clamped at zero. Window statistics come
+    from block-anchored prefix sums of x, x² and the validity mask, so each
+    pixel costs O(1) whatever the window size. NaN observations are excluded
+    from their neighbours' statistics and stay NaN in the output. Scenes are
+    filtered ``batch_size`` at a time to bound the float64 tables' memory.
+    ``origin`` is the global (y, x) of ``stack[:, 0, 0]`` when filtering a
+    tile (see ``pwtt.tiling``).
+    """
+    eta2 = 1.0 / enl
+    if out is None:
+        out = np.empty(stack.shape, dtype=np.float32)
+
+    for t0 in range(0, stack.shape[0], batch_size):
+        x = np.asarray(stack[t0:t0 + batch_size], dtype=np.float64)
+        valid = ~np.isnan(x)
+        x0 = np.where(valid, x, 0.0)
+
+        n = _box_sum(valid, radius, origin)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z_bar = _div(_box_sum(x0, radius, origin), n)
+            varz = np.maximum(_div(_box_sum(x0 * x0, radius, origin), n) - z_bar ** 2, 0)
+
+            # Estimate weight; if b is negative, set it to zero
+            varx = (varz - z_bar ** 2 * eta2) / (1 + eta2)
+            b = np.maximum(_div(varx, varz), 0)
+
+        out[t0:t0 + batch_size] = np.where(valid, (1 - b) * np.abs(z_bar) + b * x, np.nan)
+    return out
+
+
+def moments(block):
+    """NaN-aware per-pixel moments of a ``(time, y, x, band)`` block.
+
+    Returns ``(n, mean, var)``: ``n`` is the VV observation count (as
+    ``select('VV').count()``), ``mean`` and ``var`` are per-band with each band's
+    own mask. ``var`` is the population variance, matching ``ee.Reducer.stdDev()``.
+    Pixels without observations get NaN mean/variance.
+    """
+    block = np.asarray(block)
+    valid = ~np.isnan(block)
+    cnt = valid.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        total = np.where(valid, block, 0).sum(axis=0, dtype=np.float64)
+        mean = np.where(cnt > 0, total / cnt, np.nan)
+        dev = np.where(valid, block - mean, 0)
+        var = np.where(cnt > 0, (dev * dev).sum(axis=0, dtype=np.float64) / cnt, np.nan)
+    return cnt[..., 0], mean, var
+
+
+def _ttest_from_moments(pre_n, pre_mean, pre_var, post_n, post_mean, post_var, ttest_type='welch'):
+    """Per-pixel t-test bands (``TTEST_BANDS`` order) from window moments."""
+    pre_n = np.asarray(pre_n, dtype=np.float64)
+    post_n = np.asarray(post_n, dtype=np.float64)
+    n1 = pre_n[..., None]
+    n2 = post_n[..., None]
+
+    with np.errstate(invalid='ignore', over='ignore'):
+        if ttest_type == 'welch':
+            # Welch's t-test: does not assume equal variance
+            var_pre_n = _div(pre_var, n1)
+            var_post_n = _div(post_var, n2)
+            sum_var = var_pre_n + var_post_n
+            denom = np.sqrt(sum_var)
+            # Welch-Satterthwaite degrees of freedom (per pixel, per band)
+            df = _div(sum_var ** 2, _div(var_pre_n ** 2, n1 - 1) + _div(var_post_n ** 2, n2 - 1))
+        else:
+            # Pooled t-test (original): assumes equal variance
+            pooled_sd = np.sqrt(_div(pre_var * (n1 - 1) + post_var * (n2 - 1), n1 + n2 - 2))
+            denom = pooled_sd * np.sqrt(_div(1, n1) + _div(1, n2))
+            df = np.broadcast_to(n1 + n2 - 2, pre_mean.shape)
+
+        change = np.abs(_div(post_mean - pre_mean, denom))
+        p_values = two_tailed_pvalue(change)
+
+    # Mask out pixels with insufficient observations
+    invalid = ~((pre_n >= 3) & (post_n >= 2))
+
+    out = np.empty(pre_n.shape + (len(TTEST_BANDS),), dtype=np.float32)
+    out[..., 0:2] = change
+    out[..., 2:4] = p_values
+    out[..., 4] = pre_n
+    out[..., 5] = post_n
+    out[..., 6:8] = df
+    out[invalid, 0:4] = np.nan
+    out[invalid, 6:8] = np.nan
+    return out
+
+
+def ttest(stack, times, inference_start, war_start, pre_interval=12, post_interval=2,
+          ttest_type='welch', chunk_size=512, out=None):
+    """Pixel-wise t-test on a local ``(time, y, x, band)`` stack.
+
+    Local counterpart of ``pwtt.ttest``: same pre window
+    ``[war_start - pre_interval months, war_start)``, post window
+    ``[inference_start, inference_start + post_interval months)``, output bands
+    (``TTEST_BANDS``) and ``n_pre >= 3 / n_post >= 2`` masking, with masked
+    pixels as NaN. Work is done in ``chunk_size`` x ``chunk_size`` spatial
+    blocks so only the acquisitions in each window, for one block at a time,
+    are held in memory; ``stack`` may be a ``np.memmap`` and ``out`` a
+    preallocated ``(y, x, 8)`` float32 array or memmap for large AOIs.
+    """
+    times = np.asarray(times, dtype=np.int64)
+    if stack.ndim != 4 or stack.shape[0] != len(times):
+        raise ValueError(f"stack must be (time, y, x, band) with {len(times)} time steps, got {stack.shape}")
+
+    war = to_millis(war_start)
+    inf = to_millis(inference_start)
+    pre_idx = window_indices(times, advance_months(war, -pre_interval), war)
+    post_idx = window_indices(times, inf, advance_months(inf, post_interval))
+
+    _, ny, nx, nb = stack.shape
+    if out is None:
+        out = np.empty((ny, nx, len(TTEST_BANDS)), dtype=np.float32)
+
+    for y0 in range(0, ny, chunk_size):
+        y1 = min(y0 + chunk_size, ny)
+        for x0 in range(0, nx, chunk_size):
+            x1 = min(x0 + chunk_size, nx)
+            pre = np.asarray(stack[pre_idx, y0:y1, x0:x1, :], dtype=np.float32).reshape(len(pre_idx), y1 - y0, x1 - x0, nb)
+            post = np.asarray(stack[post_idx, y0:y1, x0:x1, :], dtype=np.float32).reshape(len(post_idx), y1 - y0, x1 - x0, nb)
+            out[y0:y1, x0:x1] = _ttest_from_moments(*moments(pre), *moments(post), ttest_type=ttest_type)
+    return out
@@ -0,0 +1,354 @@
+"""
+Load-balanced tiling of AOIs into export tasks of roughly equal cost.
+
+A uniform grid (``eval.py --chunks``, fixed-resolution H3 cells) gives a
+tile over a city centre orders of magnitude more work than a desert tile, so
+the slowest task sets the wall time. The planner works in three steps.
+
+1. ``estimate`` pulls, in one call, per-cell statistics on a fine
+   ``2**depth`` x ``2**depth`` grid over the AOI's bounding box. The
+   statistics are the footprint count (by centroid), the area, the urban
+   fraction (Dynamic World ``built`` > 0.1, the mask ``detect_damage``
+   uses) and the number of S1 acquisitions in the pre/post window.
+2. ``tiles`` descends the quadtree of ``pwtt.autosplit.QuadTree`` and keeps
+   a tile whole once its predicted cost is under a ceiling. Dense areas
+   therefore become small tiles and empty ones large tiles.
+3. ``pack`` bin-packs the tiles into tasks of near-equal total cost
+   (longest-processing-time first).
+
+``plan`` runs steps 2 and 3 for a target number of tasks or a cost ceiling.
+
+Cost is linear in three work measures of a tile (``FEATURES``): the
+footprints reduced, the pixel-acquisitions read, and the urban
+pixel-acquisitions that survive the urban mask. A fixed per-task overhead
+is added on top. ``CostModel`` starts from rough defaults. ``calibrate``
+refits it from the runtimes the scheduler recorded for jobs queued by
+``queue_bundles``, which keep their features in the job parameters.
+
+Usage:
+    from pwtt import planner
+
+    grid = planner.estimate(aoi, footprints, '2023-10-10', '2024-07-01')
+    model = planner.CostModel.load('cost_model.json')
+    bundles = planner.plan(grid, model, n_tasks=16)
+    planner.queue_bundles(sched, 'gaza', image, grid, bundles, footprints)
+    sched.run()
+    planner.calibrate(sched, model).save('cost_model.json')
+"""
+
+import heapq
+import json
+import math
+import os
+from collections import namedtuple
+
+try:
+    import ee
+except ImportError:  # CostModel, tiles, pack and plan run without EE
+    ee = None
+import numpy as np
+
+from .autosplit import CENTROID, QuadTree, with_centroids
+from .fetch import fetch_columns
+
+
+FEATURES = ('footprints', 'pixels', 'urban_pixels')
+URBAN_THRESHOLD = 0.1
+
+Bundle = namedtuple('Bundle', 'paths features cost')
+Bundle.__doc__ = 'Tiles (quadtree paths) exported as one task, their summed features and predicted cost (s).'
+
+
+class CostModel:
+    """Predicted task seconds: ``intercept`` plus ``weights`` (per ``FEATURES`` entry) times the features."""
+
+    # Rough starting point (seconds per footprint / per 10 m pixel-acquisition);
+    # calibrate() replaces it with a fit to recorded runtimes
+    DEFAULTS = dict(intercept=120.0, footprints=2e-3, pixels=2e-7, urban_pixels=1e-6)
+
+    def __init__(self, intercept=None, **weights):
+        self.intercept = self.DEFAULTS['intercept'] if intercept is None else float(intercept)
+        self.weights = {f: float(weights.get(f, self.DEFAULTS[f])) for f in FEATURES}
+
+    def work(self, features):
+        """Seconds for ``features`` without the per-task overhead (additive across tiles)."""
+        return sum(self.weights[f] * features.get(f, 0.0) for f in FEATURES)
+
+    def cost(self, features):
+        """Predicted seconds of one task doing ``features`` of work."""
+        return self.intercept + self.work(features)
+
+    def fit(self, features, seconds):
+        """Least-squares fit to ``features`` (list of dicts) and observed ``seconds``, all terms >= 0.
+
+        Terms whose weight would come out negative are dropped and the rest
+        refitted. With fewer samples than terms the model is left unchanged.
+        """
+        names = ['intercept'] + list(FEATURES)
+        X = np.array([[1.0] + [f.get(k, 0.0) for k in FEATURES] for f in features], dtype=np.float64)
+        y = np.asarray(seconds, dtype=np.float64)
+        if len(y) < len(names):
+            return self
+        # Scale columns so tiny per-pixel weights are not lost to conditioning
+        scale = np.abs(X).max(axis=0)
+        scale[scale == 0] = 1.0
+        active = np.ones(len(names), dtype=bool)
+        while True:
+            coef = np.zeros(len(names))
+            coef[active] = np.linalg.lstsq(X[:, active] / scale[active], y, rcond=None)[0]
+            if (coef >= 0).all():
+                break
+            active &= coef > 0
+        coef /= scale
+        self.intercept = float(coef[0])
+        self.weights = {f: float(w) for f, w in zip(FEATURES, coef[1:])}
+        return self
+
+    def to_dict(self):
+        return dict(intercept=self.intercept, **self.weights)
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return self
+
+    @classmethod
+    def load(cls, path):
+        """Model saved at ``path``, or the defaults if there is none yet."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            return cls(**json.load(f))
+
+
+# ------------------------------------------------------------------- grid
+
+class Grid:
+    """Per-cell statistics on a ``2**depth`` square grid over a bounding box.
+
+    Arrays are indexed ``[iy, ix]`` from the south-west corner:
+    ``footprints`` (count), ``area`` (m²), ``urban`` (fraction of the area)
+    and ``scenes`` (S1 acquisitions).
+    """
+
+    def __init__(self, bbox, depth, footprints, area, urban, scenes, aoi=None):
+        self.bbox = [float(v) for v in bbox]
+        self.depth = depth
+        self.footprints = np.asarray(footprints, dtype=np.float64)
+        self.area = np.asarray(area, dtype=np.float64)
+        self.urban = np.asarray(urban, dtype=np.float64)
+        self.scenes = np.asarray(scenes, dtype=np.float64)
+        self.aoi = aoi
+
+    @property
+    def tree(self):
+        return QuadTree(self.aoi, self.bbox)
+
+    def block(self, path):
+        """Slice ``(rows, cols)`` of the cells inside quadtree tile ``path``."""
+        iy = ix = 0
+        for q in path:
+            q = int(q)
+            iy, ix = 2 * iy + q // 2, 2 * ix + q % 2
+        size = 2 ** (self.depth - len(path))
+        return slice(iy * size, (iy + 1) * size), slice(ix * size, (ix + 1) * size)
+
+    def features(self, path):
+        """``FEATURES`` of quadtree tile ``path`` (10 m pixels)."""
+        b = self.block(path)
+        px = self.area[b] / 100.0 * self.scenes[b]
+        return dict(footprints=float(self.footprints[b].sum()), pixels=float(px.sum()),
+                    urban_pixels=float((px * self.urban[b]).sum()))
+
+
+def _cell_rectangles(bbox, n):
+    x0, y0, x1, y1 = bbox
+    dx, dy = (x1 - x0) / n, (y1 - y0) / n
+    return [ee.Feature(ee.Geometry.Rectangle([x0 + ix * dx, y0 + iy * dy, x0 + (ix + 1) * dx, y0 + (iy + 1) * dy],
+                                             None, False), {'cell': iy * n + ix})
+            for iy in range(n) for ix in range(n)]
+
+
+def estimate(aoi, footprints, war_start, inference_start, pre_interval=12, post_interval=2, depth=4,
+             bbox=None, cache=None):
+    """Per-cell work statistics of ``aoi`` on a ``2**depth`` grid, as a ``Grid``.
+
+    One ``fetch_columns`` pull (through ``cache``, a ``GetInfoCache``, if
+    given), plus one for the bounding box unless ``bbox`` is passed.
+    Footprints are counted by centroid in one pass over the collection;
+    urban fraction is sampled at 100 m.
+    """
+    aoi = ee.Geometry(aoi)
+    tree = QuadTree(aoi, bbox)
+    x0, y0, x1, y1 = tree.bbox
+    n = 2 ** depth
+    war_start = ee.Date(war_start)
+    inference_start = ee.Date(inference_start)
+
+    # Footprints per cell: one histogram over centroid cell indices. Centroids
+    # outside the bbox (footprints crossing the AOI edge) are clamped into the
+    # edge cells, matching the open outer sides of QuadTree.filter, so the
+    # footprints costed here are the ones footprint_filter exports.
+    def cell_of(f):
+        ix = ee.Number(f.get(CENTROID[0])).subtract(x0).divide((x1 - x0) / n).floor().min(n - 1).max(0)
+        iy = ee.Number(f.get(CENTROID[1])).subtract(y0).divide((y1 - y0) / n).floor().min(n - 1).max(0)
+        return f.set('cell', iy.multiply(n).add(ix).format('%d'))
+    fp = ee.FeatureCollection(footprints).filterBounds(aoi)
+    counts = ee.Dictionary(with_centroids(fp).map(cell_of).aggregate_histogram('cell'))
+
+    s1 = ee.ImageCollection('COPERNICUS/S1_GRD_FLOAT') \
+        .filter(ee.Filter.listContains('transmitterReceiverPolarisation', 'VH')) \
+        .filter(ee.Filter.eq('instrumentMode', 'IW')) \
+        .filterBounds(aoi) \
+        .filterDate(war_start.advance(-pre_interval, 'months'), inference_start.advance(post_interval, 'months'))
+    urban = ee.ImageCollection('GOOGLE/DYNAMICWORLD/V1').filterDate(
+        war_start.advance(-pre_interval, 'months'), war_start).select('built').mean() \
+        .gt(URBAN_THRESHOLD).rename('urban')
+
+    def cell_stats(cell):
+        geom = cell.geometry().intersection(aoi, 10)
+        key = ee.Number(cell.get('cell')).format('%d')
+        return cell.setGeometry(geom).set(
+            'footprints', counts.get(key, 0),
+            'area', geom.area(10),
+            'scenes', s1.filterBounds(geom).size(),
+        )
+
+    cells = ee.FeatureCollection(_cell_rectangles(tree.bbox, n)).map(cell_stats)
+    cells = urban.reduceRegions(collection=cells, reducer=ee.Reducer.mean().setOutputs(['urban']),
+                                scale=100, tileScale=4)
+    cells = cells.select(['cell', 'footprints', 'area', 'scenes', 'urban'], retainGeometry=False)
+    columns = ['cell', 'footprints', 'area', 'scenes', 'urban']
+    cols = cache.fetch_columns(cells, columns) if cache is not None else fetch_columns(cells, columns)
+
+    grids = {c: np.zeros((n, n)) for c in columns[1:]}
+    idx = cols['cell'].astype(int)
+    for c in grids:
+        grids[c].flat[idx] = np.nan_to_num(cols[c])
+    return Grid(tree.bbox, depth, aoi=aoi, **grids)
+
+
+# --------------------------------------------------------------- planning
+
+def tiles(grid, model, max_cost):
+    """Quadtree paths whose predicted work is at most ``max_cost`` seconds (or that are single cells).
+
+    Tiles with no area (outside the AOI) are dropped.
+    """
+    out = []
+
+    def visit(path):
+        b = grid.block(path)
+        if not grid.area[b].any():
+            return
+        if len(path) == grid.depth or model.work(grid.features(path)) <= max_cost:
+            out.append(path)
+            return
+        for q in range(4):
+            visit(path + str(q))
+
+    visit('')
+    return out
+
+
+def pack(grid, model, paths, n_bins):
+    """Longest-processing-time bin packing of ``paths`` into at most ``n_bins`` ``Bundle``s.
+
+    Bundles come back most expensive first.
+    """
+    work = {p: model.work(grid.features(p)) for p in paths}
+    heap = [(0.0, i, []) for i in range(min(n_bins, len(paths)))]
+    for p in sorted(paths, key=lambda p: -work[p]):
+        load, i, members = heapq.heappop(heap)
+        members.append(p)
+        heapq.heappush(heap, (load + work[p], i, members))
+    bundles = []
+    for _load, _i, members in heap:
+        feats = [grid.features(p) for p in members]
+        total = {f: sum(x[f] for x in feats) for f in FEATURES}
+        bundles.append(Bundle(sorted(members), total, model.cost(total)))
+    return sorted(bundles, key=lambda b: -b.cost)
+
+
+def plan(grid, model=None, n_tasks=None, max_cost=None, granularity=4):
+    """Bundles of roughly equal predicted cost covering ``grid``.
+
+    Give ``n_tasks`` (number of export tasks) or ``max_cost`` (seconds per
+    task; the task count follows). Tiles are cut to about
+    1/``granularity`` of a task's work so that packing can even out the
+    bundles.
+    """
+    model = model or CostModel()
+    total = model.work(grid.features(''))
+    if n_tasks is None:
+        if max_cost is None:
+            raise ValueError('plan needs n_tasks or max_cost')
+        n_tasks = max(1, math.ceil(total / max(max_cost - model.intercept, 1e-9)))
+    per_task = total / n_tasks
+    return pack(grid, model, tiles(grid, model, per_task / granularity), n_tasks)
+
+
+def balance(bundles):
+    """Slowest over mean predicted bundle cost (1.0 is perfectly even)."""
+    costs = np.array([b.cost for b in bundles])
+    return float(costs.max() / costs.mean()) if len(costs) else 1.0
+
+
+def region(grid, paths):
+    """Geometry of a bundle: its tiles' boxes intersected with the AOI."""
+    tree = grid.tree
+    rings = []
+    for x0, y0, x1, y1 in (tree.bounds(p) for p in paths):
+        rings.append([[[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]])
+    multi = ee.Geometry.MultiPolygon(rings, None, False)
+    return multi.intersection(grid.aoi, 10) if grid.aoi is not None else multi
+
+
+def footprint_filter(grid, paths):
+    """``ee.Filter`` keeping ``with_centroids`` features whose centroid lies in one of ``paths``."""
+    tree = grid.tree
+    if paths == ['']:
+        return None
+    return ee.Filter.Or(*[tree.filter(p) for p in paths])
+
+
+# ---------------------------------------------------------------- exports
+
+def queue_bundles(sched, description, image, grid, bundles, footprints, folder='PWTT_Export', scale=10,
+                  tile_scale=8):
+    """Queue one footprint-table export per bundle on ``sched`` as ``<description>_b<i>``.
+
+    Each job keeps its bundle's tiles and ``features`` in its parameters,
+    so ``calibrate`` can refit the cost model once the tasks have run.
+    Failed tasks are retried with a higher ``tileScale``. Returns the job
+    keys.
+    """
+    fc = with_centroids(ee.FeatureCollection(footprints).filterBounds(grid.aoi))
+    keys = []
+    for i, bundle in enumerate(bundles):
+        key = f'{description}_b{i}'
+
+        def build(params, key=key):
+            flt = footprint_filter(grid, params['paths'])
+            table = image.reduceRegions(
+                collection=fc if flt is None else fc.filter(flt), reducer=ee.Reducer.mean(),
+                scale=scale, tileScale=params['tileScale'],
+            )
+            return ee.batch.Export.table.toDrive(
+                collection=table, description=key, folder=folder, fileFormat='GEOJSON',
+            )
+
+        sched.add(key, build, priority=bundle.cost,
+                  params=dict(paths=bundle.paths, features=bundle.features, tileScale=tile_scale))
+        keys.append(key)
+    return keys
+
+
+def calibrate(sched, model=None, min_samples=8):
+    """``model`` refitted to the runtimes ``sched`` recorded for jobs with ``features`` parameters."""
+    model = model or CostModel()
+    params, runtimes = sched.params(), sched.runtimes()
+    keys = [k for k in runtimes if 'features' in params.get(k, {})]
+    if len(keys) < min_samples:
+        return model
+    return model.fit([params[k]['features'] for k in keys], [runtimes[k] for k in keys])
@@ -0,0 +1,438 @@
+"""
+Quota-aware scheduler for Earth Engine export tasks.
+
+Jobs wait in a priority queue and are started only while the account has
+fewer than ``max_concurrent`` tasks READY or RUNNING, counting tasks started
+by other processes. The rest stay queued locally instead of piling up on
+the server. Task state is polled with one task-list call per round. The
+interval starts at ``poll_min``, is reset whenever a task changes state,
+otherwise grows by ``backoff`` up to ``poll_max``, and is jittered so that
+parallel runs do not poll in lockstep.
+
+Every job's state, task id, attempt count and parameters are kept in a
+SQLite file. A run that crashes or is interrupted can be restarted with the
+same jobs:
+- completed jobs are skipped;
+- running ones are polled by task id rather than resubmitted;
+- a job caught between ``start()`` and the database write is matched back
+  to its task by description.
+
+A failed job is rebuilt with new parameters from its ``retry`` policy and
+resubmitted, up to ``max_attempts`` attempts. The default policy,
+``escalate``, doubles ``tileScale`` and then halves ``tile_size``. A policy
+may instead split the job into child jobs: ``pwtt.autosplit`` re-plans a
+failed region as quadtree tiles this way.
+
+The running time of each completed task is recorded with its job, so
+``pwtt.planner`` can calibrate its cost model from past runs.
+
+``FakeBackend`` simulates the task service in fake time, so the scheduler
+can be exercised without Earth Engine.
+
+Usage:
+    from pwtt.scheduler import Scheduler
+
+    sched = Scheduler('exports.sqlite', max_concurrent=4)
+    for cell, n in cells:
+        sched.add(f'zscore_{cell}', lambda params, cell=cell: make_task(cell, **params),
+                  priority=n, params={'tileScale': 1})
+    states = sched.run()          # {'zscore_...': 'COMPLETED', ...}
+"""
+
+import json
+import random
+import sqlite3
+import time
+
+try:
+    import ee
+except ImportError:  # only EarthEngineBackend needs it; FakeBackend runs without EE
+    ee = None
+
+
+DEFAULT_MAX_CONCURRENT = 4
+MAX_TILE_SCALE = 16
+# Allowed difference (s) between the local clock and task creation times on the server
+CLOCK_SKEW = 60
+
+ACTIVE = ('SUBMITTING', 'READY', 'RUNNING', 'CANCEL_REQUESTED')
+TERMINAL = ('COMPLETED', 'FAILED', 'CANCELLED', 'SPLIT')
+
+
+def escalate(params, error):
+    """Default retry policy: double ``tileScale`` (up to 16), then halve ``tile_size``.
+
+    Parameters without either key are resubmitted unchanged. Returns None
+    once both are exhausted.
+    """
+    params = dict(params)
+    if params.get('tileScale', MAX_TILE_SCALE) < MAX_TILE_SCALE:
+        params['tileScale'] = min(params['tileScale'] * 2, MAX_TILE_SCALE)
+    elif 'tile_size' in params:
+        params['tile_size'] = params['tile_size'] / 2
+    elif 'tileScale' in params:
+        return None
+    return params
+
+
+def resubmit(params, error):
+    """Retry policy that resubmits with the same parameters."""
+    return params
+
+
+# ------------------------------------------------------------------- backends
+
+class EarthEngineBackend:
+    """Starts ``ee.batch`` tasks and lists the account's tasks."""
+
+    def start(self, task):
+        task.start()
+        return task.id
+
+    def list(self):
+        """Every task of the account as dicts with id, description, state, error, and
+        created / started / updated times (ms)."""
+        return [dict(id=t['id'], description=t.get('description', ''), state=t['state'],
+                     error=t.get('error_message', ''), created=t.get('creation_timestamp_ms', 0),
+                     started=t.get('start_timestamp_ms', 0), updated=t.get('update_timestamp_ms', 0))
+                for t in ee.data.getTaskList()]
+
+
+class FakeTask:
+    """Stand-in for an ``ee.batch`` task: a description and the parameters it was built with."""
+
+    def __init__(self, description, **params):
+        self.config = dict(description=description)
+        self.params = params
+        self.id = None
+
+
+class FakeBackend:
+    """In-memory task service running in fake time, for tests.
+
+    Tasks take ``duration`` fake seconds (a number, or a function of the
+    task). The server runs at most ``slots`` at a time and queues the rest
+    as READY. ``outcome(task)`` returns an error message to fail a task, or
+    None to complete it. Pass ``clock=backend.clock`` and
+    ``sleep=backend.sleep`` to the ``Scheduler`` so waiting advances the
+    fake time.
+    """
+
+    def __init__(self, duration=60, outcome=None, slots=None):
+        self.duration = duration
+        self.outcome = outcome
+        self.slots = slots
+        self.now = 0.0
+        self.tasks = {}
+        self.started = []
+        self.list_calls = 0
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def task(self, description, **params):
+        return FakeTask(description, **params)
+
+    def start(self, task):
+        task.id = f'FAKE{len(self.started):06d}'
+        self.started.append(task)
+        self.tasks[task.id] = dict(task=task, state='READY', error='', created=self.now,
+                                   running_since=None, updated=self.now)
+        return task.id
+
+    def cancel(self, task_id):
+        self.tasks[task_id]['state'] = 'CANCELLED'
+
+    def _advance(self):
+        """Move tasks through READY → RUNNING → COMPLETED/FAILED up to ``now``."""
+        for entry in self.tasks.values():
+            if entry['state'] == 'RUNNING':
+                duration = self.duration(entry['task']) if callable(self.duration) else self.duration
+                if self.now - entry['running_since'] >= duration:
+                    error = self.outcome(entry['task']) if self.outcome else None
+                    entry['state'] = 'FAILED' if error else 'COMPLETED'
+                    entry['error'] = error or ''
+                    entry['updated'] = entry['running_since'] + duration
+        running = sum(e['state'] == 'RUNNING' for e in self.tasks.values())
+        for entry in self.tasks.values():
+            if entry['state'] == 'READY' and (self.slots is None or running < self.slots):
+                entry['state'] = 'RUNNING'
+                entry['running_since'] = entry['updated'] = self.now
+                running += 1
+
+    def list(self):
+        self.list_calls += 1
+        self._advance()
+        return [dict(id=i, description=e['task'].config['description'], state=e['state'],
+                     error=e['error'], created=e['created'] * 1000,
+                     started=(e['running_since'] or 0) * 1000, updated=e['updated'] * 1000)
+                for i, e in self.tasks.items()]
+
+
+# ------------------------------------------------------------------ scheduler
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    priority REAL NOT NULL DEFAULT 0,
+    state TEXT NOT NULL,
+    task_id TEXT,
+    attempt INTEGER NOT NULL DEFAULT 0,
+    params TEXT NOT NULL DEFAULT '{}',
+    error TEXT NOT NULL DEFAULT '',
+    parent TEXT,
+    runtime REAL,
+    updated REAL NOT NULL
+)
+"""
+
+
+class Scheduler:
+    """Bounded, prioritized, resumable export queue backed by SQLite; see module docstring.
+
+    ``db_path`` is the state file (``':memory:'`` for a throwaway run).
+    ``backend`` defaults to ``EarthEngineBackend()``. ``clock`` and
+    ``sleep`` are only replaced in tests, and ``log`` prints progress
+    (None for silence).
+    """
+
+    def __init__(self, db_path, backend=None, max_concurrent=DEFAULT_MAX_CONCURRENT, max_attempts=3,
+                 poll_min=10, poll_max=300, backoff=1.5, jitter=0.2, clock=time.time, sleep=time.sleep,
+                 log=print):
+        self.backend = backend if backend is not None else EarthEngineBackend()
+        self.max_concurrent = max_concurrent
+        self.max_attempts = max_attempts
+        self.poll_min = poll_min
+        self.poll_max = poll_max
+        self.backoff = backoff
+        self.jitter = jitter
+        self.clock = clock
+        self.sleep = sleep
+        self.log = log or (lambda *args, **kwargs: None)
+        self.db = sqlite3.connect(db_path)
+        self.db.execute(_SCHEMA)
+        have = [c[1] for c in self.db.execute('PRAGMA table_info(jobs)')]
+        for column, kind in (('parent', 'TEXT'), ('runtime', 'REAL')):
+            if column not in have:
+                self.db.execute(f'ALTER TABLE jobs ADD COLUMN {column} {kind}')
+        self.db.commit()
+        self._jobs = {}
+        self._records = []
+
+    # ------------------------------------------------------------- database
+
+    def _row(self, key):
+        cur = self.db.execute('SELECT state, task_id, attempt, params, error FROM jobs WHERE key = ?', (key,))
+        row = cur.fetchone()
+        if row is None:
+            return None
+        state, task_id, attempt, params, error = row
+        return dict(key=key, state=state, task_id=task_id, attempt=attempt,
+                    params=json.loads(params), error=error)
+
+    def _update(self, key, **fields):
+        fields['updated'] = self.clock()
+        if 'params' in fields:
+            fields['params'] = json.dumps(fields['params'])
+        sets = ', '.join(f'{k} = ?' for k in fields)
+        self.db.execute(f'UPDATE jobs SET {sets} WHERE key = ?', (*fields.values(), key))
+        self.db.commit()
+
+    def _insert(self, key, state, priority=0, params=None, task_id=None, parent=None):
+        seq = self.db.execute('SELECT COALESCE(MAX(seq), -1) + 1 FROM jobs').fetchone()[0]
+        self.db.execute('INSERT INTO jobs (key, seq, priority, state, task_id, params, parent, updated) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                        (key, seq, priority, state, task_id, json.dumps(params or {}), parent, self.clock()))
+        self.db.commit()
+
+    def _job(self, key):
+        """The registered build/retry of ``key``, or of the job it was split from."""
+        while key is not None:
+            if key in self._jobs:
+                return self._jobs[key]
+            row = self.db.execute('SELECT parent FROM jobs WHERE key = ?', (key,)).fetchone()
+            key = row[0] if row else None
+        return None
+
+    def _keys(self, states):
+        marks = ', '.join('?' * len(states))
+        cur = self.db.execute(f'SELECT key FROM jobs WHERE state IN ({marks}) ORDER BY priority DESC, seq',
+                              tuple(states))
+        return [k for k, in cur.fetchall()]
+
+    # ----------------------------------------------------------------- jobs
+
+    def add(self, key, build, priority=0, params=None, retry=escalate):
+        """Queue a job; returns its state (a job already in the database keeps its state).
+
+        ``build(params)`` returns an unstarted task whose description is
+        ``key``. It is called at submission and again with the retry
+        policy's parameters after a failure. Higher ``priority`` starts
+        first, and ties start in the order they were added.
+
+        ``retry(params, error)`` returns one of:
+        - the next attempt's parameters;
+        - None, to give up;
+        - a list of parameter dicts, to replace the job with one child job
+          per entry. Child ``i`` of job ``key`` is keyed ``f'{key}_{i}'``
+          and built by the same ``build``, so it must name its task that
+          way. The parent is marked SPLIT.
+
+        A resumed job keeps its stored parameters, and its children are
+        resumed with it.
+        """
+        self._jobs[key] = dict(build=build, retry=retry)
+        row = self._row(key)
+        if row is None:
+            self._insert(key, 'PENDING', priority, params)
+            return 'PENDING'
+        if row['state'] == 'PENDING':
+            self._update(key, priority=priority)
+        return row['state']
+
+    def track(self, key, task_id):
+        """Follow a task started elsewhere (no rebuild, so no retries)."""
+        row = self._row(key)
+        if row is None:
+            self._insert(key, 'READY', task_id=task_id)
+        elif row['task_id'] != task_id and row['state'] not in TERMINAL:
+            self._update(key, task_id=task_id, state='READY')
+
+    def reset_failed(self):
+        """Queue permanently failed jobs again, with a fresh attempt budget."""
+        for key in self._keys(('FAILED',)):
+            self._update(key, state='PENDING', attempt=0, task_id=None)
+
+    def states(self):
+        """``{key: state}`` of every job in the database."""
+        return dict(self.db.execute('SELECT key, state FROM jobs ORDER BY seq').fetchall())
+
+    def failures(self):
+        """``{key: error}`` of the permanently failed jobs."""
+        return dict(self.db.execute("SELECT key, error FROM jobs WHERE state = 'FAILED' ORDER BY seq").fetchall())
+
+    def params(self):
+        """``{key: params}`` of every job in the database."""
+        return {k: json.loads(p) for k, p in self.db.execute('SELECT key, params FROM jobs ORDER BY seq')}
+
+    def runtimes(self):
+        """``{key: seconds}`` the task of each completed job ran for, where the backend reported it."""
+        return dict(self.db.execute("SELECT key, runtime FROM jobs WHERE state = 'COMPLETED' "
+                                    "AND runtime IS NOT NULL ORDER BY seq").fetchall())
+
+    def counts(self):
+        counts = {}
+        for state in self.states().values():
+            counts[state] = counts.get(state, 0) + 1
+        return counts
+
+    # ------------------------------------------------------------- stepping
+
+    def poll(self):
+        """Refresh task states with one task-list call; returns the number of jobs that changed."""
+        self._records = self.backend.list()
+        by_id = {r['id']: r for r in self._records}
+        changed = 0
+        for key in self._keys(ACTIVE):
+            row = self._row(key)
+            if row['task_id'] is None:
+                # Crashed between start() and recording the id: adopt the newest task with this
+                # description created since the job entered SUBMITTING. Older ones belong to
+                # earlier runs that reused the description.
+                since = self.db.execute('SELECT updated FROM jobs WHERE key = ?', (key,)).fetchone()[0]
+                since = (since - CLOCK_SKEW) * 1000
+                found = [r for r in self._records if r['description'] == key
+                         and r['state'] not in ('FAILED', 'CANCELLED') and r.get('created', 0) >= since]
+                if found:
+                    newest = max(found, key=lambda r: r['created'])
+                    self._update(key, task_id=newest['id'], state=newest['state'])
+                else:
+                    self._update(key, state='PENDING')
+                changed += 1
+                continue
+            record = by_id.get(row['task_id'])
+            if record is None or record['state'] == row['state']:
+                continue
+            changed += 1
+            if record['state'] == 'FAILED':
+                self._failed(row, record['error'])
+            elif record['state'] == 'COMPLETED':
+                runtime = None
+                if record.get('started') and record.get('updated'):
+                    runtime = (record['updated'] - record['started']) / 1000
+                self._update(key, state='COMPLETED', runtime=runtime)
+                self.log(f'  {key}: completed')
+            else:
+                self._update(key, state=record['state'])
+        return changed
+
+    def _failed(self, row, error):
+        key = row['key']
+        job = self._job(key)
+        attempt = row['attempt'] + 1
+        params = None
+        if job is not None and attempt < self.max_attempts:
+            params = job['retry'](row['params'], error)
+        if isinstance(params, list):
+            priority = self.db.execute('SELECT priority FROM jobs WHERE key = ?', (key,)).fetchone()[0]
+            for i, child in enumerate(params):
+                self._insert(f'{key}_{i}', 'PENDING', priority, child, parent=key)
+            self._update(key, state='SPLIT', attempt=attempt, error=error, task_id=None)
+            self.log(f'  {key}: failed ({error}); split into {len(params)} jobs')
+        elif params is None:
+            self._update(key, state='FAILED', attempt=attempt, error=error)
+            self.log(f'  {key}: FAILED after {attempt} attempt(s): {error}')
+        else:
+            self._update(key, state='PENDING', attempt=attempt, error=error, params=params, task_id=None)
+            self.log(f'  {key}: failed ({error}); retrying with {params}')
+
+    def active_count(self):
+        """READY/RUNNING tasks on the account as of the last poll, ours or not."""
+        return sum(r['state'] in ('READY', 'RUNNING') for r in self._records)
+
+    def submit(self):
+        """Start queued jobs by priority while the account is under ``max_concurrent``; returns how many."""
+        free = self.max_concurrent - self.active_count()
+        started = 0
+        for key in self._keys(('PENDING',)):
+            if started >= free:
+                break
+            job = self._job(key)
+            if job is None:
+                continue  # queued by an earlier run; add() it again to submit it
+            row = self._row(key)
+            task = job['build'](row['params'])
+            self._update(key, state='SUBMITTING', task_id=None)
+            task_id = self.backend.start(task)
+            self._update(key, state='READY', task_id=task_id)
+            # Count it against the quota until the next poll lists it
+            self._records.append(dict(id=task_id, description=key, state='READY', error='', created=0))
+            started += 1
+        return started
+
+    def run(self, timeout=None):
+        """Submit and poll until every job has finished; returns ``states()``.
+
+        Raises ``TimeoutError`` after ``timeout`` seconds with jobs still
+        open. The database keeps their state for a later run.
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        interval = self.poll_min
+        while True:
+            changed = self.poll() + self.submit()
+            open_jobs = self._keys(ACTIVE) + [k for k in self._keys(('PENDING',)) if self._job(k) is not None]
+            counts = self.counts()
+            self.log('  ' + '  '.join(f'{s}: {n}' for s, n in sorted(counts.items())))
+            if not open_jobs:
+                return self.states()
+            if deadline is not None and self.clock() >= deadline:
+                raise TimeoutError(f'{len(open_jobs)} export task(s) still open after {timeout} s')
+            interval = self.poll_min if changed else min(interval * self.backoff, self.poll_max)
+            wait = interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            if deadline is not None:
+                wait = min(wait, max(deadline - self.clock(), 0))
+            self.sleep(wait)
@@ -0,0 +1,218 @@
+"""
+Multi-date inference sweeps: one damage map per ``inference_start``.
+
+A sweep over N dates (e.g. monthly snapshots since ``war_start``) shares
+everything that does not depend on the date. ``detect_damage_sweep`` builds
+one Earth Engine graph. All dates read the same per-orbit pre-war baseline:
+the materialized ``BaselineCache`` collection if given, else
+``pwtt.baseline.graph_baseline``. The per-image normalized collections built
+from that baseline are therefore the same nodes for every date. Only the
+post windows differ, and ``filterDate`` hands each one just the images it
+contains.
+
+``local_sweep`` does the same on local stacks. The pre-war
+``SuffStats`` are built once per orbit. The post-window statistics slide
+over acquisition time: each date adds the acquisitions entering its window
+and subtracts those leaving it (``sliding_stats``). A date therefore costs
+O(images that changed), not a rescan of the window, and the int64 sums stay
+exact however far the window slides.
+
+Usage:
+    from pwtt.sweep import detect_damage_sweep, local_sweep, monthly_dates
+
+    dates = monthly_dates('2023-10-10', '2024-10-10')
+    cube = detect_damage_sweep(aoi, dates, '2023-10-10')   # ee.ImageCollection
+    cube = local_sweep({orbit: (log_stack, times)}, dates, '2023-10-10',
+                       urban=built)                      # (date, y, x, 3)
+"""
+
+import datetime
+
+try:
+    import ee
+except ImportError:  # local_sweep and sliding_stats run without EE
+    ee = None
+import numpy as np
+
+from . import baseline as pwtt_baseline
+from . import local
+from .suffstats import SuffStats, ttest as suffstats_ttest
+
+
+SWEEP_BANDS = ['T_statistic', 'damage', 'p_value']
+SWEEP_METHODS = ('stouffer', 'max')
+
+
+def monthly_dates(start, end, step=1):
+    """ISO dates every ``step`` months from ``start`` up to (excluding) ``end``."""
+    out = []
+    t, stop = local.to_millis(start), local.to_millis(end)
+    while t < stop:
+        out.append(datetime.datetime.fromtimestamp(t / 1000, datetime.timezone.utc).strftime('%Y-%m-%d'))
+        t = local.advance_months(start, step * len(out))
+    return out
+
+
+# ------------------------------------------------------------------ Earth Engine
+
+def detect_damage_sweep(aoi, inference_dates, war_start, pre_interval=12, post_interval=2,
+                        method='stouffer', lee_mode='per_image', baseline_cache=None, **kwargs):
+    """``detect_damage`` for each of ``inference_dates`` as one ``ee.ImageCollection``.
+
+    Each image has ``SWEEP_BANDS`` and ``system:time_start`` set to its
+    inference date, in the order given. ``kwargs`` go to ``detect_damage``
+    (smoothing, threshold, ttest_type, sensor, ...). Exports, footprints and
+    viz are per-map options and are rejected here; export the collection
+    instead.
+    """
+    if not isinstance(method, str):
+        raise ValueError(f"detect_damage_sweep takes a single method name, got {method!r}")
+    for key in ('viz', 'export', 'export_grid', 'footprints'):
+        if kwargs.get(key):
+            raise ValueError(f"{key} is not supported by detect_damage_sweep")
+    from . import detect_damage
+
+    baseline = None
+    if baseline_cache is not None:
+        baseline = baseline_cache.get(aoi, war_start, pre_interval, lee_mode)
+    if baseline is None:
+        baseline = pwtt_baseline.graph_baseline(aoi, war_start, pre_interval, lee_mode)
+
+    images = []
+    for date in inference_dates:
+        image = detect_damage(aoi, date, war_start, pre_interval, post_interval, method=method,
+                              lee_mode=lee_mode, baseline_cache=baseline, **kwargs)
+        images.append(image.select(SWEEP_BANDS).set({
+            'system:time_start': ee.Date(date).millis(),
+            'inference_start': ee.Date(date).format('YYYY-MM-dd'),
+        }))
+    return ee.ImageCollection(images)
+
+
+# ------------------------------------------------------------------------ local
+
+def sliding_stats(stack, times, windows):
+    """``SuffStats`` of ``stack`` over each ``[start, end)`` window, in order.
+
+    ``windows`` must have non-decreasing starts and ends (as post windows of
+    sorted inference dates do). Consecutive windows that overlap update the
+    running sums with the acquisitions entering and leaving; disjoint ones
+    are summed afresh. Either way a window costs O(acquisitions changed).
+    Yields one ``SuffStats`` per window; each is a new object, so callers
+    may keep them.
+    """
+    times = np.asarray(times, dtype=np.int64)
+    order = np.argsort(times, kind='stable')
+    ts = times[order]
+
+    def block(lo, hi):
+        return SuffStats.from_stack(np.asarray(stack[np.sort(order[lo:hi])]))
+
+    cur, c_lo, c_hi = None, 0, 0
+    for start, end in windows:
+        lo = int(np.searchsorted(ts, local.to_millis(start), 'left'))
+        hi = max(int(np.searchsorted(ts, local.to_millis(end), 'left')), lo)
+        if cur is not None and (lo < c_lo or hi < c_hi):
+            raise ValueError('windows must have non-decreasing starts and ends')
+        if cur is None or lo >= c_hi:
+            cur = block(lo, hi)
+        else:
+            if hi > c_hi:
+                cur = cur + block(c_hi, hi)
+            if lo > c_lo:
+                cur = cur - block(c_lo, lo)
+        c_lo, c_hi = lo, hi
+        yield cur
+
+
+def combine_orbits(orbit_tests, method='stouffer', n_orbits=None):
+    """Per-orbit ``TTEST_BANDS`` arrays → ``(max_change, p_value, n_pre, n_post)``.
+
+    Mirrors ``detect_damage``'s 'stouffer' (sqrt(df)-weighted Z, Bonferroni x2
+    for VV/VH) and 'max' (max t, min p x ``n_orbits``) combinations; NaN
+    marks masked pixels, and a pixel masked in every orbit stays NaN.
+    """
+    b = {name: i for i, name in enumerate(local.TTEST_BANDS)}
+    tests = np.stack(orbit_tests).astype(np.float64)
+    any_valid = (~np.isnan(tests[..., b['VV']])).any(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if method == 'stouffer':
+            df = np.fmax(tests[..., b['df_VV']], tests[..., b['df_VH']])
+            w = np.sqrt(df)
+            norm = np.sqrt(np.nansum(df, axis=0))
+            z_vv = local._div(np.nansum(tests[..., b['VV']] * w, axis=0), norm)
+            z_vh = local._div(np.nansum(tests[..., b['VH']] * w, axis=0), norm)
+            max_change = np.fmax(z_vv, z_vh)
+            p_value = np.minimum(local.two_tailed_pvalue(max_change) * 2, 1)
+            n_pre = tests[..., b['n_pre']].sum(axis=0)
+            n_post = tests[..., b['n_post']].sum(axis=0)
+        elif method == 'max':
+            # fmax/fmin skip NaN (masked orbits), like a collection max()/min()
+            t_max = np.fmax.reduce(tests[..., [b['VV'], b['VH']]], axis=0)
+            p_min = np.fmin.reduce(tests[..., [b['VV_pvalue'], b['VH_pvalue']]], axis=0)
+            max_change = np.fmax(t_max[..., 0], t_max[..., 1])
+            n_orbits = len(orbit_tests) if n_orbits is None else n_orbits
+            p_value = np.minimum(np.fmin(p_min[..., 0], p_min[..., 1]) * n_orbits, 1)
+            n_pre = tests[..., b['n_pre']].max(axis=0)
+            n_post = tests[..., b['n_post']].max(axis=0)
+        else:
+            raise ValueError(f"method must be one of {', '.join(SWEEP_METHODS)}, got '{method}'")
+    max_change = np.where(any_valid, max_change, np.nan)
+    p_value = np.where(any_valid, p_value, np.nan)
+    return max_change, p_value, n_pre, n_post
+
+
+def local_sweep(stacks, inference_dates, war_start, pre_interval=12, post_interval=2,
+                method='stouffer', ttest_type='welch', urban=None, threshold=3.3,
+                smoothing='default', scale=10, conv='fft', out=None):
+    """Damage time cube ``(date, y, x, 3)`` (``SWEEP_BANDS``) from local per-orbit stacks.
+
+    ``stacks`` maps orbit → ``(stack, times)``: a ``(time, y, x, 2)`` log
+    backscatter stack (Lee-filtered as the pipeline requires, NaN = masked)
+    and its epoch-millis acquisition times. ``urban`` is the Dynamic World
+    built fraction (pixels at or below 0.1 are masked, as in
+    ``detect_damage``); None keeps every pixel. Statistics are
+    ``SuffStats`` fixed point (see ``pwtt.suffstats``), so t-values agree
+    with ``local.ttest`` up to that quantization (~1e-3). ``damage`` is
+    1/0 with NaN where ``T_statistic`` is masked. Dates may come in any
+    order; the cube follows the order given. ``out`` may be a preallocated
+    float32 array or memmap.
+    """
+    if method not in SWEEP_METHODS:
+        raise ValueError(f"method must be one of {', '.join(SWEEP_METHODS)}, got '{method}'")
+    war = local.to_millis(war_start)
+    pre_window = (local.advance_months(war, -pre_interval), war)
+    dates = [local.to_millis(d) for d in inference_dates]
+    order = sorted(range(len(dates)), key=dates.__getitem__)
+    windows = [(dates[i], local.advance_months(dates[i], post_interval)) for i in order]
+
+    shape = next(iter(stacks.values()))[0].shape[1:3]
+    if out is None:
+        out = np.empty((len(dates),) + tuple(shape) + (len(SWEEP_BANDS),), dtype=np.float32)
+    urban_mask = np.ones(shape, bool) if urban is None else np.asarray(urban) > 0.1
+
+    # Pre-war statistics once per orbit; post statistics slide with the date
+    pre = {}
+    post = {}
+    in_window = {}
+    for orbit, (stack, times) in stacks.items():
+        times = np.asarray(times, dtype=np.int64)
+        pre[orbit] = SuffStats.from_stack(np.asarray(stack[local.window_indices(times, *pre_window)]))
+        post[orbit] = sliding_stats(stack, times, windows)
+        in_window[orbit] = [len(local.window_indices(times, *w)) > 0 for w in windows]
+
+    for k, i in enumerate(order):
+        tests = [suffstats_ttest(pre[o], next(post[o]), ttest_type) for o in stacks]
+        # 'max' Bonferroni counts orbits with any post-window acquisition, as detect_damage does
+        n_orbits = sum(in_window[o][k] for o in stacks)
+        max_change, p_value, _, _ = combine_orbits(tests, method, n_orbits)
+
+        raw = ~np.isnan(max_change)
+        t_stat = local.smooth(np.where(raw & urban_mask, max_change, np.nan).astype(np.float32),
+                              smoothing, method, scale, conv)
+        t_stat = np.where(raw, t_stat, np.nan)
+        out[i, ..., 0] = t_stat
+        with np.errstate(invalid='ignore'):
+            out[i, ..., 1] = np.where(np.isnan(t_stat), np.nan, t_stat > threshold)
+        out[i, ..., 2] = np.where(urban_mask, p_value, np.nan)
+    return out
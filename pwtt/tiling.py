@@ -0,0 +1,156 @@
+"""
+Tiled, process-parallel execution of local PWTT operators over large rasters.
+
+Splits a ``(time, y, x, band)`` stack into fixed-size tiles, hands each tile
+plus a halo of neighbouring pixels to a worker process, and writes back only
+the tile's interior. The halo must cover the combined reach of the spatial
+operators applied in sequence (``halo_pixels`` sums the Lee window, the
+gaussian focal median and the largest circle kernel of a smoothing config),
+so every output pixel sees exactly the neighbourhood it would see in the full
+raster. Operators take an ``origin`` argument (the global (y, x) of the
+tile's first pixel) so block-anchored window sums such as
+``pwtt.local._box_sum`` add the same numbers in the same order as in the full
+raster: a tiled result equals the untiled one bit for bit. Only a bounded
+number of tiles is in flight at a time, so per-process memory scales with the
+tile size rather than the AOI, and ``stack`` may be a ``np.memmap``.
+
+Usage:
+    from pwtt import tiling
+
+    out = tiling.run_tiled(tiling.lee_ttest, stack, halo=1, tile_size=512,
+                           times=times, inference_start='2024-07-01',
+                           war_start='2023-10-10')
+    halo = tiling.halo_pixels('default')   # full smoothing pipeline at 10 m
+    t_stat = tiling.run_tiled(tiling.multiscale_smooth, t_smooth, halo=15,
+                              conv='rows')
+"""
+
+import math
+import os
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from . import local
+
+
+TILE_SIZE = 512
+
+Tile = namedtuple('Tile', 'y0 y1 x0 x1 hy0 hy1 hx0 hx1')
+Tile.__doc__ = 'Interior [y0:y1, x0:x1] of a tile and the haloed window [hy0:hy1, hx0:hx1] it reads.'
+
+
+def halo_pixels(smoothing='default', method='stouffer', lee_radius=1, scale=10):
+    """Halo width (pixels) for the Lee filter → focal median → circle kernels chain.
+
+    The operators are applied one after another, so their reaches add up:
+    ``lee_radius`` pixels for the per-image Lee window (0 if not filtering),
+    plus the gaussian ``focalMedian`` radius and the largest
+    ``ee.Kernel.circle`` radius of the smoothing config, in metres at
+    ``scale`` metres per pixel.
+    """
+    cfg = local.smoothing_config(smoothing, method)
+    kernels = cfg.get('kernels', [])
+    return (lee_radius + math.ceil(cfg['focal_radius'] / scale)
+            + (math.ceil(max(kernels) / scale) if kernels else 0))
+
+
+def tiles(ny, nx, tile_size=TILE_SIZE, halo=0):
+    """Row-major ``Tile``s covering an ``ny`` x ``nx`` raster, halos clipped to the raster."""
+    for y0 in range(0, ny, tile_size):
+        y1 = min(y0 + tile_size, ny)
+        for x0 in range(0, nx, tile_size):
+            x1 = min(x0 + tile_size, nx)
+            yield Tile(y0, y1, x0, x1, max(y0 - halo, 0), min(y1 + halo, ny),
+                       max(x0 - halo, 0), min(x1 + halo, nx))
+
+
+def _run_tile(fn, tile, stack, extras, kwargs):
+    """Worker: run ``fn`` on a haloed tile and return its interior."""
+    result = fn(stack, *extras, origin=(tile.hy0, tile.hx0), **kwargs)
+    return result[tile.y0 - tile.hy0:tile.y1 - tile.hy0, tile.x0 - tile.hx0:tile.x1 - tile.hx0]
+
+
+def run_tiled(fn, stack, *extras, halo, tile_size=TILE_SIZE, workers=None, out=None, **kwargs):
+    """Apply ``fn`` to a ``(time, y, x, band)`` stack or ``(y, x, ...)`` image tile by tile.
+
+    ``fn(stack_tile, *extra_tiles, origin=(y, x), **kwargs)`` must be a
+    module-level (picklable) function returning a ``(y, x, ...)`` array for
+    the haloed tile it is given (tiles run in a process pool); ``extras``
+    are per-pixel ``(y, x, ...)`` arrays (e.g. an urban mask) cut to the
+    same window. ``halo`` must be at
+    least the reach of ``fn``'s spatial operators (see ``halo_pixels``).
+    At most ``2 * workers`` tiles are in flight; ``workers=1`` runs in this
+    process. ``out`` may be a preallocated array or memmap; otherwise one is
+    allocated from the first tile's shape and dtype.
+    """
+    lead = (slice(None),) if stack.ndim == 4 else ()
+    ny, nx = stack.shape[len(lead):len(lead) + 2]
+    workers = workers or os.cpu_count()
+
+    def args(tile):
+        window = (slice(tile.hy0, tile.hy1), slice(tile.hx0, tile.hx1))
+        return (fn, tile, np.asarray(stack[lead + window]),
+                [np.asarray(e[window]) for e in extras], kwargs)
+
+    def store(tile, result):
+        nonlocal out
+        if out is None:
+            out = np.empty((ny, nx) + result.shape[2:], dtype=result.dtype)
+        out[tile.y0:tile.y1, tile.x0:tile.x1] = result
+
+    todo = tiles(ny, nx, tile_size, halo)
+    if workers == 1:
+        for tile in todo:
+            store(tile, _run_tile(*args(tile)))
+        return out
+
+    pending = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for tile in todo:
+            if len(pending) >= 2 * workers:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    store(pending.pop(fut), fut.result())
+            pending[pool.submit(_run_tile, *args(tile))] = tile
+        for fut in wait(pending).done:
+            store(pending[fut], fut.result())
+    return out
+
+
+def lee_ttest(stack, times, inference_start, war_start, pre_interval=12, post_interval=2,
+              ttest_type='welch', lee_radius=1, origin=(0, 0)):
+    """Per-image Lee filter, log, then pixel-wise t-test on linear backscatter.
+
+    The local counterpart of ``detect_damage``'s S1 preprocessing with
+    ``lee_mode='per_image'`` followed by ``ttest``; returns ``(y, x, 8)``
+    bands in ``local.TTEST_BANDS`` order. Its reach is ``lee_radius`` pixels.
+    """
+    filtered = local.lee_filter(stack, radius=lee_radius, origin=origin)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np.log(filtered, out=filtered)
+    return local.ttest(filtered, times, inference_start, war_start, pre_interval,
+                       post_interval, ttest_type=ttest_type)
+
+
+def multiscale_smooth(t_smooth, smoothing='default', method='stouffer', scale=10, conv='rows',
+                      origin=(0, 0)):
+    """Tile function for ``local.multiscale_smooth`` on a ``(y, x)`` focal-median layer.
+
+    Defaults to the exact row-sum convolution so the tiled result matches the
+    untiled one bit for bit; ``conv='fft'`` is faster on large tiles and
+    agrees to rounding. Its reach is the largest kernel radius in pixels.
+    """
+    return local.multiscale_smooth(t_smooth, smoothing, method, scale, conv, origin)
+
+
+def smooth(max_change, smoothing='default', method='stouffer', scale=10, conv='rows', edges=None,
+           origin=(0, 0)):
+    """Tile function for ``local.smooth`` (focal median + multi-scale) on a ``(y, x)`` image.
+
+    Pass ``edges=local.median_bins(max_change)`` computed on the whole raster
+    so every tile quantizes the same way. Its reach is
+    ``halo_pixels(smoothing, method, lee_radius=0, scale=scale)``.
+    """
+    return local.smooth(max_change, smoothing, method, scale, conv, edges, origin)
@@ -0,0 +1,36 @@
+import numpy as np
+
+from pwtt.cache import GetInfoCache
+
+
+def test_columns_round_trip_without_pickle(tmp_path):
+    cols = {
+        'T': np.array([0.5, np.nan, 2.0]),
+        'name': np.array(['a', 'bb', 'c']),
+        'mixed': np.array([1.5, None, 'x'], dtype=object),
+    }
+    GetInfoCache(tmp_path).put('k', cols)
+    got = GetInfoCache(tmp_path).get('k')
+    assert list(got) == ['T', 'name', 'mixed']
+    assert np.array_equal(got['T'], cols['T'], equal_nan=True)
+    assert np.array_equal(got['name'], cols['name'])
+    assert got['mixed'].dtype == object and list(got['mixed']) == [1.5, None, 'x']
+
+
+def test_pickled_entries_are_misses(tmp_path):
+    cache = GetInfoCache(tmp_path)
+    path = cache._path('old', '.npz')
+    path.parent.mkdir(parents=True)
+    np.savez(path, __created__=0.0, mixed=np.array([None], dtype=object))
+    assert cache.get('old', 'miss') == 'miss'
+    assert not path.exists()
+
+
+def test_ttl_and_eviction(tmp_path):
+    cache = GetInfoCache(tmp_path, ttl=-1)
+    cache.put('k', {'v': 1})
+    assert cache.get('k') is None and cache.stats()['expired'] == 1
+
+    cache = GetInfoCache(tmp_path, max_bytes=0)
+    cache.put('k', {'v': 1})
+    assert cache.stats()['entries'] == 0
@@ -0,0 +1,37 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip('matplotlib')
+pd = pytest.importorskip('pandas')
+
+# code/ also holds a pwtt.py shim, so load the script by path instead of via sys.path
+_path = Path(__file__).resolve().parents[1] / 'code' / 'cusum_damage_detector.py'
+_spec = importlib.util.spec_from_file_location('cusum_damage_detector', _path)
+cdd = sys.modules[_spec.name] = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(cdd)
+
+
+def test_detect_batch_matches_detect():
+    rng = np.random.default_rng(1)
+    cfg = cdd.DetectorConfig()
+    lengths = np.concatenate([[1, 1, 2, 5], rng.integers(2, 120, 300)])
+    vv = np.full((len(lengths), lengths.max()), np.nan)
+    vh = vv.copy()
+    for i, n in enumerate(lengths):
+        x = rng.standard_normal((n, 2)) * [1, 0.5] + [-10, -16]
+        x[rng.integers(0, n):] += rng.uniform(0, 3)
+        if i % 50 == 0:
+            x[:, 0] = np.round(x[:, 0])  # ties, so some MADs are 0
+        vv[i, :n], vh[i, :n] = x[:, 0], x[:, 1]
+
+    batch = cdd.detect_batch(vv, vh, cfg)
+    for i, n in enumerate(lengths):
+        one = cdd.detect(None, vv[i, :n], vh[i, :n], cfg)
+        np.testing.assert_array_equal(batch.m[i, :n], one.m)
+        np.testing.assert_array_equal(batch.s[i, :n], one.s)
+        assert batch.alarm_idx[i] == (-1 if one.alarm_idx is None else one.alarm_idx)
+        assert batch.tau_hat_idx[i] == (-1 if one.tau_hat_idx is None else one.tau_hat_idx)
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+import pwtt
+from pwtt import baseline, emulator, local
+
+
+INFERENCE, WAR = '2024-01-01', '2023-10-10'
+
+
+SHAPE = (16, 18)
+STACKS = {}
+rng = np.random.default_rng(2)
+for orbit, offset, n in ((7, 0, 80), (21, 3, 70)):
+    times = local.to_millis('2022-12-01') + (np.arange(n) * 6 + offset) * 86400000
+    stack = np.exp(rng.normal(-2, 0.4, size=(n, *SHAPE, 2)))
+    stack[rng.random(stack.shape[:3]) < 0.05] = np.nan
+    stack[times > local.to_millis(WAR), 4:10, 6:12] *= 0.4
+    STACKS[orbit] = stack, times
+
+
+@pytest.fixture(scope='module')
+def session():
+    s = emulator.Session(SHAPE, 10)
+    for orbit, (stack, times) in STACKS.items():
+        s.add_s1(orbit, stack, times)
+    s.add_urban(rng.random(SHAPE), '2023-06-01')
+    return s
+
+
+def test_ttest_matches_local(session):
+    with session:
+        s1 = pwtt._s1_orbit_collection(session.aoi, 7)
+        out = pwtt.ttest(s1, emulator.Date(INFERENCE), emulator.Date(WAR), 12, 2).compute()
+    stack, times = STACKS[7]
+    ref = local.ttest(np.log(local.lee_filter(stack)), times, INFERENCE, WAR)
+    for i, band in enumerate(local.TTEST_BANDS):
+        np.testing.assert_allclose(out[band], ref[..., i], rtol=1e-4, atol=1e-4, equal_nan=True)
+
+
+@pytest.mark.parametrize('method', ['stouffer', 'hotelling'])
+def test_tiled_equals_untiled(session, method):
+    with session:
+        image = pwtt.detect_damage(session.aoi, INFERENCE, WAR, method=method)
+        whole = image.compute()
+        tiled = image.compute(tile_size=12)
+    assert sorted(whole) == sorted(tiled)
+    for band in whole:
+        assert np.array_equal(whole[band], tiled[band], equal_nan=True), band
+
+
+def test_cusum_iterate_equals_array(session):
+    with session:
+        out = {mode: pwtt.detect_damage(session.aoi, INFERENCE, WAR, method='cusum', cusum_mode=mode).compute()
+               for mode in ('array', 'iterate')}
+    for band in out['array']:
+        np.testing.assert_allclose(out['iterate'][band], out['array'][band], rtol=1e-6, equal_nan=True)
+
+
+@pytest.mark.parametrize('method', ['stouffer', 'hotelling'])
+def test_baseline_collection_equals_graph_baseline(session, method):
+    with session:
+        graph = pwtt.detect_damage(session.aoi, INFERENCE, WAR, method=method).compute()
+        cached = pwtt.detect_damage(session.aoi, INFERENCE, WAR, method=method,
+                                    baseline_cache=baseline.graph_baseline(session.aoi, WAR, 12)).compute()
+    for band in graph:
+        assert np.array_equal(cached[band], graph[band], equal_nan=True), band
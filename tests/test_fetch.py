@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from pwtt.fetch import FakeCollection, fetch_columns
+
+
+ROWS = [{'bid': i, 'T': None if i % 97 == 0 else i * 0.5, 'name': f'n{i}'} for i in range(2345)]
+
+
+def test_retries_transient_errors_and_splits_large_pages():
+    fc = FakeCollection(ROWS, fail_rate=0.2, max_page=300)
+    out = fetch_columns(fc, ['bid', 'T', 'name', 'missing'], page_size=1000, workers=4, backoff=0)
+    assert np.array_equal(out['bid'], np.arange(len(ROWS)))
+    assert np.isnan(out['T'][0]) and out['T'][1] == 0.5
+    assert out['name'].dtype == object and out['name'][5] == 'n5'
+    assert np.isnan(out['missing']).all()
+
+
+def test_gives_up_after_max_retries():
+    fc = FakeCollection(ROWS, fail_rate=1.0)
+    with pytest.raises(Exception, match='concurrent aggregations'):
+        fetch_columns(fc, ['bid'], total=len(ROWS), workers=1, max_retries=2, backoff=0)
+    assert fc.calls == 3
+
+
+def test_memory_errors_are_not_retried():
+    class OutOfMemory:
+        calls = 0
+
+        def toList(self, count, offset):
+            def fail():
+                OutOfMemory.calls += 1
+                raise Exception('User memory limit exceeded.')
+            return FakeCollection._Info(fail)
+
+    with pytest.raises(Exception, match='memory limit'):
+        fetch_columns(OutOfMemory(), ['bid'], total=10, workers=1, backoff=0)
+    assert OutOfMemory.calls == 1
+
+
+def test_mixed_types_widen_to_object():
+    rows = [{'v': 1.5}] * 3 + [{'v': 'x'}]
+    out = fetch_columns(FakeCollection(rows), ['v'], page_size=2, workers=1)
+    assert out['v'].dtype == object and list(out['v']) == [1.5, 1.5, 1.5, 'x']
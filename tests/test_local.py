@@ -0,0 +1,68 @@
+import numpy as np
+
+from pwtt import local
+
+
+rng = np.random.default_rng(0)
+
+
+def masked_image(shape, p_nan=0.1):
+    x = rng.normal(size=shape)
+    x[rng.random(shape) < p_nan] = np.nan
+    return x
+
+
+def test_lee_filter_matches_brute_force():
+    stack = np.exp(masked_image((3, 9, 11, 2)))
+    radius, enl = 2, 5
+    got = local.lee_filter(stack, radius=radius, enl=enl, batch_size=2)
+
+    ref = np.full(stack.shape, np.nan)
+    eta2 = 1 / enl
+    for t, y, x, b in np.ndindex(stack.shape):
+        if np.isnan(stack[t, y, x, b]):
+            continue
+        win = stack[t, max(y - radius, 0):y + radius + 1, max(x - radius, 0):x + radius + 1, b]
+        win = win[~np.isnan(win)]
+        mean, var = win.mean(), win.var()
+        weight = max((var - mean ** 2 * eta2) / (1 + eta2) / var, 0) if var > 0 else 0
+        ref[t, y, x, b] = (1 - weight) * mean + weight * stack[t, y, x, b]
+    np.testing.assert_allclose(got, ref, rtol=1e-5, equal_nan=True)
+
+
+def test_convolve_circles_matches_brute_force():
+    image = masked_image((23, 27))
+    radii = [10, 25, 47]  # metres at 10 m: 1, 2.5 and 4.7 pixels
+    fft = local.convolve_circles(image, radii, method='fft')
+    rows = local.convolve_circles(image, radii, method='rows')
+
+    valid = ~np.isnan(image)
+    x0 = np.where(valid, image, 0)
+    for r, got_fft, got_rows in zip(radii, fft, rows):
+        k = local.circle_kernel(r / 10)
+        h = k.shape[0] // 2
+        xp, mp = np.pad(x0, h), np.pad(valid.astype(float), h)
+        ref = np.full(image.shape, np.nan)
+        for y, x in zip(*np.nonzero(valid)):
+            win = np.s_[y:y + 2 * h + 1, x:x + 2 * h + 1]
+            ref[y, x] = (k * xp[win]).sum() / (k * mp[win]).sum()
+        np.testing.assert_allclose(got_rows, ref, rtol=1e-6, atol=1e-6, equal_nan=True)
+        np.testing.assert_allclose(got_fft, ref, rtol=1e-6, atol=1e-6, equal_nan=True)
+
+
+def test_focal_median_matches_brute_force():
+    image = masked_image((19, 23))
+    edges = local.median_bins(image, 64)
+    mids = (edges[:-1] + edges[1:]) / 2
+    bins = np.clip(np.searchsorted(edges, image, side='right') - 1, 0, len(mids) - 1)
+    for kernel in ('square', 'circle'):
+        got = local.focal_median(image, 25, kernel=kernel, edges=edges)
+        offsets = local.circle_offsets(2.5) if kernel == 'circle' else {dy: 2 for dy in range(-2, 3)}
+        ref = np.full(image.shape, np.nan)
+        for y, x in zip(*np.nonzero(~np.isnan(image))):
+            window = sorted(bins[y + dy, x + dx] for dy, h in offsets.items() for dx in range(-h, h + 1)
+                            if 0 <= y + dy < image.shape[0] and 0 <= x + dx < image.shape[1]
+                            and not np.isnan(image[y + dy, x + dx]))
+            k = len(window)
+            ref[y, x] = (mids[window[(k - 1) // 2]] + mids[window[k // 2]]) / 2
+        assert np.array_equal(got, ref.astype(np.float32), equal_nan=True), kernel
@@ -0,0 +1,55 @@
+import numpy as np
+
+from pwtt import planner
+
+
+def synthetic_grid(depth=3):
+    """Dense footprints in the south-west corner, no area in the north-east cell."""
+    n = 2 ** depth
+    iy, ix = np.mgrid[:n, :n]
+    footprints = 1e4 * np.exp(-(iy ** 2 + ix ** 2) / 4.0)
+    area = np.full((n, n), 1e6)
+    area[-1, -1] = 0
+    return planner.Grid((0, 0, 1, 1), depth, footprints, area, np.full((n, n), 0.5), np.full((n, n), 30))
+
+
+def test_fit_keeps_weights_non_negative():
+    rng = np.random.default_rng(0)
+    features = [dict(footprints=f, pixels=p, urban_pixels=u)
+                for f, p, u in rng.uniform(0, 1, (40, 3)) * [1e5, 1e9, 1e8]]
+    # Runtime falls with pixels: an unconstrained fit would give it a negative weight
+    seconds = [60 + 2e-3 * f['footprints'] + 1e-6 * f['urban_pixels'] - 1e-8 * f['pixels'] for f in features]
+    model = planner.CostModel().fit(features, seconds)
+    assert model.intercept >= 0 and all(w >= 0 for w in model.weights.values())
+    assert model.weights['pixels'] == 0
+    np.testing.assert_allclose(model.weights['footprints'], 2e-3, rtol=0.05)
+
+    unchanged = planner.CostModel().fit(features[:2], seconds[:2])
+    assert unchanged.to_dict() == planner.CostModel().to_dict()
+
+
+def test_tiles_cover_the_area_once_under_the_ceiling():
+    grid, model = synthetic_grid(), planner.CostModel()
+    max_cost = model.work(grid.features('')) / 10
+    paths = planner.tiles(grid, model, max_cost)
+    seen = np.zeros(grid.area.shape, dtype=int)
+    for p in paths:
+        seen[grid.block(p)] += 1
+        assert len(p) == grid.depth or model.work(grid.features(p)) <= max_cost
+    assert (seen[grid.area > 0] == 1).all() and seen.max() == 1
+    # The dense south-west corner is cut down to single cells, sparse quadrants stay whole
+    assert '000' in paths and '3' in paths
+
+
+def test_pack_balances_bundles():
+    grid, model = synthetic_grid(), planner.CostModel()
+    paths = planner.tiles(grid, model, model.work(grid.features('')) / 32)
+    bundles = planner.pack(grid, model, paths, 4)
+    assert len(bundles) == 4
+    assert sorted(p for b in bundles for p in b.paths) == sorted(paths)
+    assert [b.cost for b in bundles] == sorted((b.cost for b in bundles), reverse=True)
+    # Longest-processing-time first: no bundle exceeds the mean by more than the largest tile
+    largest = max(model.work(grid.features(p)) for p in paths)
+    mean = np.mean([b.cost for b in bundles])
+    assert bundles[0].cost <= mean + largest
+    assert planner.balance(bundles) < 1.25
@@ -0,0 +1,77 @@
+from pwtt import autosplit
+from pwtt.scheduler import FakeBackend, Scheduler, resubmit
+
+
+def scheduler(backend, db=':memory:', **kwargs):
+    return Scheduler(db, backend, clock=backend.clock, sleep=backend.sleep, log=None, **kwargs)
+
+
+def test_quota_priority_and_resume(tmp_path):
+    db = str(tmp_path / 'tasks.sqlite')
+    fb = FakeBackend(duration=100)
+    fb.start(fb.task('other'))  # someone else's task, counted against the quota
+    active = []
+    list_tasks = fb.list
+
+    def counting_list():
+        records = list_tasks()
+        active.append(sum(r['state'] in ('READY', 'RUNNING') for r in records))
+        return records
+
+    fb.list = counting_list
+    sched = scheduler(fb, db, max_concurrent=2)
+    for key, priority in [('a', 0), ('b', 5), ('c', 10)]:
+        sched.add(key, lambda params, key=key: fb.task(key), priority=priority)
+    assert sched.run() == {'a': 'COMPLETED', 'b': 'COMPLETED', 'c': 'COMPLETED'}
+    assert [t.config['description'] for t in fb.started[1:]] == ['c', 'b', 'a']
+    assert max(active) <= 2
+
+    # A second run over the same database submits nothing again
+    n = len(fb.started)
+    resumed = scheduler(fb, db)
+    for key in 'abc':
+        resumed.add(key, lambda params, key=key: fb.task(key))
+    resumed.run()
+    assert len(fb.started) == n
+
+
+def test_crash_between_start_and_recording_the_id():
+    fb = FakeBackend(duration=100)
+    fb.start(fb.task('c'))  # an earlier run's task with the same description
+    fb.sleep(1000)
+    sched = scheduler(fb)
+    sched.add('c', lambda params: fb.task('c'))
+    new_id = fb.start(fb.task('c'))
+    sched._update('c', state='SUBMITTING', task_id=None)
+    n = len(fb.started)
+    assert sched.run() == {'c': 'COMPLETED'}
+    assert len(fb.started) == n
+    assert sched._row('c')['task_id'] == new_id
+
+
+def test_resource_errors_split_into_child_tiles():
+    failing = {'g', 'g_0'}
+    fb = FakeBackend(duration=50, outcome=lambda t: 'User memory limit exceeded.'
+                     if t.config['description'] in failing else None)
+    sched = scheduler(fb, max_concurrent=3)
+    sched.add('g', lambda p: fb.task(autosplit.tile_description('g', p['path']), **p),
+              params=dict(path='', tileScale=4), retry=autosplit.split_policy(3))
+    states = sched.run()
+    assert states['g'] == states['g_0'] == 'SPLIT'
+    assert autosplit.parts(sched, 'g') == ['g_0_0', 'g_0_1', 'g_0_2', 'g_0_3', 'g_1', 'g_2', 'g_3']
+    params = sched.params()
+    assert params['g_0_3'] == dict(path='03', tileScale=16)
+    assert params['g_1'] == dict(path='1', tileScale=8)
+
+
+def test_failures_are_retried_up_to_max_attempts():
+    fb = FakeBackend(outcome=lambda t: 'boom')
+    sched = scheduler(fb, max_attempts=3)
+    sched.add('x', lambda p: fb.task('x'), retry=resubmit)
+    sched.add('y', lambda p: fb.task('y', **p), params={'tileScale': 8})
+    assert sched.run() == {'x': 'FAILED', 'y': 'FAILED'}
+    assert sched.failures() == {'x': 'boom', 'y': 'boom'}
+    # x three times; y at tileScale 8, then 16, then no higher scale to try
+    assert [t.config['description'] for t in fb.started].count('x') == 3
+    assert [t.params for t in fb.started if t.config['description'] == 'y'] == [
+        {'tileScale': 8}, {'tileScale': 16}]
@@ -0,0 +1,29 @@
+import numpy as np
+
+from pwtt import local
+from pwtt.suffstats import SuffStats, ttest
+
+
+rng = np.random.default_rng(0)
+STACK = rng.standard_normal((60, 12, 10, 2)) * 0.5 - 2
+STACK[rng.random(STACK.shape[:3]) < 0.1] = np.nan
+TIMES = local.to_millis('2025-01-01') + np.arange(60) * 6 * 86400000
+
+
+def test_add_and_subtract_round_trip():
+    a, b, c = (SuffStats.from_stack(STACK[i:i + 20]) for i in (0, 20, 40))
+    assert (a + b) + c == a + (b + c) == SuffStats.from_stack(STACK)
+    # Sliding a window by removing its oldest block leaves no residue
+    assert (a + b + c) - a == b + c
+    assert (a + b) - b - a == SuffStats.empty(STACK.shape[1:3])
+
+
+def test_ttest_matches_local():
+    war, inference = '2025-08-01', '2025-09-01'
+    pre = STACK[local.window_indices(TIMES, local.advance_months(local.to_millis(war), -6), war)]
+    post = STACK[local.window_indices(TIMES, inference, local.advance_months(local.to_millis(inference), 2))]
+    got = ttest(SuffStats.from_stack(pre), SuffStats.from_stack(post))
+    ref = local.ttest(STACK, TIMES, inference, war, 6, 2)
+    assert np.array_equal(np.isnan(got), np.isnan(ref))
+    # Equal up to the fixed-point rounding of the sums (documented as ~1e-3)
+    np.testing.assert_allclose(got, ref, rtol=0, atol=1e-3, equal_nan=True)
@@ -0,0 +1,50 @@
+import numpy as np
+
+from pwtt import local, sweep
+from pwtt.suffstats import SuffStats
+
+
+rng = np.random.default_rng(3)
+SHAPE = (20, 22)
+WAR = '2023-10-10'
+
+
+def log_stack(n, offset):
+    times = local.to_millis('2022-09-01') + (np.arange(n) * 12 + offset) * 86400000
+    stack = rng.normal(-2, 0.4, size=(n, *SHAPE, 2))
+    stack[rng.random(stack.shape[:3]) < 0.05] = np.nan
+    stack[times > local.to_millis(WAR), 5:12, 6:14] -= 0.8
+    return stack, times
+
+
+STACKS = {7: log_stack(50, 0), 21: log_stack(45, 5)}
+
+
+def test_sliding_stats_match_fresh_windows():
+    stack, times = STACKS[7]
+    dates = sweep.monthly_dates('2023-11-01', '2024-05-01')
+    windows = [(d, local.advance_months(d, 2)) for d in dates]
+    for (start, end), got in zip(windows, sweep.sliding_stats(stack, times, windows)):
+        assert got == SuffStats.from_stack(stack[local.window_indices(times, start, end)])
+
+
+def per_date(date, urban, smoothing):
+    """local_sweep's pipeline for one date, from scratch with local.ttest."""
+    tests = [local.ttest(stack, times, date, WAR) for stack, times in STACKS.values()]
+    max_change, p_value, _, _ = sweep.combine_orbits(tests)
+    raw = ~np.isnan(max_change)
+    t_stat = local.smooth(np.where(raw & (urban > 0.1), max_change, np.nan).astype(np.float32), smoothing)
+    return np.where(raw, t_stat, np.nan), np.where(urban > 0.1, p_value, np.nan)
+
+
+def test_local_sweep_matches_per_date_pipeline():
+    dates = ['2024-02-01', '2023-11-01', '2024-01-01']
+    urban = rng.random(SHAPE)
+    unsmoothed = dict(focal_radius=0, kernels=[], weights=[1.0])
+    for smoothing, atol in ((unsmoothed, 1e-3), ('default', 1e-2)):
+        cube = sweep.local_sweep(STACKS, dates, WAR, urban=urban, smoothing=smoothing)
+        for i, date in enumerate(dates):
+            t_stat, p_value = per_date(date, urban, smoothing)
+            # SuffStats are fixed point, and the focal median's bins follow the values
+            np.testing.assert_allclose(cube[i, ..., 0], t_stat, atol=atol, equal_nan=True)
+            np.testing.assert_allclose(cube[i, ..., 2], p_value, atol=1e-3, equal_nan=True)
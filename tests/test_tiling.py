@@ -0,0 +1,51 @@
+import numpy as np
+
+from pwtt import local, tiling
+
+
+rng = np.random.default_rng(1)
+NY, NX = 37, 41
+
+
+def s1_stack(n=40):
+    times = local.to_millis('2023-01-01') + np.arange(n) * 12 * 86400000
+    stack = np.exp(rng.normal(-2, 0.4, size=(n, NY, NX, 2)))
+    stack[rng.random(stack.shape[:3]) < 0.05] = np.nan
+    return stack, times
+
+
+def test_tiles_cover_the_raster_once():
+    seen = np.zeros((NY, NX), dtype=int)
+    for t in tiling.tiles(NY, NX, tile_size=16, halo=3):
+        seen[t.y0:t.y1, t.x0:t.x1] += 1
+        assert t.hy0 == max(t.y0 - 3, 0) and t.hx1 == min(t.x1 + 3, NX)
+    assert (seen == 1).all()
+
+
+def test_lee_ttest_tiled_equals_untiled():
+    stack, times = s1_stack()
+    args = dict(times=times, inference_start='2024-01-01', war_start='2023-10-01')
+    tiled = tiling.run_tiled(tiling.lee_ttest, stack, halo=1, tile_size=10, workers=3, **args)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        filtered = np.log(local.lee_filter(stack))
+    whole = local.ttest(filtered, times, args['inference_start'], args['war_start'])
+    assert np.array_equal(tiled, whole, equal_nan=True)
+
+
+def test_multiscale_smooth_tiled_equals_untiled():
+    image = rng.normal(size=(NY, NX)).astype(np.float32)
+    image[rng.random(image.shape) < 0.1] = np.nan
+    halo = max(local.smoothing_config()['kernels']) // 10  # largest circle kernel, in pixels
+    tiled = tiling.run_tiled(tiling.multiscale_smooth, image, halo=halo, tile_size=12, workers=3)
+    whole = local.multiscale_smooth(image, conv='rows')
+    assert np.array_equal(tiled, whole, equal_nan=True)
+
+
+def test_smooth_tiled_equals_untiled():
+    image = rng.normal(size=(NY, NX)).astype(np.float32)
+    image[rng.random(image.shape) < 0.1] = np.nan
+    edges = local.median_bins(image)
+    halo = tiling.halo_pixels(lee_radius=0)
+    tiled = tiling.run_tiled(tiling.smooth, image, halo=halo, tile_size=12, workers=3, edges=edges)
+    whole = local.smooth(image, conv='rows', edges=edges)
+    assert np.array_equal(tiled, whole, equal_nan=True)